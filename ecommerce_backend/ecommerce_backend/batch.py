@@ -0,0 +1,159 @@
+"""
+Batch API requests: ``POST /api/batch/`` with several API calls in one body.
+
+Each sub-request is resolved through the URLconf and handled by its own
+view, so permissions, throttles and validation are exactly those of the
+endpoint called directly. The batch request is authenticated once and its
+user is shared with every sub-request. Reads can run concurrently with
+``"parallel": true``; otherwise sub-requests run in order.
+
+Middleware is not re-run for sub-requests, except replica routing, which
+gets one scope per sub-request like a direct call.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.core.handlers.exception import response_for_exception
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connection
+from django.http import Http404
+from django.urls import Resolver404, resolve
+from rest_framework import serializers
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny, SAFE_METHODS
+from rest_framework.response import Response
+
+from .db_router import ReplicaRoutingMiddleware
+
+API_PREFIX = '/api/'
+
+# Describe the batch request itself; each sub-request sets its own
+REQUEST_ONLY_META = ['CONTENT_TYPE', 'CONTENT_LENGTH', 'QUERY_STRING', 'PATH_INFO', 'REQUEST_METHOD', 'wsgi.input']
+
+
+class SubRequestSerializer(serializers.Serializer):
+
+    method = serializers.ChoiceField(
+        choices=['GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'], default='GET'
+    )
+    path = serializers.CharField(max_length=2000)
+    headers = serializers.DictField(child=serializers.CharField(), required=False)
+    body = serializers.JSONField(required=False)
+
+    def validate_path(self, value):
+        if not value.startswith(API_PREFIX):
+            raise serializers.ValidationError(f"Must start with '{API_PREFIX}'.")
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+
+    requests = serializers.ListField(child=SubRequestSerializer(), allow_empty=False)
+    parallel = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(f'At most {settings.BATCH_MAX_REQUESTS} requests per batch.')
+        return value
+
+    def validate(self, data):
+        if data['parallel'] and any(spec['method'] not in SAFE_METHODS for spec in data['requests']):
+            raise serializers.ValidationError({'parallel': 'Only batches of reads can run in parallel.'})
+        return data
+
+
+def build_sub_request(request, spec):
+    """A Django request for one sub-request, carrying the batch request's user"""
+    path, _, query = spec['path'].partition('?')
+    body = json.dumps(spec['body']).encode() if 'body' in spec else b''
+
+    environ = {key: value for key, value in request.META.items() if key not in REQUEST_ONLY_META}
+    environ.update({
+        'REQUEST_METHOD': spec['method'],
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': BytesIO(body),
+        # Absent from ASGI requests' META; links and is_secure() need it
+        'wsgi.url_scheme': request.scheme,
+    })
+    for name, value in spec.get('headers', {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+    sub_request = WSGIRequest(environ)
+    sub_request.user = request.user
+    if request.user.is_authenticated:
+        # Authenticated once for the whole batch; DRF views pick these up
+        # instead of running their authentication classes again. Anonymous
+        # sub-requests authenticate normally, so they get the same 401s.
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+    if hasattr(request, 'session'):
+        sub_request.session = request.session
+    return sub_request
+
+
+def dispatch(sub_request):
+    """Run the view for a sub-request and return its rendered response"""
+    try:
+        match = resolve(sub_request.path_info)
+        if match.func is batch:
+            raise Http404('Batch requests cannot be nested.')
+        sub_request.resolver_match = match
+        view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+        response = view(sub_request, *match.args, **match.kwargs)
+        if response.streaming and response.is_async:
+            raise BadRequest('Streaming endpoints cannot be batched.')
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+    except Resolver404:
+        response = response_for_exception(sub_request, Http404('No endpoint matches this path.'))
+    except Exception as exc:
+        response = response_for_exception(sub_request, exc)
+    return response
+
+
+def serialize_response(response):
+    content = b''.join(response.streaming_content) if response.streaming else response.content
+    if response.get('Content-Type', '').startswith('application/json') and content:
+        body = json.loads(content)
+    else:
+        body = content.decode(response.charset, errors='replace')
+    return {'status': response.status_code, 'headers': dict(response.items()), 'body': body}
+
+
+def run(sub_request):
+    # Own replica routing scope and pinning, as for a direct request
+    return serialize_response(ReplicaRoutingMiddleware(dispatch)(sub_request))
+
+
+def run_in_thread(sub_request):
+    try:
+        return run(sub_request)
+    finally:
+        connection.close()
+
+
+@api_view(['POST'])
+@permission_classes([AllowAny])  # Each sub-request checks its own permissions
+def batch(request):
+    """Run several API requests and return all their responses, in order"""
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    sub_requests = [build_sub_request(request, spec) for spec in serializer.validated_data['requests']]
+    if serializer.validated_data['parallel'] and len(sub_requests) > 1:
+        with ThreadPoolExecutor(max_workers=min(settings.BATCH_MAX_WORKERS, len(sub_requests))) as executor:
+            responses = list(executor.map(run_in_thread, sub_requests))
+    else:
+        responses = [run(sub_request) for sub_request in sub_requests]
+
+    # Sub-requests pin the user after their own writes; the pin cookie goes on this response
+    request._request.replica_pin_handled = True
+    request._request.replica_pinned = any(getattr(sub_request, 'replica_pinned', False) for sub_request in sub_requests)
+    return Response({'responses': responses})
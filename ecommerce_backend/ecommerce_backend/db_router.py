@@ -0,0 +1,138 @@
+"""
+Primary/replica database routing.
+
+Writes always go to ``default``. Reads go to a replica only while a request
+that opted in (see ``ReplicaReadMixin``) is being handled, and never for a
+user who wrote recently, so nobody misses their own new order.
+
+A write pins its user in two places: a signed cookie holding the user id,
+which the client brings to whichever worker serves its next read, and the
+cache, for clients that drop cookies. The cache pin only reaches other
+workers when ``CACHES`` is shared (the default LocMemCache is not).
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+# Per-request routing state, installed by ReplicaRoutingMiddleware
+_routing = ContextVar('db_routing', default=None)
+
+PIN_COOKIE = 'primary_pin'
+PIN_SALT = 'ecommerce_backend.db_router'
+
+
+def _pin_key(user_id):
+    return f'db:pin:{user_id}'
+
+
+def pin_to_primary(user, response=None):
+    """Keep this user's reads on the primary for REPLICA_PIN_SECONDS"""
+    cache.set(_pin_key(user.pk), True, settings.REPLICA_PIN_SECONDS)
+    if response is not None:
+        response.set_signed_cookie(
+            PIN_COOKIE, str(user.pk), salt=PIN_SALT, max_age=settings.REPLICA_PIN_SECONDS,
+            httponly=True, samesite='Lax', secure=settings.SESSION_COOKIE_SECURE,
+        )
+
+
+def is_pinned(request):
+    user = request.user
+    if not user.is_authenticated:
+        return False
+    pinned_id = request.get_signed_cookie(
+        PIN_COOKIE, default=None, salt=PIN_SALT, max_age=settings.REPLICA_PIN_SECONDS
+    )
+    return pinned_id == str(user.pk) or cache.get(_pin_key(user.pk), False)
+
+
+def route_reads_to_replica(request):
+    """Send the rest of this request's reads to a replica when it is safe to"""
+    state = _routing.get()
+    if state is None or not settings.READ_REPLICAS:
+        return
+    if request.method in SAFE_METHODS and not is_pinned(request):
+        state['replica'] = random.choice(settings.READ_REPLICAS)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state:
+            return state.get('replica')
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold copies of the primary's rows
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """Scopes routing state to one request and pins users after writes"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _routing.set({})
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        user = self.user_to_pin(request, response)
+        if user is not None:
+            pin_to_primary(user, response)
+        return response
+
+    async def __acall__(self, request):
+        # Sync views run in a copy of this context and share the state dict
+        token = _routing.set({})
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        user = self.user_to_pin(request, response)
+        if user is not None:
+            await sync_to_async(pin_to_primary)(user, response)
+        return response
+
+    def user_to_pin(self, request, response):
+        # A batch request (ecommerce_backend.batch) pins if any sub-request wrote
+        if getattr(request, 'replica_pin_handled', False):
+            wrote = getattr(request, 'replica_pinned', False)
+        else:
+            wrote = request.method not in SAFE_METHODS and response.status_code < 400
+        user = getattr(request, 'user', None)
+        if wrote and user is not None and user.is_authenticated:
+            request.replica_pinned = True
+            return user
+        return None
+
+
+class ReplicaReadMixin:
+    """ViewSet mixin: serve safe methods from a replica once the user is known"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        route_reads_to_replica(request)
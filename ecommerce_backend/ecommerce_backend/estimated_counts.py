@@ -0,0 +1,63 @@
+"""
+Estimated row counts for admin changelists on large tables.
+
+An exact ``COUNT(*)`` scans the whole table. For an unfiltered changelist
+the database's own statistics are close enough to size the paginator, so
+tables above ``ADMIN_ESTIMATED_COUNT_THRESHOLD`` rows use them instead.
+Filtered or searched changelists still count exactly.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+
+def estimated_row_count(model, using='default'):
+    """The planner's row estimate for a model's table, or ``None`` if unknown"""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass'
+    elif connection.vendor == 'mysql':
+        sql = (
+            'SELECT table_rows FROM information_schema.tables '
+            'WHERE table_schema = DATABASE() AND table_name = %s'
+        )
+    elif connection.vendor == 'sqlite':
+        # Filled in by ANALYZE / PRAGMA optimize; the first number is the row count
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+    else:
+        return None
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        # sqlite_stat1 does not exist until the first ANALYZE
+        return None
+    if row is None or row[0] is None:
+        return None
+
+    estimate = int(str(row[0]).split()[0])
+    # PostgreSQL reports -1 for tables that were never analyzed
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts the row estimate for unfiltered, large querysets"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= settings.ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class EstimatedCountAdminMixin:
+    """ModelAdmin mixin: estimated counts and no second "full result" COUNT(*)"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
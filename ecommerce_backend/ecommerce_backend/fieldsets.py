@@ -0,0 +1,92 @@
+"""
+Sparse fieldsets: ``?fields=id,name,price`` or ``?exclude=description``.
+
+The serializer mixin drops unrequested fields from the output and the
+viewset mixin pushes the same choice down into ``QuerySet.only()``, so
+payload size and database I/O shrink together. Only safe (read) methods
+are affected; writes always see the full serializer. Unknown field names
+are rejected with a 400 listing them.
+"""
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+
+_field_names = {}
+
+
+def _split(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def requested_fields(request, available):
+    """Serializer field names to keep, or ``None`` when no trimming was asked for"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+
+    fields = _split(request.query_params.get(FIELDS_PARAM))
+    exclude = _split(request.query_params.get(EXCLUDE_PARAM))
+    if not fields and not exclude:
+        return None
+
+    errors = {}
+    for param, names in [(FIELDS_PARAM, fields), (EXCLUDE_PARAM, exclude)]:
+        unknown = sorted(names.difference(available))
+        if unknown:
+            errors[param] = [f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}."]
+    if errors:
+        raise ValidationError(errors)
+
+    return [
+        name for name in available
+        if (not fields or name in fields) and name not in exclude
+    ]
+
+
+def serializer_field_names(serializer_class):
+    """Field names of a serializer class, computed once per class"""
+    if serializer_class not in _field_names:
+        _field_names[serializer_class] = list(serializer_class().fields)
+    return _field_names[serializer_class]
+
+
+class SparseFieldsetSerializerMixin:
+    """Serializer mixin: drop fields not selected by ?fields= / ?exclude="""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        keep = requested_fields(self.context.get('request'), self.fields)
+        if keep is not None:
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+
+
+class SparseFieldsetViewMixin:
+    """
+    ViewSet mixin: load only the columns the requested fields need.
+
+    ``sparse_field_columns`` maps serializer fields whose columns differ
+    from their name (method fields, related lookups) to the ``only()``
+    paths they need; an empty list means no column of this model.
+    ``sparse_always_load`` lists columns the view itself relies on.
+    """
+    sparse_field_columns = {}
+    sparse_always_load = []
+
+    def get_sparse_fields(self):
+        return requested_fields(
+            self.request,
+            serializer_field_names(self.get_serializer_class())
+        )
+
+    def apply_sparse_fields(self, queryset, keep):
+        concrete = {field.name for field in queryset.model._meta.concrete_fields}
+        columns = set(self.sparse_always_load)
+        for name in keep:
+            columns.update(self.sparse_field_columns.get(name, [name]))
+        return queryset.only(*[
+            column for column in columns
+            if column.split('__')[0] in concrete
+        ])
@@ -0,0 +1,113 @@
+"""
+Lean middleware path for bearer-token API requests.
+
+``BrowserMiddleware`` takes the place of the browser-oriented middleware
+in ``MIDDLEWARE`` and runs them, listed in ``BROWSER_MIDDLEWARE``, as its
+own inner stack. A request under ``/api/`` that carries an
+``Authorization: Bearer`` header skips that stack: it has no session,
+messages, CSRF cookie handling or X-Frame-Options header, and no
+middleware-provided ``request.user``. ``SessionAuthentication`` then finds
+no user and the JWT alone authenticates the request, so a stray session
+cookie costs no query. Everything else, the admin included, runs the full
+stack unchanged.
+
+Only ``process_view`` hooks of the wrapped middleware are supported, which
+is all of Django's session, CSRF, auth, messages and clickjacking need.
+Like Django's own handler, the inner stack is built async under ASGI, and
+sync-only middleware in it are adapted one by one.
+"""
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.module_loading import import_string
+
+API_PREFIX = '/api/'
+
+# What the admin's system checks (admin.E408-E410) require, silenced in settings
+ADMIN_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+]
+
+
+def is_lean(request):
+    """Bearer-token API request: needs nothing the browser middleware provide"""
+    return (
+        settings.LEAN_API
+        and request.path_info.startswith(API_PREFIX)
+        and request.headers.get('Authorization', '').startswith('Bearer ')
+    )
+
+
+def _adapt(method, is_async):
+    """``method`` callable in the given mode, as BaseHandler.adapt_method_mode does"""
+    if is_async == iscoroutinefunction(method):
+        return method
+    return sync_to_async(method, thread_sensitive=True) if is_async else async_to_sync(method)
+
+
+class BrowserMiddleware:
+    """Run ``BROWSER_MIDDLEWARE`` for every request except lean API ones"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        self.view_hooks = []
+        if self.is_async:
+            markcoroutinefunction(self)
+            # Django awaits a coroutine process_view directly instead of in a thread
+            self.process_view = self.aprocess_view
+
+        if 'django.contrib.admin' in settings.INSTALLED_APPS:
+            missing = [path for path in ADMIN_MIDDLEWARE if path not in settings.BROWSER_MIDDLEWARE]
+            if missing:
+                raise ImproperlyConfigured(f"The admin needs {', '.join(missing)} in BROWSER_MIDDLEWARE.")
+
+        # Built like Django's own handler chain, innermost first
+        handler = get_response
+        handler_is_async = self.is_async
+        for path in reversed(settings.BROWSER_MIDDLEWARE):
+            middleware_class = import_string(path)
+            if not handler_is_async and getattr(middleware_class, 'sync_capable', True):
+                middleware_is_async = False
+            else:
+                middleware_is_async = getattr(middleware_class, 'async_capable', False)
+            middleware = middleware_class(_adapt(handler, middleware_is_async))
+            for hook in ('process_template_response', 'process_exception'):
+                if hasattr(middleware, hook):
+                    raise ImproperlyConfigured(f'{path} defines {hook}, which BrowserMiddleware does not run.')
+            if hasattr(middleware, 'process_view'):
+                self.view_hooks.insert(0, _adapt(middleware.process_view, self.is_async))
+            handler = convert_exception_to_response(middleware)
+            handler_is_async = middleware_is_async
+        self.full_stack = _adapt(handler, self.is_async)
+
+    def __call__(self, request):
+        # Both handlers match the mode, so under ASGI this returns a coroutine
+        if is_lean(request):
+            request.lean_api = True
+            return self.get_response(request)
+        return self.full_stack(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(request, 'lean_api', False):
+            return None
+        for hook in self.view_hooks:
+            response = hook(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(request, 'lean_api', False):
+            return None
+        for hook in self.view_hooks:
+            response = await hook(request, view_func, view_args, view_kwargs)
+            if response is not None:
+                return response
+        return None
@@ -0,0 +1,278 @@
+"""
+On-demand profiling of live requests.
+
+A request is profiled when it carries a staff-issued signed token (the
+``X-Profile`` header or ``?profile=``), or when it falls into the
+``PROFILING_SAMPLE_RATE`` fraction of traffic. Profiles are kept as files in
+``PROFILING_DIR``, newest ``PROFILING_KEEP`` only, and staff list and
+download them through ``/api/profiles/``:
+
+- ``cprofile`` mode: deterministic, saved as a pstats file
+  (``python -m pstats``, snakeviz)
+- ``sample`` mode, also used for a ``cprofile`` request while another one is
+  being profiled in the same process: a thread samples the request's stack every
+  ``PROFILING_SAMPLE_INTERVAL`` seconds, saved as collapsed stacks
+  (flamegraph.pl, speedscope)
+
+Untriggered requests pay for a header lookup and a random number. Under
+ASGI the profiler runs on the event loop thread, so a profile also shows
+other requests' coroutines that ran on the loop meanwhile.
+"""
+import cProfile
+import json
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, Http404
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = 'profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+TOKEN_SALT = 'ecommerce_backend.profiling'
+MODES = {'cprofile': '.prof', 'sample': '.collapsed'}
+
+PROFILE_ID = re.compile(r'^\d+-[0-9a-f]{6}$')
+
+# Only one cProfile session can be active per process (a second enable()
+# raises ValueError since Python 3.12); overlapping requests get sampled
+_cprofile_lock = threading.Lock()
+
+
+def issue_token(mode):
+    """Signed token that makes requests carrying it get profiled"""
+    return signing.dumps({'mode': mode}, salt=TOKEN_SALT)
+
+
+def token_mode(token):
+    """Profiling mode of a valid, unexpired token; None otherwise"""
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return payload.get('mode') if payload.get('mode') in MODES else None
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a background thread"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def _prune():
+    """Drop the oldest profiles beyond PROFILING_KEEP"""
+    names = sorted(name for name in os.listdir(settings.PROFILING_DIR) if name.endswith('.json'))
+    for name in names[:max(0, len(names) - settings.PROFILING_KEEP)]:
+        profile_id = name[:-len('.json')]
+        for suffix in ('.json', *MODES.values()):
+            try:
+                os.remove(os.path.join(settings.PROFILING_DIR, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def save_profile(request, response, mode, duration, data):
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    # Time first, so file names sort oldest to newest
+    profile_id = f'{time.time_ns()}-{secrets.token_hex(3)}'
+    path = os.path.join(settings.PROFILING_DIR, profile_id)
+
+    if mode == 'cprofile':
+        data.dump_stats(path + MODES[mode])
+    else:
+        with open(path + MODES[mode], 'w') as handle:
+            handle.write(data.collapsed())
+    # Metadata last: a profile is listed only once its data is on disk
+    with open(path + '.json', 'w') as handle:
+        json.dump({
+            'id': profile_id,
+            'mode': mode,
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'created_at': time.time(),
+        }, handle)
+    _prune()
+    return profile_id
+
+
+class ProfilingMiddleware:
+    """Profile requests that carry a valid token or are picked by sampling"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def profiling_mode(self, request):
+        token = request.headers.get(PROFILE_HEADER)
+        if token is None and f'{PROFILE_PARAM}=' in request.META.get('QUERY_STRING', ''):
+            token = request.GET.get(PROFILE_PARAM)
+        if token:
+            return token_mode(token)
+        if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            return settings.PROFILING_SAMPLE_MODE
+        return None
+
+    def start_cprofile(self):
+        """An enabled cProfile session, or None while another one is running"""
+        if not _cprofile_lock.acquire(blocking=False):
+            return None
+        data = cProfile.Profile()
+        try:
+            data.enable()
+        except ValueError:
+            # Some other profiler (not one of ours) holds the slot
+            _cprofile_lock.release()
+            return None
+        return data
+
+    @contextmanager
+    def profiled(self, mode):
+        """Profile the block; yields a dict that ends up with mode, data and duration"""
+        session = {'started': time.perf_counter()}
+        data = self.start_cprofile() if mode == 'cprofile' else None
+        if data is not None:
+            session.update(mode='cprofile', data=data)
+            try:
+                yield session
+            finally:
+                data.disable()
+                _cprofile_lock.release()
+        else:
+            with StackSampler(threading.get_ident(), settings.PROFILING_SAMPLE_INTERVAL) as data:
+                session.update(mode='sample', data=data)
+                yield session
+        session['duration'] = time.perf_counter() - session.pop('started')
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        mode = self.profiling_mode(request)
+        if mode is None:
+            return self.get_response(request)
+
+        with self.profiled(mode) as session:
+            response = self.get_response(request)
+        response[PROFILE_ID_HEADER] = save_profile(request, response, **session)
+        return response
+
+    async def __acall__(self, request):
+        mode = self.profiling_mode(request)
+        if mode is None:
+            return await self.get_response(request)
+
+        with self.profiled(mode) as session:
+            response = await self.get_response(request)
+        response[PROFILE_ID_HEADER] = await sync_to_async(save_profile, thread_sensitive=False)(
+            request, response, **session
+        )
+        return response
+
+
+def _load_meta(profile_id):
+    with open(os.path.join(settings.PROFILING_DIR, profile_id + '.json')) as handle:
+        return json.load(handle)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_list(request):
+    """Stored profiles, newest first"""
+    try:
+        names = sorted(
+            (name for name in os.listdir(settings.PROFILING_DIR) if name.endswith('.json')),
+            reverse=True
+        )
+    except FileNotFoundError:
+        names = []
+
+    profiles = []
+    for name in names:
+        try:
+            meta = _load_meta(name[:-len('.json')])
+        except (FileNotFoundError, ValueError):
+            continue  # Pruned or half-written meanwhile
+        meta['download'] = request.build_absolute_uri(f"{request.path}{meta['id']}/")
+        profiles.append(meta)
+    return Response({'count': len(profiles), 'results': profiles})
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def profile_token(request):
+    """Issue a token that profiles any request carrying it, until it expires"""
+    mode = request.data.get('mode', 'cprofile')
+    if mode not in MODES:
+        return Response(
+            {'mode': f"Must be one of: {', '.join(MODES)}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response({
+        'token': issue_token(mode),
+        'mode': mode,
+        'expires_in': settings.PROFILING_TOKEN_MAX_AGE,
+        'header': PROFILE_HEADER,
+        'query_param': PROFILE_PARAM,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profile_download(request, profile_id):
+    """The profile file: pstats (cprofile) or collapsed stacks (sample)"""
+    if not PROFILE_ID.match(profile_id):
+        raise Http404('Profile not found.')
+    try:
+        meta = _load_meta(profile_id)
+        suffix = MODES[meta['mode']]
+        handle = open(os.path.join(settings.PROFILING_DIR, profile_id + suffix), 'rb')
+    except (FileNotFoundError, ValueError, KeyError):
+        raise Http404('Profile not found.')
+    content_type = 'text/plain' if meta['mode'] == 'sample' else 'application/octet-stream'
+    return FileResponse(handle, as_attachment=True, filename=profile_id + suffix, content_type=content_type)
@@ -24,9 +24,16 @@ CSRF_TRUSTED_ORIGINS = [
 
 
 
+# The admin adds imports, templates and URL patterns to every worker's
+# startup; API-only deployments can leave it out with ADMIN_ENABLED=False
+ADMIN_ENABLED = os.environ.get('ADMIN_ENABLED', 'True') == 'True'
+
+# DRF's browsable API pulls in templates and form rendering; production
+# workers serve JSON only unless asked otherwise
+BROWSABLE_API = os.environ.get('BROWSABLE_API', str(DEBUG)) == 'True'
+
 # Application definition
 INSTALLED_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -44,17 +51,39 @@ INSTALLED_APPS = [
     'orders.apps.OrdersConfig',
 ]
 
+if ADMIN_ENABLED:
+    INSTALLED_APPS.insert(0, 'django.contrib.admin')
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware', 
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # WhiteNoise, async-capable (see ecommerce_backend.static)
+    'ecommerce_backend.static.WhiteNoiseMiddleware',
+    'ecommerce_backend.profiling.ProfilingMiddleware',
+    'products.snapshot.CatalogSnapshotMiddleware',
     'django.middleware.common.CommonMiddleware',
+    # Runs BROWSER_MIDDLEWARE below, except for bearer-token /api/ requests
+    'ecommerce_backend.lean.BrowserMiddleware',
+    'ecommerce_backend.db_router.ReplicaRoutingMiddleware',
+]
+
+# Sessions, CSRF, auth, messages and clickjacking protection: needed by the
+# admin and browsers, not by JWT API clients (see ecommerce_backend.lean).
+# LEAN_API=False runs them for every request.
+LEAN_API = os.environ.get('LEAN_API', 'True') == 'True'
+BROWSER_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# admin.E408-E410 look for the session, auth and messages middleware in
+# MIDDLEWARE only. They run from BROWSER_MIDDLEWARE instead, for every request
+# outside /api/ (the admin included), and BrowserMiddleware refuses to start
+# without them while the admin is installed.
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
+
 ROOT_URLCONF = 'ecommerce_backend.urls'
 
 TEMPLATES = [
@@ -85,6 +114,29 @@ DATABASES = {
     }
 }
 
+# SQLite high-concurrency mode for single-node deployments:
+# - WAL lets readers proceed while a checkout is writing
+# - IMMEDIATE transactions take the write lock at BEGIN, so concurrent checkouts
+#   queue on the busy timeout instead of failing with "database is locked"
+# - synchronous=NORMAL is durable under WAL except for power loss
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'True') == 'True'
+if SQLITE_TUNING:
+    DATABASES['default']['OPTIONS'] = {
+        'timeout': 20,
+        'transaction_mode': 'IMMEDIATE',
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            'PRAGMA mmap_size=268435456;'
+            'PRAGMA cache_size=-65536;'
+            'PRAGMA temp_store=MEMORY;'
+        ),
+    }
+
+# Transactions that lose a lock race are retried this many times
+DB_LOCK_RETRY_ATTEMPTS = int(os.environ.get('DB_LOCK_RETRY_ATTEMPTS', 5))
+DB_LOCK_RETRY_BACKOFF = 0.05  # seconds, doubled on each attempt
+
 # Use PostgreSQL in production (Railway)
 if os.environ.get('DATABASE_URL'):
     DATABASES['default'] = dj_database_url.config(
@@ -93,6 +145,47 @@ if os.environ.get('DATABASE_URL'):
         conn_health_checks=True,
     )
 
+# Read replicas: comma-separated database URLs. For a local two-database setup use
+# REPLICA_DATABASE_URLS=sqlite:///db_replica.sqlite3
+for index, url in enumerate(filter(None, os.environ.get('REPLICA_DATABASE_URLS', '').split(',')), start=1):
+    DATABASES[f'replica{index}'] = dj_database_url.parse(url, conn_max_age=600)
+
+READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['ecommerce_backend.db_router.PrimaryReplicaRouter']
+
+# After a write, keep that user's reads on the primary for this many seconds
+# (signed cookie, plus the cache for cookie-less clients; see db_router)
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 15))
+
+
+# Cache
+# Per-process memory by default; point this at a shared backend (e.g. Redis)
+# when running several workers so invalidations reach all of them.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Seconds a cached catalog page or product stays valid (changes invalidate early)
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', 60))
+
+# Most ids accepted by GET /api/products/bulk/?ids=
+PRODUCT_BULK_MAX_IDS = 200
+
+
+# Static catalog snapshot for anonymous traffic (see products/snapshot.py).
+# Rebuilt CATALOG_SNAPSHOT_DEBOUNCE seconds after the last product change, and
+# at most CATALOG_SNAPSHOT_MAX_DELAY seconds after the first of a burst; one
+# worker's build stands in for the others'.
+CATALOG_SNAPSHOT = os.environ.get('CATALOG_SNAPSHOT', 'False') == 'True'
+CATALOG_SNAPSHOT_DIR = os.path.join(BASE_DIR, 'catalog_snapshot')
+CATALOG_SNAPSHOT_PAGES = 5
+CATALOG_SNAPSHOT_DEBOUNCE = 2
+CATALOG_SNAPSHOT_MAX_DELAY = 30
+# Prefix for next/previous links in snapshot pages, e.g. https://shop.example.com
+CATALOG_SNAPSHOT_BASE_URL = os.environ.get('CATALOG_SNAPSHOT_BASE_URL', '')
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -141,9 +234,74 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if BROWSABLE_API else []),
+    ],
 }
 
 
+# How long an Idempotency-Key on POST /api/orders/ replays its first response
+# (run `manage.py purge_idempotency_keys` periodically to delete expired keys)
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+
+# Orders handled per transaction by staff bulk actions
+ORDER_BULK_CHUNK_SIZE = 500
+
+
+# Completed/cancelled orders older than this move to the archive table
+# (`manage.py archive_orders`); they remain readable via GET /api/orders/<id>/
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', 180))
+
+
+# Group commit for concurrent checkouts in one process (see orders.batcher):
+# orders arriving within ORDER_BATCH_MAX_DELAY_MS share one transaction
+ORDER_BATCHING = os.environ.get('ORDER_BATCHING', 'False') == 'True'
+ORDER_BATCH_MAX_DELAY_MS = int(os.environ.get('ORDER_BATCH_MAX_DELAY_MS', 5))
+ORDER_BATCH_MAX_SIZE = 100
+
+
+# On-demand request profiling (see ecommerce_backend.profiling): staff get
+# a token from POST /api/profiles/token/; a fraction of all requests can
+# also be sampled
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_SAMPLE_MODE = os.environ.get('PROFILING_SAMPLE_MODE', 'sample')  # or 'cprofile'
+PROFILING_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+PROFILING_TOKEN_MAX_AGE = 15 * 60  # seconds
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILING_KEEP = 200
+
+
+# Admin changelists of tables larger than this show the planner's row
+# estimate instead of running COUNT(*) (see ecommerce_backend.estimated_counts)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.environ.get('ADMIN_ESTIMATED_COUNT_THRESHOLD', 100000))
+
+
+# POST /api/batch/ (see ecommerce_backend.batch)
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4  # threads for "parallel": true batches of reads
+
+
+# Server-sent events at GET /api/stream/ (see ecommerce_backend.streams).
+# Set EVENT_STREAM_BACKEND to a cross-process backend when running several
+# ASGI processes.
+EVENT_STREAM_BACKEND = os.environ.get('EVENT_STREAM_BACKEND', 'ecommerce_backend.streams.LocalBackend')
+STREAM_COALESCE_SECONDS = 1.0  # at most one event per product/order this often
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_MAX_PRODUCTS = 100
+
+
+# Demand forecasting behind GET /api/products/reorder-suggestions/
+# (`manage.py forecast_demand`, see products.forecasting)
+FORECAST_HISTORY_DAYS = 730
+FORECAST_WINDOW_DAYS = 28  # moving average and demand deviation
+FORECAST_SMOOTHING = 0.2  # exponential smoothing factor, 0-1
+FORECAST_LEAD_TIME_DAYS = int(os.environ.get('FORECAST_LEAD_TIME_DAYS', 7))
+FORECAST_REVIEW_DAYS = 7  # days between purchase orders
+FORECAST_SERVICE_LEVEL = 0.95  # chance of not running out during the lead time
+
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=5),
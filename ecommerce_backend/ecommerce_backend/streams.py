@@ -0,0 +1,232 @@
+"""
+Live stock and order status updates as server-sent events.
+
+``GET /api/stream/?products=1,2,3`` keeps a response open and pushes:
+
+- ``stock`` events for the listed products, whenever their stock changes
+  (anything that sends ``catalog_changed``: ``reduce_stock``,
+  ``increase_stock``, bulk updates, shard rebalancing)
+- ``order`` events when one of the authenticated user's orders changes
+  status (``order_status_changed``, sent by orders.state_machine)
+
+Browsers' ``EventSource`` cannot set headers, so the JWT access token may
+also be passed as ``?token=``.
+
+Changes are published to ``EVENT_STREAM_BACKEND``. ``LocalBackend``
+delivers them to streams in the same process. A cross-process backend (e.g.
+Redis pub/sub) sends ``publish`` calls to every process and hands what it
+receives to ``deliver``. Each stream coalesces updates per product and
+order: a subscriber gets at most one event per key every
+``STREAM_COALESCE_SECONDS``, carrying the latest value.
+
+Streams hold a connection open, so they are served under ASGI only (e.g.
+``uvicorn ecommerce_backend.asgi:application``). Under WSGI Django would
+consume the endless generator in a worker thread, tying the worker up for
+good, so ``stream`` answers 501 there.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+
+def product_topic(product_id):
+    return f'product:{product_id}'
+
+
+def user_topic(user_id):
+    return f'user:{user_id}'
+
+
+class LocalBackend:
+    """Delivers events to streams of this process only"""
+
+    # Only local streams can listen, so events nobody subscribed to are dropped early
+    remote = False
+
+    def __init__(self, deliver):
+        self.deliver = deliver
+
+    def publish(self, topic, message):
+        self.deliver(topic, message)
+
+
+class Subscriber:
+    """One open stream: the latest pending message per key, drained by its event loop"""
+
+    def __init__(self, topics, loop):
+        self.topics = topics
+        self.loop = loop
+        self.pending = {}
+        self.ready = asyncio.Event()
+
+    def offer(self, message):
+        # Called from whichever thread committed the change
+        try:
+            self.loop.call_soon_threadsafe(self._offer, message)
+        except RuntimeError:
+            pass  # Loop closed: the stream is gone
+
+    def _offer(self, message):
+        self.pending[message['key']] = message
+        self.ready.set()
+
+    async def drain(self, timeout):
+        """Pending messages, waiting up to ``timeout`` seconds for the first"""
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self.ready.clear()
+        messages = list(self.pending.values())
+        self.pending.clear()
+        return messages
+
+
+class Broker:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = import_string(settings.EVENT_STREAM_BACKEND)(self.deliver)
+        return self._backend
+
+    def subscribe(self, topics):
+        subscriber = Subscriber(topics, asyncio.get_running_loop())
+        with self.lock:
+            for topic in topics:
+                self.subscribers[topic].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            for topic in subscriber.topics:
+                self.subscribers[topic].discard(subscriber)
+                if not self.subscribers[topic]:
+                    del self.subscribers[topic]
+
+    def wants(self, topics):
+        """Whether publishing to any of these topics can reach a stream"""
+        if self.backend.remote:
+            return True
+        with self.lock:
+            return any(topic in self.subscribers for topic in topics)
+
+    def publish(self, topic, event, key, data):
+        self.backend.publish(topic, {'event': event, 'key': key, 'data': data})
+
+    def deliver(self, topic, message):
+        with self.lock:
+            subscribers = list(self.subscribers.get(topic, ()))
+        for subscriber in subscribers:
+            subscriber.offer(message)
+
+
+broker = Broker()
+
+
+def stock_events(product_ids):
+    from products.models import Product
+
+    return [
+        {'event': 'stock', 'key': f'stock:{pk}', 'data': {'product': pk, 'stock': stock}}
+        for pk, stock in Product.objects.filter(id__in=product_ids).values_list('id', 'stock')
+    ]
+
+
+def publish_stock(product_ids):
+    """Push the current stock of these products; one query, only if anyone listens"""
+    if not broker.wants([product_topic(pk) for pk in product_ids]):
+        return
+    for message in stock_events(product_ids):
+        broker.publish(product_topic(message['data']['product']), **message)
+
+
+def publish_order_status(changes):
+    """Push order status changes to their owners' streams"""
+    for change in changes:
+        broker.publish(
+            user_topic(change['user_id']),
+            event='order',
+            key=f"order:{change['order_id']}",
+            data={'order': change['order_id'], 'status': change['to_status']},
+        )
+
+
+def format_event(message):
+    return f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
+
+
+async def event_stream(topics, product_ids):
+    # Subscribe before reading current stock so no change falls in between
+    subscriber = broker.subscribe(topics)
+    try:
+        for message in await sync_to_async(stock_events)(product_ids):
+            yield format_event(message)
+        while True:
+            messages = await subscriber.drain(settings.STREAM_KEEPALIVE_SECONDS)
+            if not messages:
+                yield ': keepalive\n\n'
+                continue
+            for message in messages:
+                yield format_event(message)
+            # Further changes meanwhile replace each other in ``pending``
+            await asyncio.sleep(settings.STREAM_COALESCE_SECONDS)
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+async def authenticate(request):
+    """The user of a ``?token=`` or bearer JWT, None if there is none"""
+    authentication = JWTAuthentication()
+    raw_token = request.GET.get('token')
+    if not raw_token:
+        header = authentication.get_header(request)
+        raw_token = authentication.get_raw_token(header) if header else None
+    if not raw_token:
+        return None
+    validated = authentication.get_validated_token(raw_token)
+    return await sync_to_async(authentication.get_user)(validated)
+
+
+async def stream(request):
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'Event streams are only served by the ASGI application.'}, status=501)
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+    product_ids = [value.strip() for value in request.GET.get('products', '').split(',') if value.strip()]
+    if not all(value.isdigit() for value in product_ids):
+        return JsonResponse({'products': 'Must be a comma-separated list of product ids.'}, status=400)
+    product_ids = list(dict.fromkeys(int(value) for value in product_ids))
+    if len(product_ids) > settings.STREAM_MAX_PRODUCTS:
+        return JsonResponse({'products': f'At most {settings.STREAM_MAX_PRODUCTS} products per stream.'}, status=400)
+
+    try:
+        user = await authenticate(request)
+    except AuthenticationFailed as exc:
+        return JsonResponse({'detail': exc.detail}, status=401)
+
+    topics = [product_topic(pk) for pk in product_ids]
+    if user is not None:
+        topics.append(user_topic(user.pk))
+    if not topics:
+        return JsonResponse({'detail': 'Pass ?products= or authenticate to stream your orders.'}, status=400)
+
+    response = StreamingHttpResponse(event_stream(topics, product_ids), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Let nginx pass events through as they come
+    return response
@@ -0,0 +1,667 @@
+import asyncio
+import io
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+import whitenoise.middleware
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.throttling import BaseThrottle
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ecommerce_backend.db_router import PIN_COOKIE
+from ecommerce_backend.lean import BrowserMiddleware
+from ecommerce_backend.profiling import ProfilingMiddleware
+from ecommerce_backend.static import WhiteNoiseMiddleware
+from ecommerce_backend.streams import broker, publish_stock
+from ecommerce_backend.transactions import retry_on_lock
+from orders import state_machine
+from orders.archive import ARCHIVABLE_STATUSES
+from orders.models import Order, OrderItem
+from products.models import LowStockAlert, Product, RelatedProduct
+from products.views import ProductViewSet
+
+User = get_user_model()
+
+# Session, user, count (or estimate) and the page itself, plus slack for
+# Django's own bookkeeping; it must not grow with the number of rows.
+CHANGELIST_QUERY_BUDGET = 6
+
+# Alias Django gives QuerySet.count()
+COUNT_SQL = '"__count"'
+
+CHANGELISTS = [
+    '/admin/orders/order/',
+    '/admin/orders/orderitem/',
+    '/admin/products/product/',
+    '/admin/users/customuser/',
+]
+
+
+@override_settings(DB_LOCK_RETRY_ATTEMPTS=4, DB_LOCK_RETRY_BACKOFF=0.05)
+@mock.patch('ecommerce_backend.transactions.random.uniform', return_value=1)
+@mock.patch('ecommerce_backend.transactions.time.sleep')
+class RetryOnLockTests(SimpleTestCase):
+    # No test transaction around these, so retries are not disabled
+
+    def run_with(self, *outcomes):
+        """Call a retried function that raises or returns ``outcomes`` in turn"""
+        calls = mock.Mock(side_effect=outcomes)
+        return retry_on_lock(calls), calls
+
+    def test_retries_a_lost_lock_race(self, sleep, uniform):
+        func, calls = self.run_with(OperationalError('database is locked'), 'placed')
+
+        self.assertEqual(func(), 'placed')
+        self.assertEqual(calls.call_count, 2)
+        sleep.assert_called_once_with(0.05)
+
+    def test_gives_up_after_the_last_attempt_with_exponential_backoff(self, sleep, uniform):
+        func, calls = self.run_with(*[OperationalError('database table is locked')] * 5)
+
+        with self.assertRaises(OperationalError):
+            func()
+        self.assertEqual(calls.call_count, 4)
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.05, 0.1, 0.2])
+        uniform.assert_called_with(0.5, 1.5)
+
+    def test_other_errors_are_not_retried(self, sleep, uniform):
+        func, calls = self.run_with(OperationalError('no such table: products_product'))
+
+        with self.assertRaises(OperationalError):
+            func()
+        self.assertEqual(calls.call_count, 1)
+        sleep.assert_not_called()
+
+    def test_not_retried_inside_an_enclosing_transaction(self, sleep, uniform):
+        func, calls = self.run_with(OperationalError('database is locked'))
+
+        with mock.patch.object(connection, 'in_atomic_block', True), self.assertRaises(OperationalError):
+            func()
+        self.assertEqual(calls.call_count, 1)
+
+
+@skipUnless(
+    connection.vendor == 'sqlite' and settings.SQLITE_TUNING,
+    'SQLite high-concurrency mode is off (SQLITE_TUNING=False or another database)',
+)
+class SQLiteTuningTests(SimpleTestCase):
+    # The test database lives in memory, so check the options on a file database
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'tuning.sqlite3')
+        default = connections['default']
+        connections['tuning'] = type(default)({**default.settings_dict, 'NAME': self.path}, alias='tuning')
+        self.addCleanup(delattr, connections._connections, 'tuning')
+        self.addCleanup(connections['tuning'].close)
+
+    def test_wal_and_synchronous_normal(self):
+        with connections['tuning'].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_transactions_take_the_write_lock_at_begin(self):
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+
+        with transaction.atomic(using='tuning'):
+            # No write yet, but another writer is already locked out
+            with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+                other.execute('BEGIN IMMEDIATE')
+        other.execute('BEGIN IMMEDIATE')
+        other.execute('ROLLBACK')
+
+
+@skipUnless(settings.ADMIN_ENABLED, 'The admin is disabled (ADMIN_ENABLED=False)')
+class AdminQueryBudgetTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='testpass123')
+        self.client.force_login(self.admin)
+        self.add_orders(2)
+
+    def add_orders(self, count):
+        start = Order.objects.count()
+        for n in range(start, start + count):
+            user = User.objects.create_user(email=f'buyer{n}@example.com', password='testpass123')
+            products = [
+                Product.objects.create(name=f'Product {n}-{i}', price=Decimal('5.00'), stock=10)
+                for i in range(2)
+            ]
+            order = Order.objects.create(user=user, total_amount=Decimal('10.00'))
+            for product in products:
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        return context.captured_queries
+
+    def test_changelists_use_constant_query_count(self):
+        few = {url: len(self.changelist_queries(url)) for url in CHANGELISTS}
+        self.add_orders(10)
+        for url in CHANGELISTS:
+            with self.subTest(url=url):
+                many = len(self.changelist_queries(url))
+                self.assertEqual(many, few[url])
+                self.assertLessEqual(many, CHANGELIST_QUERY_BUDGET)
+
+    def test_order_change_form_does_not_load_every_product_or_user(self):
+        User.objects.create_user(email='bystander@example.com', password='testpass123')
+        Product.objects.create(name='Unrelated lamp', price=Decimal('5.00'), stock=10)
+        order = Order.objects.first()
+
+        response = self.client.get(f'/admin/orders/order/{order.id}/change/', HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 200)
+        # Autocomplete widgets render only the selected options
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, 'bystander@example.com')
+        self.assertNotContains(response, 'Unrelated lamp')
+
+    @override_settings(ADMIN_ESTIMATED_COUNT_THRESHOLD=1)
+    def test_large_unfiltered_changelists_skip_count(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        for url in CHANGELISTS:
+            with self.subTest(url=url):
+                queries = self.changelist_queries(url)
+                self.assertFalse(any(COUNT_SQL in query['sql'] for query in queries))
+
+        # Searches are filtered, so they still count exactly
+        queries = self.changelist_queries('/admin/products/product/?q=Product')
+        self.assertTrue(any(COUNT_SQL in query['sql'] for query in queries))
+
+
+def full_scans(queryset):
+    """Tables the query plan reads row by row without any index"""
+    plan = queryset.explain()
+    if connection.vendor == 'postgresql':
+        return re.findall(r'Seq Scan on (\w+)', plan)
+    # SQLite: "SCAN table" alone; "SCAN table USING INDEX" walks an index
+    return re.findall(r'SCAN (\w+)(?:\s*$|\s*\n)', plan, re.MULTILINE)
+
+
+class QueryPlanTests(TestCase):
+    """
+    Every query shape the viewsets and the admin issue must be served by an
+    index. Add the query here when adding an index, and the index when
+    adding a query.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # No ANALYZE: with statistics from a few hundred rows the planner
+        # rightly prefers scanning, which says nothing about production
+        call_command('seed', users=30, products=200, orders=300, stdout=io.StringIO())
+        cls.user_id = User.objects.order_by('id').values_list('id', flat=True).first()
+        cls.product_id = Product.objects.order_by('id').values_list('id', flat=True).first()
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            # Same reason: ask whether an index exists for the shape at all
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+    def canonical_queries(self):
+        cutoff = timezone.now() - timedelta(days=180)
+        return {
+            # ProductViewSet
+            'product list': Product.objects.order_by('-created_at')[:20],
+            'price range': Product.objects.filter(price__gte=10, price__lte=100).order_by('-created_at')[:20],
+            'min stock': Product.objects.filter(stock__gte=5).order_by('-created_at')[:20],
+            'max stock': Product.objects.filter(stock__lte=5),
+            'order by price': Product.objects.order_by('price')[:20],
+            'order by name': Product.objects.order_by('name')[:20],
+            'order by stock': Product.objects.order_by('-stock')[:20],
+            'low stock': Product.objects.low_stock()[:20],
+            'low stock alerts': LowStockAlert.objects.order_by('-created_at')[:20],
+            'related products': RelatedProduct.objects.filter(product_id=self.product_id).order_by('rank'),
+            # OrderViewSet
+            'customer orders': Order.objects.filter(user_id=self.user_id).order_by('-created_at')[:20],
+            'staff orders': Order.objects.order_by('-created_at')[:20],
+            'order items': OrderItem.objects.filter(order_id__in=[1, 2, 3]),
+            # Admin, bulk actions and maintenance
+            'orders by status': Order.objects.filter(status='pending').order_by('-created_at')[:20],
+            'archivable orders': Order.objects.filter(
+                status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff
+            ).order_by('id').values_list('id', flat=True)[:100],
+            'recommendation window': OrderItem.objects.filter(order_id__gte=1, order_id__lt=1000),
+            'product sales': OrderItem.objects.filter(product_id=self.product_id).values('order_id'),
+            'users admin': User.objects.order_by('-date_joined')[:100],
+        }
+
+    def test_canonical_queries_use_indexes(self):
+        for name, queryset in self.canonical_queries().items():
+            with self.subTest(query=name):
+                self.assertEqual(full_scans(queryset), [], queryset.explain())
+
+
+class ProfilingTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = os.path.join(directory.name, 'profiles')
+        override = override_settings(PROFILING_DIR=self.directory, PROFILING_KEEP=2)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.staff = User.objects.create_user(email='staff@example.com', password='testpass123', is_staff=True)
+        self.buyer = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def token(self, mode):
+        return self.client.post('/api/profiles/token/', {'mode': mode}, format='json').data['token']
+
+    def test_no_sampling_by_default(self):
+        self.assertEqual(settings.PROFILING_SAMPLE_RATE, 0)
+        with mock.patch('ecommerce_backend.profiling.random.random', return_value=0.0):
+            response = self.client.get('/api/products/')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(os.path.exists(self.directory))
+
+        with override_settings(PROFILING_SAMPLE_RATE=0.5), \
+                mock.patch('ecommerce_backend.profiling.random.random', return_value=0.1):
+            self.assertIn('X-Profile-Id', self.client.get('/api/products/'))
+
+    def test_token_profiles_requests_carrying_it(self):
+        response = self.client.get('/api/products/', headers={'X-Profile': self.token('cprofile')})
+        profile_id = response['X-Profile-Id']
+        response = self.client.get('/api/products/', {'profile': self.token('sample')})
+        self.assertIn('X-Profile-Id', response)
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/products/', headers={'X-Profile': 'forged'}))
+
+        profiles = self.client.get('/api/profiles/').data['results']
+        self.assertEqual([profile['mode'] for profile in profiles], ['sample', 'cprofile'])
+        self.assertEqual(profiles[1]['path'], '/api/products/')
+        download = self.client.get(f'/api/profiles/{profile_id}/')
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b''.join(download.streaming_content))
+
+    def test_overlapping_cprofile_requests(self):
+        # Both requests are inside the view at the same time
+        barrier = threading.Barrier(2, timeout=5)
+
+        def view(request):
+            barrier.wait()
+            return HttpResponse()
+
+        middleware = ProfilingMiddleware(view)
+        token = self.token('cprofile')
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            responses = list(executor.map(
+                lambda _: middleware(RequestFactory().get('/api/products/', headers={'X-Profile': token})),
+                range(2)
+            ))
+
+        self.assertEqual([response.status_code for response in responses], [200, 200])
+        modes = {profile['id']: profile['mode'] for profile in self.client.get('/api/profiles/').data['results']}
+        self.assertEqual(sorted(modes[response['X-Profile-Id']] for response in responses), ['cprofile', 'sample'])
+
+        # The cProfile slot is free again
+        response = self.client.get('/api/products/', headers={'X-Profile': token})
+        latest = self.client.get('/api/profiles/').data['results'][0]
+        self.assertEqual((latest['id'], latest['mode']), (response['X-Profile-Id'], 'cprofile'))
+
+    async def test_profiles_asgi_requests(self):
+        token = await sync_to_async(self.token)('sample')
+        response = await self.async_client.get('/api/products/', headers={'X-Profile': token})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(os.path.exists(os.path.join(self.directory, response['X-Profile-Id'] + '.json')))
+
+    def test_staff_only(self):
+        token = self.token('cprofile')
+        profile_id = self.client.get('/api/products/', headers={'X-Profile': token})['X-Profile-Id']
+
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(self.client.post('/api/profiles/token/', {}, format='json').status_code, 403)
+        self.assertEqual(self.client.get('/api/profiles/').status_code, 403)
+        self.assertEqual(self.client.get(f'/api/profiles/{profile_id}/').status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/profiles/').status_code, 401)
+
+    def test_keeps_only_the_newest_profiles(self):
+        token = self.token('sample')
+        profile_ids = [
+            self.client.get('/api/products/', headers={'X-Profile': token})['X-Profile-Id'] for _ in range(3)
+        ]
+
+        listed = [profile['id'] for profile in self.client.get('/api/profiles/').data['results']]
+        self.assertEqual(listed, profile_ids[:0:-1])
+        self.assertEqual(sorted(os.listdir(self.directory)), sorted(
+            profile_id + suffix for profile_id in profile_ids[1:] for suffix in ['.json', '.collapsed']
+        ))
+        self.assertEqual(self.client.get(f'/api/profiles/{profile_ids[0]}/').status_code, 404)
+
+    def test_download_rejects_anything_but_profile_ids(self):
+        os.makedirs(self.directory)
+        with open(os.path.join(os.path.dirname(self.directory), 'secret.json'), 'w') as handle:
+            json.dump({'mode': 'sample'}, handle)
+        with open(os.path.join(os.path.dirname(self.directory), 'secret.collapsed'), 'w') as handle:
+            handle.write('secret')
+
+        for profile_id in ['..%2Fsecret', '..', 'secret', '1-abcdef.json', '1-abcdeg']:
+            with self.subTest(profile_id=profile_id):
+                self.assertEqual(self.client.get(f'/api/profiles/{profile_id}/').status_code, 404)
+
+
+class RefuseAll(BaseThrottle):
+
+    def allow_request(self, request, view):
+        return False
+
+
+class BatchRequestTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        self.product = Product.objects.create(name='Lamp', price=Decimal('10.00'), stock=5)
+        self.client = APIClient()
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    def batch(self, requests, authenticated=True, **extra):
+        if authenticated:
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        return self.client.post('/api/batch/', {'requests': requests, **extra}, format='json')
+
+    def statuses(self, response):
+        return [sub['status'] for sub in response.data['responses']]
+
+    def test_home_screen_in_one_round_trip(self):
+        response = self.batch([
+            {'path': '/api/auth/profile/'},
+            {'path': '/api/products/?ordering=price'},
+            {'path': '/api/orders/'},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        profile, products, orders = response.data['responses']
+        self.assertEqual(profile['body']['email'], 'buyer@example.com')
+        self.assertEqual(products['body']['results'][0]['id'], self.product.id)
+        self.assertEqual(orders['body']['count'], 0)
+
+    def test_writes_in_a_batch_pin_the_user_to_the_primary(self):
+        response = self.batch([{'path': '/api/products/'}])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        response = self.batch([
+            {'method': 'POST', 'path': '/api/orders/', 'body': {'items': [{'product_id': self.product.id, 'quantity': 1}]}},
+            {'path': '/api/orders/'},
+        ])
+        self.assertEqual(self.statuses(response), [201, 200])
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_sub_requests_keep_their_own_permissions(self):
+        response = self.batch(
+            [{'path': '/api/products/'}, {'path': '/api/orders/'}, {'path': '/api/products/low-stock/'}],
+            authenticated=False
+        )
+        self.assertEqual(self.statuses(response), [200, 401, 401])
+
+        response = self.batch([{'path': '/api/products/low-stock/'}])
+        self.assertEqual(self.statuses(response), [403])
+
+    def test_sub_requests_keep_their_own_throttles(self):
+        with mock.patch.object(ProductViewSet, 'throttle_classes', [RefuseAll]):
+            response = self.batch([{'path': '/api/products/'}, {'path': '/api/auth/profile/'}])
+        self.assertEqual(self.statuses(response), [429, 200])
+
+    def test_writes_run_in_order(self):
+        order = {'items': [{'product_id': self.product.id, 'quantity': 2}]}
+        response = self.batch([
+            {'method': 'POST', 'path': '/api/orders/', 'body': order},
+            {'method': 'POST', 'path': '/api/orders/', 'body': {'items': []}},
+            {'path': f'/api/products/{self.product.id}/'},
+        ])
+
+        self.assertEqual(self.statuses(response), [201, 400, 200])
+        self.assertEqual(response.data['responses'][2]['body']['stock'], 3)
+
+    async def test_sub_requests_keep_the_scheme_under_asgi(self):
+        await Product.objects.abulk_create(
+            Product(name=f'Bulb {i}', price=Decimal('1.00'), stock=1) for i in range(settings.REST_FRAMEWORK['PAGE_SIZE'])
+        )
+        response = await self.async_client.post(
+            '/api/batch/', {'requests': [{'path': '/api/products/'}]},
+            content_type='application/json', headers={'Authorization': f'Bearer {self.token}'}
+        )
+        direct = await self.async_client.get('/api/products/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['responses'][0]['body']['next'], direct.json()['next'])
+        self.assertTrue(direct.json()['next'].startswith('http://testserver/'))
+
+    def test_unknown_and_nested_paths(self):
+        response = self.batch([{'path': '/api/nothing-here/'}, {'path': '/api/batch/'}])
+        self.assertEqual(self.statuses(response), [404, 404])
+
+    def test_rejects_invalid_batches(self):
+        self.assertEqual(self.batch([{'path': '/admin/'}]).status_code, 400)
+        self.assertEqual(self.batch([{'path': '/api/products/'}] * 21).status_code, 400)
+        response = self.batch([{'method': 'POST', 'path': '/api/orders/'}], parallel=True)
+        self.assertEqual(response.status_code, 400)
+
+
+class ParallelBatchTests(TransactionTestCase):
+    # Committed data: parallel sub-requests use their own connections
+
+    def test_parallel_reads(self):
+        user = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        product = Product.objects.create(name='Lamp', price=Decimal('10.00'), stock=5)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        response = client.post('/api/batch/', {
+            'parallel': True,
+            'requests': [{'path': f'/api/products/{product.id}/'}, {'path': '/api/auth/profile/'}] * 3,
+        }, format='json')
+
+        self.assertEqual([sub['status'] for sub in response.data['responses']], [200] * 6)
+        self.assertEqual(response.data['responses'][4]['body']['name'], 'Lamp')
+
+
+@override_settings(STREAM_COALESCE_SECONDS=0.05, STREAM_KEEPALIVE_SECONDS=5)
+class EventStreamTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        other = User.objects.create_user(email='other@example.com', password='testpass123')
+        self.product = Product.objects.create(name='Lamp', price=Decimal('10.00'), stock=5)
+        self.order, self.other_order = [
+            Order.objects.create(user=owner, total_amount=Decimal('10.00')) for owner in [self.user, other]
+        ]
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    @asynccontextmanager
+    async def open(self, path):
+        response = await self.async_client.get(path)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        try:
+            yield events
+        finally:
+            await events.aclose()  # Unsubscribes, like a client disconnecting
+
+    async def next_event(self, events, timeout=2):
+        return (await asyncio.wait_for(anext(events), timeout)).decode()
+
+    def commit(self, change, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            change(*args)
+
+    async def test_stock_changes_are_pushed_and_coalesced(self):
+        async with self.open(f'/api/stream/?products={self.product.id}') as events:
+            await self.check_stock_events(events)
+
+    async def check_stock_events(self, events):
+        self.assertEqual(
+            await self.next_event(events),
+            f'event: stock\ndata: {{"product": {self.product.id}, "stock": 5}}\n\n'
+        )
+
+        # Three changes before the client reads again: one event, latest stock
+        for quantity in [1, 1, 1]:
+            await sync_to_async(self.commit)(self.product.reduce_stock, quantity)
+        await sync_to_async(self.commit)(Product.objects.increase_stock_bulk, {self.product.id: 10})
+
+        self.assertEqual(
+            await self.next_event(events),
+            f'event: stock\ndata: {{"product": {self.product.id}, "stock": 12}}\n\n'
+        )
+
+    async def test_own_order_status_changes_with_query_token(self):
+        async with self.open(f'/api/stream/?token={self.token}') as events:
+            await self.check_order_events(events)
+        self.assertFalse(broker.wants([f'user:{self.user.id}']))
+
+    async def check_order_events(self, events):
+        pending = asyncio.ensure_future(self.next_event(events))
+        # The stream subscribes once it is first iterated
+        while not broker.wants([f'user:{self.user.id}']):
+            await asyncio.sleep(0.01)
+
+        await sync_to_async(self.commit)(
+            state_machine.apply, 'confirm', [self.order.id, self.other_order.id]
+        )
+
+        self.assertEqual(
+            await pending,
+            f'event: order\ndata: {{"order": {self.order.id}, "status": "confirmed"}}\n\n'
+        )
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.next_event(events, timeout=0.3)
+
+    def test_no_stock_query_without_subscribers(self):
+        with self.assertNumQueries(0):
+            publish_stock([self.product.id])
+
+    async def test_rejects_bad_requests(self):
+        self.assertEqual((await self.async_client.get('/api/stream/?token=nope')).status_code, 401)
+        self.assertEqual((await self.async_client.get('/api/stream/')).status_code, 400)
+        self.assertEqual((await self.async_client.get('/api/stream/?products=x')).status_code, 400)
+
+    def test_not_served_under_wsgi(self):
+        # The endless stream would hold a WSGI worker forever
+        response = self.client.get(f'/api/stream/?products={self.product.id}')
+        self.assertEqual(response.status_code, 501)
+        self.assertFalse(response.streaming)
+
+
+class LeanApiMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='testpass123', is_staff=True)
+        self.bearer = f'Bearer {RefreshToken.for_user(self.user).access_token}'
+
+    def profile(self, client, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/auth/profile/', **headers)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries]
+
+    def test_bearer_requests_skip_browser_middleware(self):
+        # A session cookie left over from the admin rides along
+        self.client.login(email='buyer@example.com', password='testpass123')
+
+        response, queries = self.profile(self.client, HTTP_AUTHORIZATION=self.bearer)
+
+        self.assertNotIn('X-Frame-Options', response)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
+        self.assertFalse([sql for sql in queries if 'django_session' in sql])
+
+    async def test_bearer_requests_skip_browser_middleware_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get('/api/auth/profile/', headers={'Authorization': self.bearer})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Frame-Options', response)
+        self.assertFalse(hasattr(response.asgi_request, 'session'))
+
+        response = await self.async_client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        self.assertEqual(response.data['email'], 'buyer@example.com')
+
+    async def test_wrapped_process_view_hooks_still_run_under_asgi(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        middleware = BrowserMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        self.assertTrue(iscoroutinefunction(middleware.process_view))
+        view = lambda request: HttpResponse()
+
+        form_post = RequestFactory().post('/orders/form/')
+        self.assertEqual((await middleware.process_view(form_post, view, (), {})).status_code, 403)
+
+        api_post = RequestFactory().post('/api/orders/', HTTP_AUTHORIZATION=self.bearer)
+        await middleware(api_post)
+        self.assertIsNone(await middleware.process_view(api_post, view, (), {}))
+
+    def test_session_requests_keep_full_stack(self):
+        self.client.login(email='buyer@example.com', password='testpass123')
+
+        response, queries = self.profile(self.client)
+
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+        self.assertTrue([sql for sql in queries if 'django_session' in sql])
+
+    @override_settings(LEAN_API=False)
+    def test_can_be_turned_off(self):
+        response, _ = self.profile(self.client, HTTP_AUTHORIZATION=self.bearer)
+        self.assertEqual(response['X-Frame-Options'], 'DENY')
+
+    def test_wrapped_process_view_hooks_still_run(self):
+        # CsrfViewMiddleware checks views in process_view, outside the chain
+        middleware = BrowserMiddleware(lambda request: HttpResponse())
+        view = lambda request: HttpResponse()
+
+        form_post = RequestFactory().post('/orders/form/')
+        self.assertEqual(middleware.process_view(form_post, view, (), {}).status_code, 403)
+
+        api_post = RequestFactory().post('/api/orders/', HTTP_AUTHORIZATION=self.bearer)
+        middleware(api_post)
+        self.assertIsNone(middleware.process_view(api_post, view, (), {}))
+
+    def test_requires_admin_middleware_while_admin_is_installed(self):
+        browser_middleware = [
+            path for path in settings.BROWSER_MIDDLEWARE if not path.endswith('MessageMiddleware')
+        ]
+        with override_settings(BROWSER_MIDDLEWARE=browser_middleware):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'MessageMiddleware'):
+                BrowserMiddleware(lambda request: HttpResponse())
+            installed_apps = [app for app in settings.INSTALLED_APPS if app != 'django.contrib.admin']
+            with override_settings(INSTALLED_APPS=installed_apps):
+                BrowserMiddleware(lambda request: HttpResponse())
+
+    def test_static_files_are_served_before_browser_middleware(self):
+        self.assertEqual(settings.MIDDLEWARE[:2], [
+            'django.middleware.security.SecurityMiddleware',
+            'ecommerce_backend.static.WhiteNoiseMiddleware',
+        ])
+        self.assertTrue(issubclass(WhiteNoiseMiddleware, whitenoise.middleware.WhiteNoiseMiddleware))
@@ -0,0 +1,44 @@
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+LOCK_ERROR_MESSAGES = (
+    'database is locked',         # SQLite: writer still busy after the busy timeout
+    'database table is locked',   # SQLite: shared-cache table lock
+    'deadlock detected',          # PostgreSQL
+)
+
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return any(text in message for text in LOCK_ERROR_MESSAGES)
+
+
+def retry_on_lock(func):
+    """
+    Re-run a whole transaction when it loses a lock race.
+
+    Apply it outside ``transaction.atomic`` so every attempt starts a fresh
+    transaction. Inside an enclosing atomic block the error is re-raised
+    untouched, since only the outermost transaction can be retried.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if connection.in_atomic_block:
+            return func(*args, **kwargs)
+
+        attempts = settings.DB_LOCK_RETRY_ATTEMPTS
+        for attempt in range(1, attempts + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as exc:
+                if attempt == attempts or not is_lock_error(exc):
+                    raise
+                # Exponential backoff with jitter so retries don't collide again
+                delay = settings.DB_LOCK_RETRY_BACKOFF * 2 ** (attempt - 1)
+                time.sleep(delay * random.uniform(0.5, 1.5))
+
+    return wrapper
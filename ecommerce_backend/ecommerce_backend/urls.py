@@ -1,13 +1,28 @@
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
+from . import batch, profiling, streams
 
 urlpatterns = [
-    # Django admin
-     path('admin/', admin.site.urls),
-    
     # API endpoints
      path('api/auth/', include('users.urls')),
     # Products and Orders URLs will be added in next steps
      path('api/', include('products.urls')),
      path('api/', include('orders.urls')),
-]
\ No newline at end of file
+    
+    # Several API calls in one round trip
+     path('api/batch/', batch.batch, name='batch'),
+    
+    # Live stock and order status (server-sent events, ASGI)
+     path('api/stream/', streams.stream, name='event-stream'),
+    
+    # Request profiles (staff only)
+     path('api/profiles/', profiling.profile_list, name='profile-list'),
+     path('api/profiles/token/', profiling.profile_token, name='profile-token'),
+     path('api/profiles/<str:profile_id>/', profiling.profile_download, name='profile-download'),
+]
+
+if settings.ADMIN_ENABLED:
+    from django.contrib import admin
+
+    # Django admin
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
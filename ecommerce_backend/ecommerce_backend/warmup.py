@@ -0,0 +1,29 @@
+"""
+Worker warm-up: do the lazy first-request work before accepting traffic.
+
+Django builds a lot on first use: the URL resolver's reverse maps (compiling
+every pattern's regex on the way) and the database connection. ``warm_up``
+does both up front; gunicorn calls it from ``post_worker_init`` (see
+gunicorn.conf.py). DRF serializer field maps are not warmed: they are rebuilt
+for every serializer instance, so there is nothing to keep.
+"""
+import time
+
+from django.db import connections
+from django.urls import get_resolver
+
+
+def warm_up():
+    """Populate URL and connection caches; returns timings in ms"""
+    timings = {}
+
+    started = time.perf_counter()
+    get_resolver().reverse_dict  # Builds the reverse/namespace maps for every pattern
+    timings['urls'] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for alias in connections:
+        connections[alias].ensure_connection()
+    timings['connections'] = (time.perf_counter() - started) * 1000
+
+    return timings
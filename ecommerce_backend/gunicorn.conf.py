@@ -0,0 +1,11 @@
+# Loaded automatically by gunicorn from the working directory
+
+
+def post_worker_init(worker):
+    # Runs after the app is loaded and before the worker accepts requests
+    from ecommerce_backend.warmup import warm_up
+
+    timings = warm_up()
+    worker.log.info(
+        'Warm-up done: ' + ', '.join(f'{name} {ms:.0f} ms' for name, ms in timings.items())
+    )
@@ -1,11 +1,17 @@
-from django.contrib import admin
-from .models import Order, OrderItem
+from django.contrib import admin, messages
+from django.db.models import Count, OuterRef, Subquery
+from ecommerce_backend.estimated_counts import EstimatedCountAdminMixin
+from .models import Order, OrderEvent, OrderItem
+from . import state_machine
+from .services import cancel_orders
 
 
 class OrderItemInline(admin.TabularInline):
    
     model = OrderItem
     extra = 0
+    # Search-as-you-type instead of a <select> holding every product
+    autocomplete_fields = ['product']
     readonly_fields = ['price', 'get_subtotal']
     fields = ['product', 'quantity', 'price', 'get_subtotal']
     
@@ -17,15 +23,32 @@ class OrderItemInline(admin.TabularInline):
     get_subtotal.short_description = 'Subtotal'
 
 
+class OrderEventInline(admin.TabularInline):
+    
+    model = OrderEvent
+    extra = 0
+    can_delete = False
+    fields = ['from_status', 'to_status', 'actor', 'created_at']
+    readonly_fields = fields
+    
+    def has_add_permission(self, request, obj=None):
+        
+        return False
+
+
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
    
     list_display = ['id', 'user', 'status', 'total_amount', 'item_count', 'created_at']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
     list_filter = ['status', 'created_at']
     search_fields = ['id', 'user__email']
     ordering = ['-created_at']
-    readonly_fields = ['total_amount', 'created_at', 'updated_at']
-    inlines = [OrderItemInline]
+    # Status changes go through the actions so every one is recorded
+    readonly_fields = ['status', 'total_amount', 'created_at', 'updated_at']
+    inlines = [OrderItemInline, OrderEventInline]
+    actions = ['confirm_selected_orders', 'complete_selected_orders', 'cancel_selected_orders']
     
     fieldsets = (
         ('Order Information', {
@@ -37,20 +60,66 @@ class OrderAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        # Correlated subquery: evaluated only for the rows on the current page
+        item_count = (
+            OrderItem.objects.filter(order=OuterRef('pk'))
+            .order_by()
+            .values('order')
+            .annotate(count=Count('id'))
+            .values('count')
+        )
+        return super().get_queryset(request).annotate(item_count=Subquery(item_count))
+    
     def item_count(self, obj):
         
-        return obj.items.count()
+        return obj.item_count or 0
     item_count.short_description = 'Items'
     
     def has_delete_permission(self, request, obj=None):
         
         return False
+    
+    def report_transition(self, request, results, target):
+        
+        moved = sum(1 for result in results.values() if result == target)
+        skipped = len(results) - moved
+        
+        self.message_user(request, f'{moved} orders {target}.', messages.SUCCESS)
+        if skipped:
+            self.message_user(
+                request,
+                f'{skipped} orders skipped because their status does not allow this change.',
+                messages.WARNING
+            )
+    
+    @admin.action(description='Confirm selected orders')
+    def confirm_selected_orders(self, request, queryset):
+        
+        results = state_machine.apply('confirm', queryset.values_list('id', flat=True), actor=request.user)
+        self.report_transition(request, results, 'confirmed')
+    
+    @admin.action(description='Complete selected orders')
+    def complete_selected_orders(self, request, queryset):
+        
+        results = state_machine.apply('complete', queryset.values_list('id', flat=True), actor=request.user)
+        self.report_transition(request, results, 'completed')
+    
+    @admin.action(description='Cancel selected orders and restore stock')
+    def cancel_selected_orders(self, request, queryset):
+        
+        results = cancel_orders(queryset.values_list('id', flat=True), actor=request.user)
+        self.report_transition(request, results, 'cancelled')
 
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
    
     list_display = ['id', 'order', 'product', 'quantity', 'price', 'get_subtotal']
+    # The order column renders Order.__str__, which shows the buyer's email
+    list_select_related = ['order__user', 'product']
+    raw_id_fields = ['order']
+    autocomplete_fields = ['product']
     list_filter = ['order__status']
     search_fields = ['order__id', 'product__name']
     readonly_fields = ['price', 'get_subtotal']
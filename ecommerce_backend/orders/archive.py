@@ -0,0 +1,86 @@
+"""
+Hot/cold order archiving.
+
+Finished orders older than a cutoff are copied into ``ArchivedOrder`` and
+removed from the live ``Order``/``OrderItem`` tables, one committed batch at
+a time. An interrupted run simply picks up where it stopped.
+
+Anything that reads sales history further back than the cutoff must read
+archived orders too; ``archived_items`` unpacks their line items.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from ecommerce_backend.transactions import retry_on_lock
+from .models import ArchivedOrder, Order, OrderItem
+from .serializers import OrderItemSerializer
+
+ARCHIVABLE_STATUSES = ['completed', 'cancelled']
+
+
+def default_cutoff():
+    return timezone.now() - timedelta(days=settings.ORDER_ARCHIVE_AFTER_DAYS)
+
+
+def archive_orders(cutoff=None, batch_size=1000, max_batches=None):
+    """Archive finished orders created before ``cutoff``; returns the count"""
+    cutoff = cutoff or default_cutoff()
+    archived = batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = _archive_batch(cutoff, batch_size)
+        if not moved:
+            break
+        archived += moved
+        batches += 1
+    return archived
+
+
+@retry_on_lock
+@transaction.atomic
+def _archive_batch(cutoff, batch_size):
+    order_ids = list(
+        Order.objects.select_for_update()
+        .filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff)
+        .order_by('id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    if not order_ids:
+        return 0
+
+    orders = Order.objects.filter(id__in=order_ids).prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+    )
+    ArchivedOrder.objects.bulk_create(
+        [
+            ArchivedOrder(
+                id=order.id,
+                user_id=order.user_id,
+                status=order.status,
+                total_amount=order.total_amount,
+                items=OrderItemSerializer(order.items.all(), many=True).data,
+                created_at=order.created_at,
+                updated_at=order.updated_at,
+            )
+            for order in orders
+        ],
+        ignore_conflicts=True,
+    )
+
+    OrderItem.objects.filter(order_id__in=order_ids).delete()
+    Order.objects.filter(id__in=order_ids).delete()
+    return len(order_ids)
+
+
+def archived_items(queryset, chunk_size=2000):
+    """
+    ``(order_id, created_at, product_id, quantity)`` for every line item of
+    these archived orders, read from their denormalized ``items``
+    """
+    rows = queryset.order_by().values_list('id', 'created_at', 'items').iterator(chunk_size=chunk_size)
+    for order_id, created_at, items in rows:
+        for item in items:
+            yield order_id, created_at, item['product'], item['quantity']
@@ -0,0 +1,179 @@
+"""
+Group commit for concurrent order placement.
+
+With ``ORDER_BATCHING`` on, orders placed at the same time in one process
+are collected for up to ``ORDER_BATCH_MAX_DELAY_MS`` and written in a
+single transaction: products are locked once, stock is checked for the
+whole batch in arrival order and taken off with one UPDATE, and orders and
+items are bulk inserted. Each caller then gets its own order, or its own
+validation error if its items no longer fit.
+
+The first caller of a batch acts as its leader and runs it on its own
+thread and connection, so there is no background worker to manage.
+"""
+import threading
+from concurrent.futures import Future
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from rest_framework import serializers
+
+from ecommerce_backend.transactions import retry_on_lock
+from products.models import Product
+from users.stats import record_orders
+from .models import Order, OrderItem
+
+# Outcome telling a caller to place its order on its own instead: sharded
+# products take stock through their shards, and a failed batch is retried
+# order by order
+PLACE_ALONE = object()
+
+
+class PendingOrder:
+
+    def __init__(self, user, items):
+        self.user = user
+        self.items = items
+        self.result = Future()
+
+
+class Batch:
+
+    def __init__(self):
+        self.orders = []
+        self.full = threading.Event()
+
+
+class OrderBatcher:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.open_batch = None
+
+    def accepts(self):
+        # An enclosing transaction (e.g. idempotent creates) must own its
+        # order, and bulk inserted orders need their ids back
+        return (
+            settings.ORDER_BATCHING
+            and not connection.in_atomic_block
+            and connection.features.can_return_rows_from_bulk_insert
+        )
+
+    def submit(self, user, items):
+        """Place an order as part of the current batch; returns the order or PLACE_ALONE"""
+        pending = PendingOrder(user, items)
+        with self.lock:
+            batch = self.open_batch
+            leader = batch is None
+            if leader:
+                batch = self.open_batch = Batch()
+            batch.orders.append(pending)
+            if len(batch.orders) >= settings.ORDER_BATCH_MAX_SIZE:
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(settings.ORDER_BATCH_MAX_DELAY_MS / 1000)
+            with self.lock:
+                self.open_batch = None
+            self.run(batch.orders)
+
+        return pending.result.result()
+
+    def run(self, pending_orders):
+        try:
+            outcomes = place_batch(pending_orders)
+        except Exception:
+            # Nothing was committed, so every caller can safely go again alone
+            outcomes = [PLACE_ALONE] * len(pending_orders)
+
+        for pending, outcome in zip(pending_orders, outcomes):
+            if isinstance(outcome, Exception):
+                pending.result.set_exception(outcome)
+            else:
+                pending.result.set_result(outcome)
+
+
+def reserve(items, products, available):
+    """Take one order's items out of ``available``; returns why it cannot be placed, if so"""
+    seen = set()
+    for item in items:
+        product = products.get(item['product_id'])
+        if product is None:
+            return serializers.ValidationError(f"Product with ID {item['product_id']} does not exist.")
+        if product.stock_shards:
+            return PLACE_ALONE
+        if product.id in seen:
+            return serializers.ValidationError(f"'{product.name}' appears more than once in the order.")
+        seen.add(product.id)
+        if available[product.id] < item['quantity']:
+            return serializers.ValidationError(f"Insufficient stock for '{product.name}'.")
+
+    for item in items:
+        available[item['product_id']] -= item['quantity']
+    return None
+
+
+@retry_on_lock
+@transaction.atomic
+def place_batch(pending_orders):
+    """
+    Place a batch of orders in one transaction.
+
+    Returns one outcome per pending order: the created ``Order``, a
+    ``ValidationError`` or ``PLACE_ALONE``. Callers are settled by the
+    batcher only after commit, so a lock retry can re-run this safely.
+    """
+    product_ids = {item['product_id'] for pending in pending_orders for item in pending.items}
+    products = {
+        product.id: product
+        for product in Product.objects.select_for_update()
+        .filter(id__in=product_ids)
+        .order_by('id')
+    }
+
+    # First come, first served: later orders see what earlier ones left
+    available = {product_id: product.stock for product_id, product in products.items()}
+    outcomes = [reserve(pending.items, products, available) for pending in pending_orders]
+    accepted = [index for index, outcome in enumerate(outcomes) if outcome is None]
+
+    quantities = {}
+    for index in accepted:
+        for item in pending_orders[index].items:
+            quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+    Product.objects.decrease_stock_bulk(quantities)
+
+    orders = Order.objects.bulk_create([
+        Order(
+            user=pending_orders[index].user,
+            total_amount=sum(
+                (products[item['product_id']].price * item['quantity'] for item in pending_orders[index].items),
+                Decimal('0.00')
+            )
+        )
+        for index in accepted
+    ])
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product=products[item['product_id']],
+            quantity=item['quantity'],
+            price=products[item['product_id']].price  # Capture current price
+        )
+        for order, index in zip(orders, accepted)
+        for item in pending_orders[index].items
+    ])
+    record_orders(orders)
+
+    for order, index in zip(orders, accepted):
+        outcomes[index] = order
+        # bulk_create skips post_save; send it so order notifications still go out
+        post_save.send(
+            sender=Order, instance=order, created=True,
+            update_fields=None, raw=False, using=order._state.db
+        )
+    return outcomes
+
+
+batcher = OrderBatcher()
@@ -0,0 +1,35 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.archive import archive_orders
+
+
+class Command(BaseCommand):
+    help = 'Moves old completed and cancelled orders into the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days',
+            type=int,
+            default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help='Archive orders created more than this many days ago'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Orders moved per transaction')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches (resume later)')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['older_than_days'])
+        started = time.perf_counter()
+        archived = archive_orders(
+            cutoff=cutoff,
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} orders created before {cutoff:%Y-%m-%d} '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
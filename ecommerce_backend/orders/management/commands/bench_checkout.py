@@ -0,0 +1,160 @@
+import contextlib
+import io
+import multiprocessing
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+from rest_framework import serializers
+
+from orders.models import Order
+from orders.serializers import OrderCancelSerializer, OrderCreateSerializer
+from products.models import Product
+from products.shards import configure as configure_shards
+
+User = get_user_model()
+
+BENCH_EMAIL = 'bench-checkout@example.com'
+BENCH_PRODUCT_PREFIX = 'Bench checkout product'
+
+
+def shop(seed, user, product_ids, orders, items, cancel_ratio):
+    """One shopper: place orders back to back, cancelling some"""
+    rng = random.Random(seed)
+    request = SimpleNamespace(user=user)
+    items = min(items, len(product_ids))
+    counts = {'placed': 0, 'cancelled': 0, 'locked': 0, 'rejected': 0}
+    latencies = []
+
+    for _ in range(orders):
+        data = {'items': [
+            {'product_id': product_id, 'quantity': 1}
+            for product_id in rng.sample(product_ids, items)
+        ]}
+        started = time.perf_counter()
+        try:
+            serializer = OrderCreateSerializer(data=data, context={'request': request})
+            serializer.is_valid(raise_exception=True)
+            order = serializer.save()
+            counts['placed'] += 1
+            if rng.random() < cancel_ratio:
+                cancel = OrderCancelSerializer(order, data={})
+                cancel.is_valid(raise_exception=True)
+                cancel.save()
+                counts['cancelled'] += 1
+        except OperationalError:
+            counts['locked'] += 1
+        except serializers.ValidationError:
+            counts['rejected'] += 1
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    connection.close()
+    return counts, latencies
+
+
+def buyer(seed, user_id, product_ids, orders, items, cancel_ratio, threads):
+    """One buyer process, running ``threads`` shoppers (they share the order batcher)"""
+    user = User.objects.get(id=user_id)
+    connection.close()
+    # Order signals print a notification per order; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(threads) as pool:
+            outcomes = list(pool.map(
+                lambda n: shop(seed * threads + n, user, product_ids, orders, items, cancel_ratio),
+                range(threads)
+            ))
+
+    counts = {'placed': 0, 'cancelled': 0, 'locked': 0, 'rejected': 0}
+    latencies = []
+    for shopper_counts, shopper_latencies in outcomes:
+        for key, value in shopper_counts.items():
+            counts[key] += value
+        latencies.extend(shopper_latencies)
+    return counts, latencies
+
+
+class Command(BaseCommand):
+    help = 'Measures concurrent order placement throughput against the configured database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buyers', type=int, default=8, help='Concurrent buyer processes')
+        parser.add_argument('--threads', type=int, default=1, help='Concurrent shoppers per buyer process')
+        parser.add_argument('--orders', type=int, default=50, help='Orders per shopper')
+        parser.add_argument('--products', type=int, default=20, help='Distinct products in the pool')
+        parser.add_argument('--items', type=int, default=2, help='Line items per order')
+        parser.add_argument('--cancel-ratio', type=float, default=0.2, help='Share of orders cancelled right away')
+        parser.add_argument(
+            '--shards', type=lambda value: [int(n) for n in value.split(',')], default=[0],
+            help='Comma-separated stock shard counts to compare, e.g. 0,4,16 (0 = not sharded)'
+        )
+        parser.add_argument('--keep', action='store_true', help='Keep benchmark orders and products')
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(email=BENCH_EMAIL)
+        self.stdout.write(
+            f"Database: {connection.vendor}, SQLite tuning: {settings.SQLITE_TUNING}, "
+            f"lock retries: {settings.DB_LOCK_RETRY_ATTEMPTS}, "
+            f"{options['buyers']} buyers x {options['threads']} threads x {options['orders']} orders, "
+            f"order batching: {settings.ORDER_BATCHING}"
+        )
+        # e.g. --products 1 --items 1 --shards 0,4,16 for one hot SKU
+        for shards in options['shards']:
+            self.run(user, shards, options)
+
+    def run(self, user, shards, options):
+        products = [
+            Product.objects.create(
+                name=f'{BENCH_PRODUCT_PREFIX} {n}',
+                price=Decimal('9.99'),
+                stock=options['buyers'] * options['threads'] * options['orders'] * options['items'],
+            )
+            for n in range(options['products'])
+        ]
+        product_ids = [product.id for product in products]
+        if shards:
+            for product_id in product_ids:
+                configure_shards(product_id, shards)
+
+        # Separate processes so buyers really contend for the database
+        # (threads would mostly take turns on the GIL). Children must not
+        # inherit the parent's open connection.
+        connection.close()
+        context = multiprocessing.get_context('fork')
+        started = time.perf_counter()
+        with context.Pool(options['buyers']) as pool:
+            outcomes = pool.starmap(buyer, [
+                (seed, user.id, product_ids, options['orders'], options['items'],
+                 options['cancel_ratio'], options['threads'])
+                for seed in range(options['buyers'])
+            ])
+        elapsed = time.perf_counter() - started
+
+        totals = {'placed': 0, 'cancelled': 0, 'locked': 0, 'rejected': 0}
+        latencies = []
+        for counts, buyer_latencies in outcomes:
+            for key, value in counts.items():
+                totals[key] += value
+            latencies.extend(buyer_latencies)
+        latencies.sort()
+
+        self.stdout.write(f"Stock shards per product: {shards or 'off'}")
+        self.stdout.write(
+            f"  placed {totals['placed']}, cancelled {totals['cancelled']}, "
+            f"failed with lock errors {totals['locked']}, rejected {totals['rejected']} in {elapsed:.2f}s"
+        )
+        self.stdout.write(
+            f"  throughput {totals['placed'] / elapsed:.0f} orders/s, "
+            f"p50 {statistics.median(latencies):.1f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f} ms"
+        )
+
+        if not options['keep']:
+            Order.objects.filter(user=user).delete()
+            Product.objects.filter(id__in=product_ids).delete()
@@ -0,0 +1,246 @@
+import itertools
+import random
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from products.models import Product
+from users.stats import rebuild_all
+
+User = get_user_model()
+
+ADJECTIVES = [
+    'Classic', 'Compact', 'Deluxe', 'Eco', 'Ultra', 'Smart', 'Pro', 'Mini',
+    'Rugged', 'Vintage', 'Wireless', 'Portable', 'Premium', 'Basic', 'Turbo',
+]
+NOUNS = [
+    'Laptop', 'Headphones', 'Backpack', 'Kettle', 'Monitor', 'Keyboard',
+    'Lamp', 'Chair', 'Watch', 'Camera', 'Speaker', 'Bottle', 'Jacket',
+    'Charger', 'Blender', 'Notebook', 'Drone', 'Router', 'Mouse', 'Desk',
+]
+FIRST_NAMES = ['Ava', 'Liam', 'Noah', 'Emma', 'Mia', 'Omar', 'Sara', 'Ravi', 'Yuki', 'Lena']
+LAST_NAMES = ['Khan', 'Smith', 'Garcia', 'Chen', 'Patel', 'Muller', 'Rossi', 'Silva', 'Kim', 'Ali']
+
+STATUS_WEIGHTS = [
+    ('pending', 10),
+    ('confirmed', 15),
+    ('completed', 65),
+    ('cancelled', 10),
+]
+
+# Markov-modulated arrivals: orders switch between a quiet and a burst
+# state; inside a burst the gap between orders is BURST_SPEEDUP times shorter.
+BURST_ENTER_PROBABILITY = 0.002
+BURST_EXIT_PROBABILITY = 0.005
+BURST_SPEEDUP = 10
+
+
+@contextmanager
+def manual_timestamps(*fields):
+    """Let bulk_create keep generated values for auto_now_add fields"""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+def next_id(model):
+    return (model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = 'Generates a large synthetic dataset of users, products and orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Users to create')
+        parser.add_argument('--products', type=int, default=1000, help='Products to create')
+        parser.add_argument('--orders', type=int, default=10000, help='Orders to create')
+        parser.add_argument('--max-items', type=int, default=5, help='Maximum line items per order')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create batch')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (runs are deterministic)')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent of product popularity')
+        parser.add_argument('--days', type=int, default=365, help='Spread order timestamps over this many days')
+        parser.add_argument('--password', default='password123', help='Password shared by all seeded users')
+
+    def handle(self, *args, **options):
+        if options['max_items'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--max-items and --batch-size must be positive.')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        if options['users']:
+            self.seed_users(options['users'], options['password'])
+        if options['products']:
+            self.seed_products(options['products'])
+        if options['orders']:
+            self.seed_orders(options['orders'], options['max_items'], options['zipf'], options['days'])
+            # bulk_create bypasses the incremental upkeep
+            rebuild_started = time.perf_counter()
+            self.report('customer stats', rebuild_all(self.batch_size), rebuild_started)
+
+        self.reset_sequences()
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeding finished in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def report(self, label, rows, started):
+        elapsed = time.perf_counter() - started
+        rate = rows / elapsed if elapsed else rows
+        self.stdout.write(f'  {label}: {rows:,} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)')
+
+    def insert_batches(self, model, rows):
+        """Consume a generator of model instances in bounded batches"""
+        total = 0
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                return total
+            model.objects.bulk_create(batch, batch_size=self.batch_size)
+            total += len(batch)
+
+    def seed_users(self, count, password):
+        # Hash once: PBKDF2 per user would dominate the whole run
+        password_hash = make_password(password)
+        first_id = next_id(User)
+        now = timezone.now()
+        rng = self.rng
+
+        def rows():
+            for user_id in range(first_id, first_id + count):
+                yield User(
+                    id=user_id,
+                    email=f'user{user_id}@seed.example.com',
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    password=password_hash,
+                    date_joined=now - timedelta(seconds=rng.randrange(3 * 365 * 86400)),
+                )
+
+        started = time.perf_counter()
+        self.report('users', self.insert_batches(User, rows()), started)
+
+    def seed_products(self, count):
+        first_id = next_id(Product)
+        now = timezone.now()
+        rng = self.rng
+
+        def rows():
+            for product_id in range(first_id, first_id + count):
+                # Log-normal prices: many cheap items, a long tail of expensive ones
+                price = Decimal(min(max(rng.lognormvariate(3.5, 1.0), 0.5), 99999)).quantize(Decimal('0.01'))
+                yield Product(
+                    id=product_id,
+                    name=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {product_id}',
+                    description=f'Synthetic product #{product_id} generated for load testing.',
+                    price=price,
+                    stock=rng.randrange(0, 500),
+                    created_at=now - timedelta(seconds=rng.randrange(2 * 365 * 86400)),
+                )
+
+        started = time.perf_counter()
+        with manual_timestamps(Product._meta.get_field('created_at')):
+            self.report('products', self.insert_batches(Product, rows()), started)
+
+    def seed_orders(self, count, max_items, zipf, days):
+        rng = self.rng
+        user_ids = array('q', User.objects.values_list('id', flat=True).order_by('id').iterator())
+        product_ids = array('q')
+        product_cents = array('q')
+        for product_id, price in Product.objects.values_list('id', 'price').order_by('id').iterator():
+            product_ids.append(product_id)
+            product_cents.append(int(price * 100))
+        if not user_ids or not product_ids:
+            raise CommandError('Orders need at least one user and one product.')
+
+        # Popularity rank -> product index, so the best sellers are not simply the oldest ids
+        ranked = array('q', range(len(product_ids)))
+        rng.shuffle(ranked)
+        cum_weights = list(itertools.accumulate(1.0 / (rank + 1) ** zipf for rank in range(len(ranked))))
+        item_counts = list(range(1, max_items + 1))
+        item_weights = [1.0 / n ** 1.5 for n in item_counts]
+        statuses = [status for status, _ in STATUS_WEIGHTS]
+        status_weights = [weight for _, weight in STATUS_WEIGHTS]
+
+        # Pick a quiet-state gap so the expected run ends roughly now
+        span = days * 86400
+        burst_share = BURST_ENTER_PROBABILITY / (BURST_ENTER_PROBABILITY + BURST_EXIT_PROBABILITY)
+        base_gap = span / count / ((1 - burst_share) + burst_share / BURST_SPEEDUP)
+
+        first_order_id = next_id(Order)
+        first_item_id = next_id(OrderItem)
+        created_at = timezone.now() - timedelta(seconds=span)
+        in_burst = False
+        item_id = first_item_id
+        order_rows = item_rows = 0
+        started = time.perf_counter()
+
+        created_field = Order._meta.get_field('created_at')
+        with manual_timestamps(created_field):
+            for batch_start in range(0, count, self.batch_size):
+                orders, items = [], []
+                for order_id in range(first_order_id + batch_start,
+                                      first_order_id + min(batch_start + self.batch_size, count)):
+                    if in_burst:
+                        in_burst = rng.random() >= BURST_EXIT_PROBABILITY
+                    else:
+                        in_burst = rng.random() < BURST_ENTER_PROBABILITY
+                    gap = base_gap / BURST_SPEEDUP if in_burst else base_gap
+                    created_at += timedelta(seconds=rng.expovariate(1.0 / gap))
+
+                    wanted = rng.choices(item_counts, item_weights)[0]
+                    picks = rng.choices(ranked, cum_weights=cum_weights, k=wanted)
+                    total_cents = 0
+                    for index in dict.fromkeys(picks):  # unique_together (order, product)
+                        quantity = rng.choices((1, 2, 3, 4), (70, 18, 8, 4))[0]
+                        cents = product_cents[index]
+                        total_cents += cents * quantity
+                        items.append(OrderItem(
+                            id=item_id,
+                            order_id=order_id,
+                            product_id=product_ids[index],
+                            quantity=quantity,
+                            price=Decimal(cents) / 100,
+                        ))
+                        item_id += 1
+
+                    orders.append(Order(
+                        id=order_id,
+                        user_id=rng.choice(user_ids),
+                        status=rng.choices(statuses, status_weights)[0],
+                        total_amount=Decimal(total_cents) / 100,
+                        created_at=created_at,
+                    ))
+
+                with transaction.atomic():
+                    Order.objects.bulk_create(orders, batch_size=self.batch_size)
+                    OrderItem.objects.bulk_create(items, batch_size=self.batch_size)
+                order_rows += len(orders)
+                item_rows += len(items)
+
+        self.report('orders', order_rows, started)
+        self.stdout.write(f'  order items: {item_rows:,} rows')
+
+    def reset_sequences(self):
+        """Explicit ids bypass the sequences, so move them past the new rows"""
+        statements = connection.ops.sequence_reset_sql(no_style(), [User, Product, Order, OrderItem])
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
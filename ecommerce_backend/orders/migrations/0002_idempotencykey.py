@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-19 07:47
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Value of the Idempotency-Key header', max_length=255)),
+                ('request_hash', models.CharField(help_text='SHA-256 of the request body the key was first used with', max_length=64)),
+                ('response_status', models.PositiveSmallIntegerField(help_text='HTTP status of the stored response', null=True)),
+                ('response_body', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Stored response replayed to retries', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, help_text='Timestamp when the key was first used')),
+                ('order', models.ForeignKey(help_text='Order created by the first request', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='orders.order')),
+                ('user', models.ForeignKey(help_text='User who sent the request', on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Idempotency Key',
+                'verbose_name_plural': 'Idempotency Keys',
+                'constraints': [models.UniqueConstraint(fields=('user', 'key'), name='unique_idempotency_key_per_user')],
+            },
+        ),
+    ]
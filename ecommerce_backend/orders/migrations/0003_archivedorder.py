@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-19 08:05
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_idempotencykey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigIntegerField(help_text='Id the order had in the live table', primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('cancelled', 'Cancelled'), ('completed', 'Completed')], help_text='Final order status', max_length=20)),
+                ('total_amount', models.DecimalField(decimal_places=2, help_text='Total order amount', max_digits=10)),
+                ('items', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Serialized order items')),
+                ('created_at', models.DateTimeField(help_text='Timestamp when order was created')),
+                ('updated_at', models.DateTimeField(help_text='Timestamp when order was last updated')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when order was archived')),
+                ('user', models.ForeignKey(help_text='User who placed the order', on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Archived Order',
+                'verbose_name_plural': 'Archived Orders',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', '-created_at'], name='orders_arch_user_id_6febd8_idx')],
+            },
+        ),
+    ]
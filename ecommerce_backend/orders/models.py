@@ -1,6 +1,7 @@
 
 from django.db import models
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from products.models import Product
@@ -19,13 +20,13 @@ class Order(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name='orders',
+        db_index=False,  # Led by the (user, -created_at) index below
         help_text="User who placed the order"
     )
     status = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
         default='pending',
-        db_index=True,
         help_text="Current order status"
     )
     total_amount = models.DecimalField(
@@ -47,9 +48,15 @@ class Order(models.Model):
         ordering = ['-created_at']
         verbose_name = 'Order'
         verbose_name_plural = 'Orders'
+        # Each index matches a query shape; see QueryPlanTests in
+        # ecommerce_backend/tests.py before adding or dropping one
         indexes = [
+            # A customer's order history, newest first
             models.Index(fields=['user', '-created_at']),
-            models.Index(fields=['status']),
+            # Staff listing and admin changelist, newest first
+            models.Index(fields=['-created_at'], name='order_created_idx'),
+            # Filtering by status (admin, bulk actions, archiving) sorted by date
+            models.Index(fields=['status', '-created_at'], name='order_status_created_idx'),
         ]
     
     def __str__(self):
@@ -62,7 +69,8 @@ class Order(models.Model):
     
     def can_be_cancelled(self):
         """Check if order can be cancelled"""
-        return self.status in ['pending', 'confirmed']
+        from .state_machine import can_apply
+        return can_apply('cancel', self.status)
 
 
 class OrderItem(models.Model):
@@ -71,12 +79,14 @@ class OrderItem(models.Model):
         Order,
         on_delete=models.CASCADE,
         related_name='items',
+        db_index=False,  # Led by the (order, product) unique index
         help_text="Order this item belongs to"
     )
     product = models.ForeignKey(
         Product,
         on_delete=models.PROTECT,  # Don't allow deleting products that are in orders
         related_name='order_items',
+        db_index=False,  # Led by the (product, order) index below
         help_text="Product being ordered"
     )
     quantity = models.PositiveIntegerField(
@@ -94,9 +104,13 @@ class OrderItem(models.Model):
         verbose_name = 'Order Item'
         verbose_name_plural = 'Order Items'
         unique_together = ['order', 'product']  # Prevent duplicate products in same order
+        indexes = [
+            # Sales of a product: finds its orders without touching the table
+            models.Index(fields=['product', 'order'], name='orderitem_product_order_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.quantity}x {self.product.name} in Order #{self.order.id}"
+        return f"{self.quantity}x {self.product.name} in Order #{self.order_id}"
     
     def get_subtotal(self):
         """Calculate subtotal for this item"""
@@ -106,4 +120,155 @@ class OrderItem(models.Model):
         """Override save to capture current price if not set"""
         if not self.price:
             self.price = self.product.price
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+class OrderEvent(models.Model):
+    """One status transition of an order, written by orders.state_machine"""
+
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,  # History outlives archiving of the order
+        related_name='events',
+        help_text="Order whose status changed"
+    )
+    from_status = models.CharField(
+        max_length=20,
+        choices=Order.STATUS_CHOICES,
+        help_text="Status before the transition"
+    )
+    to_status = models.CharField(
+        max_length=20,
+        choices=Order.STATUS_CHOICES,
+        help_text="Status after the transition"
+    )
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="User who triggered the transition, if any"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp of the transition"
+    )
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = 'Order Event'
+        verbose_name_plural = 'Order Events'
+        indexes = [
+            models.Index(fields=['order', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.order_id}: {self.from_status} -> {self.to_status}"
+
+
+class IdempotencyKey(models.Model):
+    """Client-supplied key that makes order creation safe to retry"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys',
+        help_text="User who sent the request"
+    )
+    key = models.CharField(
+        max_length=255,
+        help_text="Value of the Idempotency-Key header"
+    )
+    request_hash = models.CharField(
+        max_length=64,
+        help_text="SHA-256 of the request body the key was first used with"
+    )
+    response_status = models.PositiveSmallIntegerField(
+        null=True,
+        help_text="HTTP status of the stored response"
+    )
+    response_body = models.JSONField(
+        null=True,
+        encoder=DjangoJSONEncoder,
+        help_text="Stored response replayed to retries"
+    )
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        help_text="Order created by the first request"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        help_text="Timestamp when the key was first used"
+    )
+
+    class Meta:
+        verbose_name = 'Idempotency Key'
+        verbose_name_plural = 'Idempotency Keys'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
+
+
+
+class ArchivedOrder(models.Model):
+    """
+    Completed or cancelled order moved out of the live tables.
+
+    Line items are stored denormalized as they were serialized at archive
+    time, so an archived order reads back with a single row.
+    """
+
+    id = models.BigIntegerField(
+        primary_key=True,
+        help_text="Id the order had in the live table"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_orders',
+        help_text="User who placed the order"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Order.STATUS_CHOICES,
+        help_text="Final order status"
+    )
+    total_amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        help_text="Total order amount"
+    )
+    items = models.JSONField(
+        encoder=DjangoJSONEncoder,
+        help_text="Serialized order items"
+    )
+    created_at = models.DateTimeField(
+        help_text="Timestamp when order was created"
+    )
+    updated_at = models.DateTimeField(
+        help_text="Timestamp when order was last updated"
+    )
+    archived_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="Timestamp when order was archived"
+    )
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Archived Order'
+        verbose_name_plural = 'Archived Orders'
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"Archived order #{self.id}"
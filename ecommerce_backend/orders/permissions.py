@@ -17,4 +17,4 @@ class IsOrderOwner(permissions.BasePermission):
             return True
         
         # Regular users can only access their own orders
-        return obj.user == request.user
\ No newline at end of file
+        return obj.user_id == request.user.id
\ No newline at end of file
@@ -1,8 +1,16 @@
 from rest_framework import serializers
 from django.db import transaction
-from .models import Order, OrderItem
+from django.db.models.signals import post_save
+from .models import ArchivedOrder, Order, OrderItem
+from .batcher import PLACE_ALONE, batcher
+from .services import cancel_orders
+from .state_machine import TRANSITIONS
 from products.models import Product
+from products.shards import take as take_stock
 from products.serializers import ProductSerializer
+from users.stats import record_order
+from ecommerce_backend.transactions import retry_on_lock
+from ecommerce_backend.fieldsets import SparseFieldsetSerializerMixin
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -41,7 +49,7 @@ class OrderItemCreateSerializer(serializers.Serializer):
         return value
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     
     items = OrderItemSerializer(many=True, read_only=True)
     user_email = serializers.EmailField(source='user.email', read_only=True)
@@ -61,6 +69,31 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'total_amount', 'created_at', 'updated_at']
 
 
+class ArchivedOrderSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    
+    user_email = serializers.EmailField(source='user.email', read_only=True)
+    archived = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ArchivedOrder
+        fields = [
+            'id',
+            'user',
+            'user_email',
+            'status',
+            'total_amount',
+            'items',
+            'created_at',
+            'updated_at',
+            'archived',
+            'archived_at'
+        ]
+        read_only_fields = fields
+    
+    def get_archived(self, obj):
+        return True
+
+
 class OrderCreateSerializer(serializers.Serializer):
     
     items = OrderItemCreateSerializer(many=True)
@@ -86,8 +119,9 @@ class OrderCreateSerializer(serializers.Serializer):
                     f"Product with ID {product_id} does not exist."
                 )
             
-            # Check stock availability
-            if product.stock < quantity:
+            # Check stock availability (a sharded product's stock is a cached
+            # total; its shards are checked when the order is placed)
+            if not product.stock_shards and product.stock < quantity:
                 raise serializers.ValidationError(
                     f"Insufficient stock for '{product.name}'. "
                     f"Available: {product.stock}, Requested: {quantity}"
@@ -95,10 +129,20 @@ class OrderCreateSerializer(serializers.Serializer):
         
         return data
     
-    @transaction.atomic
     def create(self, validated_data):
+        
+        # Group commit with concurrent checkouts when enabled (see orders.batcher)
+        if batcher.accepts():
+            order = batcher.submit(self.context['request'].user, validated_data['items'])
+            if order is not PLACE_ALONE:
+                return order
+        return self.create_single(validated_data)
+    
+    @retry_on_lock
+    @transaction.atomic
+    def create_single(self, validated_data):
        
-        items_data = validated_data.pop('items')
+        items_data = validated_data['items']  # Not popped: a lock retry re-runs this method
         user = self.context['request'].user
         
         # Create the order (total_amount will be calculated)
@@ -109,13 +153,27 @@ class OrderCreateSerializer(serializers.Serializer):
         
         total_amount = 0
         
+        # Hot products with sharded stock are never locked as a whole
+        sharded = set(
+            Product.objects.filter(
+                id__in=[item_data['product_id'] for item_data in items_data],
+                stock_shards__gt=0
+            ).values_list('id', flat=True)
+        )
+        
         # Create order items and deduct stock
         for item_data in items_data:
-            product = Product.objects.select_for_update().get(id=item_data['product_id'])
             quantity = item_data['quantity']
             
-            # Double-check stock (in case of concurrent requests)
-            if product.stock < quantity:
+            if item_data['product_id'] in sharded:
+                product = Product.objects.get(id=item_data['product_id'])
+                in_stock = take_stock(product, quantity)
+            else:
+                product = Product.objects.select_for_update().get(id=item_data['product_id'])
+                # Double-check stock (in case of concurrent requests)
+                in_stock = product.reduce_stock(quantity)
+            
+            if not in_stock:
                 raise serializers.ValidationError(
                     f"Insufficient stock for '{product.name}'."
                 )
@@ -128,36 +186,47 @@ class OrderCreateSerializer(serializers.Serializer):
                 price=product.price  # Capture current price
             )
             
-            # Deduct stock (BONUS FEATURE)
-            product.reduce_stock(quantity)
-            
             # Add to total
             total_amount += order_item.get_subtotal()
         
         # Update order total
         order.total_amount = total_amount
         order.save(update_fields=['total_amount'])
+        record_order(order)
         
         return order
 
 
 class OrderCancelSerializer(serializers.Serializer):
   
-    @transaction.atomic
     def update(self, instance, validated_data):
         
-        if not instance.can_be_cancelled():
-            raise serializers.ValidationError(
-                f"Order with status '{instance.status}' cannot be cancelled."
-            )
-        
-        # Restore stock for all items
-        for item in instance.items.select_related('product'):
-            product = Product.objects.select_for_update().get(id=item.product.id)
-            product.increase_stock(item.quantity)
+        # Same path as bulk cancels: conditional UPDATE, stock restored and
+        # an OrderEvent recorded in one transaction
+        request = self.context.get('request')
+        result = cancel_orders([instance.id], actor=request.user if request else None)[instance.id]
+        if result != 'cancelled':
+            raise serializers.ValidationError(result)
         
-        # Update order status
-        instance.status = 'cancelled'
-        instance.save(update_fields=['status'])
+        instance.refresh_from_db(fields=['status', 'updated_at'])
+        # The status was written with update(); keep the cancel notification
+        post_save.send(
+            sender=Order, instance=instance, created=False,
+            update_fields={'status'}, raw=False, using=instance._state.db
+        )
         
-        return instance
\ No newline at end of file
+        return instance
+
+
+class OrderBulkCancelSerializer(serializers.Serializer):
+    
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=10000
+    )
+
+
+class OrderBulkTransitionSerializer(OrderBulkCancelSerializer):
+    
+    action = serializers.ChoiceField(choices=list(TRANSITIONS))
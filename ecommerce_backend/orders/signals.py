@@ -1,8 +1,19 @@
 
 from django.db.models.signals import post_save
-from django.dispatch import receiver
+from django.dispatch import Signal, receiver
 from .models import Order
 
+# Sent after commit when orders move between statuses (orders.state_machine).
+# Receivers get ``changes``: dicts with order_id, user_id, from_status, to_status.
+order_status_changed = Signal()
+
+
+@receiver(order_status_changed)
+def stream_order_status(sender, changes, **kwargs):
+    from ecommerce_backend.streams import publish_order_status
+
+    publish_order_status(changes)
+
 
 @receiver(post_save, sender=Order)
 def order_notification(sender, instance, created, **kwargs):
@@ -0,0 +1,95 @@
+"""
+Order status state machine.
+
+Every status change goes through ``apply``, which moves any number of
+orders with one conditional ``UPDATE ... WHERE status IN (sources)`` per
+chunk and records an ``OrderEvent`` per moved order. No ``Order`` instance
+is loaded or saved, so post_save is not sent for these changes.
+"""
+from collections import namedtuple
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ecommerce_backend.transactions import retry_on_lock
+from .models import Order, OrderEvent
+from .signals import order_status_changed
+
+Transition = namedtuple('Transition', ['sources', 'target'])
+
+# action -> statuses it may start from, and the status it leads to
+TRANSITIONS = {
+    'confirm': Transition(sources=('pending',), target='confirmed'),
+    'complete': Transition(sources=('confirmed',), target='completed'),
+    'cancel': Transition(sources=('pending', 'confirmed'), target='cancelled'),
+}
+
+
+def can_apply(action, status):
+    return status in TRANSITIONS[action].sources
+
+
+def apply(action, order_ids, actor=None, on_moved=None, chunk_size=None):
+    """
+    Apply a transition to many orders, one transaction per chunk.
+
+    Returns ``{order_id: result}`` where result is the new status,
+    ``'not_found'`` or why the order could not be moved. ``on_moved(ids)``
+    runs inside each chunk's transaction, before the status UPDATE, for
+    side effects such as restoring stock.
+    """
+    transition = TRANSITIONS[action]
+    chunk_size = chunk_size or settings.ORDER_BULK_CHUNK_SIZE
+    order_ids = list(dict.fromkeys(order_ids))
+    results = {}
+    for start in range(0, len(order_ids), chunk_size):
+        results.update(_apply_chunk(transition, order_ids[start:start + chunk_size], actor, on_moved))
+    return results
+
+
+@retry_on_lock
+@transaction.atomic
+def _apply_chunk(transition, order_ids, actor, on_moved):
+    # Lock the chunk and read statuses only; the lock keeps them valid
+    # until the UPDATE below
+    rows = (
+        Order.objects.select_for_update()
+        .filter(id__in=order_ids)
+        .order_by('id')
+        .values_list('id', 'status', 'user_id')
+    )
+    statuses, owners = {}, {}
+    for pk, status, user_id in rows:
+        statuses[pk], owners[pk] = status, user_id
+    moved = [pk for pk, status in statuses.items() if status in transition.sources]
+
+    if moved:
+        if on_moved is not None:
+            on_moved(moved)
+        Order.objects.filter(id__in=moved, status__in=transition.sources).update(
+            status=transition.target, updated_at=timezone.now()
+        )
+        OrderEvent.objects.bulk_create([
+            OrderEvent(order_id=pk, from_status=statuses[pk], to_status=transition.target, actor=actor)
+            for pk in moved
+        ])
+        transaction.on_commit(partial(
+            order_status_changed.send,
+            sender=Order,
+            changes=[
+                {'order_id': pk, 'user_id': owners[pk], 'from_status': statuses[pk], 'to_status': transition.target}
+                for pk in moved
+            ]
+        ))
+
+    results = {}
+    for pk in order_ids:
+        if pk not in statuses:
+            results[pk] = 'not_found'
+        elif statuses[pk] in transition.sources:
+            results[pk] = transition.target
+        else:
+            results[pk] = f"Order with status '{statuses[pk]}' cannot be {transition.target}."
+    return results
@@ -1,3 +1,580 @@
-from django.test import TestCase
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from ecommerce_backend.db_router import (
+    PIN_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware, route_reads_to_replica,
+)
+from products.models import Product, StockShard
+from users import stats
+from users.models import CustomerStats
+from . import state_machine
+from .archive import archive_orders
+from .batcher import PLACE_ALONE, OrderBatcher
+from .idempotency import purge_expired_keys
+from .models import ArchivedOrder, IdempotencyKey, Order, OrderEvent, OrderItem
+
+User = get_user_model()
+
+
+@skipUnless(
+    settings.READ_REPLICAS,
+    'Set REPLICA_DATABASE_URLS=sqlite:///db_replica.sqlite3 to run replica routing tests',
+)
+class ReplicaRoutingTests(TestCase):
+    # Separate test databases with no replication between them, so a row
+    # written to the primary is visible only if the read was routed there.
+    databases = {'default', *settings.READ_REPLICAS}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        self.product = Product.objects.create(name='Lamp', price=Decimal('10.00'), stock=5)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_catalog_reads_use_replica(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.data['count'], 0)
+
+    def test_reads_stick_to_primary_after_order_create(self):
+        self.assertEqual(self.client.get('/api/orders/').data['count'], 0)
+
+        response = self.client.post(
+            '/api/orders/',
+            {'items': [{'product_id': self.product.id, 'quantity': 1}]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.client.get('/api/orders/').data['count'], 1)
+        order_id = response.data['order']['id']
+        self.assertEqual(self.client.get(f'/api/orders/{order_id}/').status_code, 200)
+
+
+@override_settings(READ_REPLICAS=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+    """Routing decisions without replica databases configured"""
+
+    def setUp(self):
+        cache.clear()
+        self.router = PrimaryReplicaRouter()
+        self.user = mock.Mock(pk=7, is_authenticated=True)
+
+    def handle(self, method, user, status=200, cookies=None):
+        """Run one request through the middleware, returning the read alias seen by the view"""
+        seen = []
+
+        def view(request):
+            route_reads_to_replica(request)
+            seen.append(self.router.db_for_read(Order))
+            return HttpResponse(status=status)
+
+        request = getattr(RequestFactory(), method)('/api/orders/')
+        request.COOKIES.update(cookies or {})
+        request.user = user
+        self.response = ReplicaRoutingMiddleware(view)(request)
+        return seen[0]
+
+    def test_reads_outside_a_request_use_the_default(self):
+        self.assertIsNone(self.router.db_for_read(Order))
+        self.assertEqual(self.router.db_for_write(Order), 'default')
+
+    def test_safe_requests_read_from_a_replica(self):
+        self.assertEqual(self.handle('get', AnonymousUser()), 'replica')
+        self.assertEqual(self.handle('get', self.user), 'replica')
+        # State is reset once the request is over
+        self.assertIsNone(self.router.db_for_read(Order))
+
+    def test_writes_pin_the_user_to_the_primary(self):
+        self.assertIsNone(self.handle('post', self.user, status=400))
+        self.assertNotIn(PIN_COOKIE, self.response.cookies)
+
+        self.assertIsNone(self.handle('post', self.user, status=201))
+        self.assertIn(PIN_COOKIE, self.response.cookies)
+        self.assertIsNone(self.handle('get', self.user))
+        self.assertEqual(self.handle('get', mock.Mock(pk=8, is_authenticated=True)), 'replica')
+
+    def test_pin_cookie_reaches_other_workers(self):
+        self.handle('post', self.user, status=201)
+        cookies = {PIN_COOKIE: self.response.cookies[PIN_COOKIE].value}
+        self.assertEqual(self.response.cookies[PIN_COOKIE]['max-age'], settings.REPLICA_PIN_SECONDS)
+        cache.clear()  # A worker with its own cache never saw the pin
+
+        self.assertIsNone(self.handle('get', self.user, cookies=cookies))
+        # Only for the user who wrote, and only while fresh
+        self.assertEqual(self.handle('get', mock.Mock(pk=8, is_authenticated=True), cookies=cookies), 'replica')
+        self.assertEqual(self.handle('get', self.user, cookies={PIN_COOKIE: '7'}), 'replica')
+        with override_settings(REPLICA_PIN_SECONDS=-1):
+            self.assertEqual(self.handle('get', self.user, cookies=cookies), 'replica')
+
+    async def test_routes_and_pins_under_asgi(self):
+        async def view(request):
+            # Sync views see the state through sync_to_async's context copy
+            await sync_to_async(route_reads_to_replica)(request)
+            self.seen = self.router.db_for_read(Order)
+            return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+        middleware = ReplicaRoutingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get('/api/orders/')
+        request.user = self.user
+        await middleware(request)
+        self.assertEqual(self.seen, 'replica')
+
+        request = RequestFactory().post('/api/orders/')
+        request.user = self.user
+        response = await middleware(request)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_no_replicas_configured(self):
+        with override_settings(READ_REPLICAS=[]):
+            self.assertIsNone(self.handle('get', self.user))
+
+
+class BulkCancelTests(TestCase):
+
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', password='testpass123', is_staff=True)
+        self.buyer = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        self.lamp = Product.objects.create(name='Lamp', price=Decimal('10.00'), stock=0)
+        self.bulb = Product.objects.create(name='Bulb', price=Decimal('2.00'), stock=0)
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def order(self, status='pending', lamps=1, bulbs=2):
+        order = Order.objects.create(user=self.buyer, total_amount=Decimal('14.00'), status=status)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=self.lamp, quantity=lamps, price=self.lamp.price),
+            OrderItem(order=order, product=self.bulb, quantity=bulbs, price=self.bulb.price),
+        ])
+        return order
+
+    def bulk_cancel(self, order_ids):
+        return self.client.post('/api/orders/bulk-cancel/', {'order_ids': order_ids}, format='json')
+
+    def stock(self):
+        return dict(Product.objects.values_list('name', 'stock'))
+
+    def test_restores_stock_of_cancellable_orders_only(self):
+        pending, confirmed, completed = [self.order(status) for status in ['pending', 'confirmed', 'completed']]
+        already = self.order('cancelled', lamps=50)
+
+        response = self.bulk_cancel([pending.id, confirmed.id, completed.id, already.id, 999999])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['message'], '2 of 5 orders cancelled')
+        results = {row['id']: row['result'] for row in response.data['results']}
+        self.assertEqual(results[pending.id], 'cancelled')
+        self.assertEqual(results[confirmed.id], 'cancelled')
+        self.assertNotEqual(results[completed.id], 'cancelled')
+        self.assertNotEqual(results[already.id], 'cancelled')
+        self.assertEqual(results[999999], 'not_found')
+        self.assertEqual(self.stock(), {'Lamp': 2, 'Bulb': 4})
+        self.assertEqual(Order.objects.get(id=completed.id).status, 'completed')
+
+    def test_stock_restore_is_set_based(self):
+        self.bulk_cancel([self.order().id])
+        one, ten = [self.order().id], [self.order().id for _ in range(10)]
+        with CaptureQueriesContext(connection) as few:
+            self.bulk_cancel(one)
+        with CaptureQueriesContext(connection) as many:
+            self.bulk_cancel(ten)
+
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(self.stock(), {'Lamp': 12, 'Bulb': 24})
+
+    def test_staff_only(self):
+        order = self.order()
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(self.bulk_cancel([order.id]).status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.bulk_cancel([order.id]).status_code, 401)
+        self.assertEqual(Order.objects.get(id=order.id).status, 'pending')
+
+    @skipUnless(settings.ADMIN_ENABLED, 'The admin is disabled (ADMIN_ENABLED=False)')
+    def test_admin_action(self):
+        orders = [self.order(), self.order(), self.order('completed')]
+        self.staff.is_superuser = True
+        self.staff.save()
+        self.client.force_login(self.staff)
+
+        response = self.client.post('/admin/orders/order/', {
+            'action': 'cancel_selected_orders',
+            '_selected_action': [order.id for order in orders],
+        }, follow=True)
+
+        self.assertEqual(
+            [str(message) for message in response.context['messages']],
+            ['2 orders cancelled.', '1 orders skipped because their status does not allow this change.']
+        )
+        self.assertEqual(self.stock(), {'Lamp': 2, 'Bulb': 4})
+
+
+class OrderStateMachineTests(TestCase):
+
+    def setUp(self):
+        self.staff = User.objects.create_user(email='staff@example.com', password='testpass123', is_staff=True)
+        buyer = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        self.product = Product.objects.create(name='Lamp', price=Decimal('10.00'), stock=100)
+        self.orders = [
+            Order.objects.create(user=buyer, total_amount=Decimal('20.00'), status=status)
+            for status in ['pending', 'pending', 'confirmed', 'completed']
+        ]
+        for order in self.orders:
+            OrderItem.objects.create(order=order, product=self.product, quantity=2, price=Decimal('10.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def transition(self, action, orders):
+        return self.client.post(
+            '/api/orders/bulk-transition/',
+            {'action': action, 'order_ids': [order.id for order in orders]},
+            format='json'
+        )
+
+    def test_moves_allowed_orders_and_records_events(self):
+        response = self.transition('confirm', self.orders)
+
+        self.assertEqual(response.status_code, 200)
+        results = {row['id']: row['result'] for row in response.data['results']}
+        self.assertEqual(
+            [results[order.id] for order in self.orders],
+            ['confirmed', 'confirmed', "Order with status 'confirmed' cannot be confirmed.",
+             "Order with status 'completed' cannot be confirmed."]
+        )
+        events = OrderEvent.objects.order_by('order_id')
+        self.assertEqual(
+            [(event.order_id, event.from_status, event.to_status, event.actor_id) for event in events],
+            [(order.id, 'pending', 'confirmed', self.staff.id) for order in self.orders[:2]]
+        )
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        # Lock, UPDATE and event INSERT, plus savepoint/transaction overhead
+        with self.assertNumQueries(5):
+            state_machine.apply('complete', [self.orders[2].id])
+        more = [order.id for order in self.orders[:2]]
+        state_machine.apply('confirm', more)
+        with self.assertNumQueries(5):
+            state_machine.apply('complete', more)
+
+    def test_cancel_restores_stock(self):
+        response = self.transition('cancel', self.orders)
+
+        self.assertEqual(response.data['message'], '3 of 4 orders cancelled')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 106)
+        self.assertEqual(OrderEvent.objects.filter(to_status='cancelled').count(), 3)
+
+    def test_staff_only(self):
+        self.client.force_authenticate(self.orders[0].user)
+        self.assertEqual(self.transition('confirm', self.orders).status_code, 403)
+
+
+class CustomerStatsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        self.product = Product.objects.create(name='Lamp', price=Decimal('10.00'), stock=100)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def place(self, quantity):
+        response = self.client.post(
+            '/api/orders/', {'items': [{'product_id': self.product.id, 'quantity': quantity}]}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        return Order.objects.get(id=response.data['order']['id'])
+
+    def totals(self):
+        row = CustomerStats.objects.get(user=self.user)
+        return row.order_count, row.lifetime_spend
+
+    def test_orders_update_the_row_incrementally(self):
+        self.place(1)
+        order = self.place(2)
+        self.assertEqual(self.totals(), (2, Decimal('30.00')))
+
+        self.client.post(f'/api/orders/{order.id}/cancel/')
+        self.assertEqual(self.totals(), (1, Decimal('10.00')))
+
+    def test_first_row_includes_earlier_orders(self):
+        self.place(1)
+        CustomerStats.objects.all().delete()
+
+        self.place(3)
+        self.assertEqual(self.totals(), (2, Decimal('40.00')))
+
+    def test_concurrent_first_orders_both_count(self):
+        earlier = Order.objects.create(user=self.user, total_amount=Decimal('5.00'))
+        concurrent = Order.objects.create(user=self.user, total_amount=Decimal('7.00'))
+        order = Order.objects.create(user=self.user, total_amount=Decimal('10.00'))
+        compute_stats = stats.compute_stats
+
+        def other_transaction_commits_first(user_ids, exclude_order_ids):
+            # The concurrent order created the row from the history it saw
+            CustomerStats.objects.create(user=self.user, order_count=2, lifetime_spend=Decimal('12.00'))
+            return compute_stats(user_ids, exclude_order_ids)
+
+        with mock.patch('users.stats.compute_stats', other_transaction_commits_first):
+            stats.record_orders([order])
+
+        self.assertEqual(self.totals(), (3, earlier.total_amount + concurrent.total_amount + order.total_amount))
+
+    def test_rebuild_from_live_and_archived_orders(self):
+        self.place(1)
+        cancelled = self.place(4)
+        self.client.post(f'/api/orders/{cancelled.id}/cancel/')
+        ArchivedOrder.objects.create(
+            id=999, user=self.user, status='completed', total_amount=Decimal('25.00'), items=[],
+            created_at=timezone.now(), updated_at=timezone.now()
+        )
+        CustomerStats.objects.filter(user=self.user).update(order_count=0, lifetime_spend=0)
+
+        call_command('rebuild_customer_stats', stdout=io.StringIO())
+        self.assertEqual(self.totals(), (2, Decimal('35.00')))
+
+
+class IdempotentOrderTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        self.product = Product.objects.create(name='Lamp', price=Decimal('10.00'), stock=5)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def place(self, quantity, key='key-1'):
+        return self.client.post(
+            '/api/orders/',
+            {'items': [{'product_id': self.product.id, 'quantity': quantity}]},
+            format='json',
+            headers={'Idempotency-Key': key},
+        )
+
+    def stock(self):
+        self.product.refresh_from_db()
+        return self.product.stock
+
+    def test_retry_replays_without_placing_again(self):
+        first = self.place(2)
+        self.assertEqual(first.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', first)
+
+        retry = self.place(2)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(self.stock(), 3)
+        self.assertEqual(Order.objects.count(), 1)
+
+        self.assertEqual(self.place(2, key='key-2').status_code, 201)
+        self.assertEqual(self.stock(), 1)
+
+    def test_same_key_with_a_different_body(self):
+        self.place(2)
+        response = self.place(1)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(self.stock(), 3)
+
+    def test_validation_error_rolls_back_the_key(self):
+        self.assertEqual(self.place(50).status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        # Nothing was stored, so the key is free for a corrected request
+        self.assertEqual(self.place(2).status_code, 201)
+        self.assertEqual(self.stock(), 3)
+
+    def test_expired_keys_are_reused_and_purged(self):
+        self.place(1)
+        expired = timezone.now() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS + 1)
+        IdempotencyKey.objects.update(created_at=expired)
+
+        response = self.place(1)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(self.stock(), 3)
+
+        self.place(1, key='key-2')
+        IdempotencyKey.objects.filter(key='key-2').update(created_at=expired)
+        self.assertEqual(purge_expired_keys(batch_size=1), 1)
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['key-1'])
+
+
+@override_settings(ORDER_BATCHING=True, ORDER_BATCH_MAX_DELAY_MS=5000, ORDER_BATCH_MAX_SIZE=6)
+class ConcurrentIdempotentOrderTests(TransactionTestCase):
+    # Committed data: each request thread has its own connection
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        self.product = Product.objects.create(name='Lamp', price=Decimal('10.00'), stock=5)
+
+    def test_concurrent_duplicates_wait_for_the_first(self):
+        started = threading.Barrier(2)
+
+        def place(_):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            started.wait()
+            try:
+                return client.post(
+                    '/api/orders/',
+                    {'items': [{'product_id': self.product.id, 'quantity': 2}]},
+                    format='json',
+                    headers={'Idempotency-Key': 'key-1'},
+                )
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            responses = list(executor.map(place, range(2)))
+
+        self.assertEqual([response.status_code for response in responses], [201, 201])
+        replayed = [response for response in responses if response.has_header('Idempotent-Replayed')]
+        self.assertEqual(len(replayed), 1)
+        self.assertEqual(replayed[0]['Idempotent-Replayed'], 'true')
+        self.assertEqual(responses[0].data, responses[1].data)
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 3)
+
+
+class OrderBatcherTests(TransactionTestCase):
+    # Committed data: each caller thread has its own connection
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(email=f'buyer{index}@example.com')
+            for index in range(6)
+        ]
+        self.lamp = Product.objects.create(name='Lamp', price=Decimal('10.00'), stock=7)
+        self.rug = Product.objects.create(name='Rug', price=Decimal('30.00'), stock=100)
+
+    def place_concurrently(self, orders, batcher=None):
+        """Submit ``(user, items)`` pairs from one thread each; returns outcomes in order"""
+        batcher = batcher or OrderBatcher()
+        started = threading.Barrier(len(orders))
+
+        def submit(user, items):
+            started.wait()
+            try:
+                return batcher.submit(user, items)
+            except serializers.ValidationError as exc:
+                return exc
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=len(orders)) as executor:
+            return list(executor.map(lambda order: submit(*order), orders))
+
+    def test_oversold_orders_are_rejected_one_by_one(self):
+        outcomes = self.place_concurrently([
+            (user, [{'product_id': self.lamp.id, 'quantity': 2}, {'product_id': self.rug.id, 'quantity': 1}])
+            for user in self.users
+        ])
+
+        placed = [outcome for outcome in outcomes if isinstance(outcome, Order)]
+        rejected = [outcome for outcome in outcomes if isinstance(outcome, serializers.ValidationError)]
+        self.assertEqual((len(placed), len(rejected)), (3, 3))
+        self.assertIn("Insufficient stock for 'Lamp'.", str(rejected[0]))
+        self.assertEqual(
+            sorted(order.id for order in placed), sorted(Order.objects.values_list('id', flat=True))
+        )
+        self.assertEqual(Order.objects.get(id=placed[0].id).total_amount, Decimal('50.00'))
+        self.assertEqual(OrderItem.objects.count(), 6)
+
+        self.lamp.refresh_from_db()
+        self.rug.refresh_from_db()
+        self.assertEqual((self.lamp.stock, self.rug.stock), (1, 97))
+
+    def test_invalid_and_sharded_orders_do_not_fail_the_batch(self):
+        StockShard.objects.create(product=self.rug, index=0, stock=100)
+        Product.objects.filter(id=self.rug.id).update(stock_shards=1)
+
+        outcomes = self.place_concurrently([
+            (self.users[0], [{'product_id': self.lamp.id, 'quantity': 1}]),
+            (self.users[1], [{'product_id': self.rug.id, 'quantity': 1}]),
+            (self.users[2], [{'product_id': 999999, 'quantity': 1}]),
+            (self.users[3], [{'product_id': self.lamp.id, 'quantity': 1}, {'product_id': self.lamp.id, 'quantity': 1}]),
+            (self.users[4], [{'product_id': self.lamp.id, 'quantity': 1}]),
+            (self.users[5], [{'product_id': self.lamp.id, 'quantity': 1}]),
+        ])
+
+        self.assertIsInstance(outcomes[0], Order)
+        self.assertIs(outcomes[1], PLACE_ALONE)
+        self.assertIsInstance(outcomes[2], serializers.ValidationError)
+        self.assertIsInstance(outcomes[3], serializers.ValidationError)
+        self.assertEqual([type(outcome) for outcome in outcomes[4:]], [Order, Order])
+        self.lamp.refresh_from_db()
+        self.assertEqual(self.lamp.stock, 4)
+
+    def test_failed_batch_sends_everyone_alone(self):
+        with mock.patch('orders.batcher.place_batch', side_effect=RuntimeError):
+            outcomes = self.place_concurrently([
+                (user, [{'product_id': self.lamp.id, 'quantity': 1}]) for user in self.users
+            ])
+        self.assertEqual(outcomes, [PLACE_ALONE] * 6)
+        self.assertFalse(Order.objects.exists())
+
+    @override_settings(ORDER_BATCH_MAX_DELAY_MS=5)
+    def test_checkout_through_the_api(self):
+        StockShard.objects.create(product=self.rug, index=0, stock=100)
+        Product.objects.filter(id=self.rug.id).update(stock_shards=1)
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+
+        for product in [self.lamp, self.rug]:
+            response = client.post(
+                '/api/orders/', {'items': [{'product_id': product.id, 'quantity': 1}]}, format='json'
+            )
+            self.assertEqual(response.status_code, 201)
+        self.lamp.refresh_from_db()
+        self.assertEqual(self.lamp.stock, 6)
+        self.assertEqual(StockShard.objects.get(product=self.rug).stock, 99)
+
+
+class OrderSparseFieldsetTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        product = Product.objects.create(name='Lamp', price=Decimal('10.00'), stock=5)
+        self.order = Order.objects.create(user=self.user, total_amount=Decimal('10.00'), status='completed')
+        OrderItem.objects.create(order=self.order, product=product, quantity=1, price=product.price)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_fields_skip_the_items_prefetch(self):
+        with self.assertNumQueries(2):  # Count and page, no items
+            response = self.client.get('/api/orders/', {'fields': 'id,status'})
+        self.assertEqual(response.data['results'], [{'id': self.order.id, 'status': 'completed'}])
+
+    def test_archived_orders_keep_the_same_shape(self):
+        live = self.client.get(f'/api/orders/{self.order.id}/', {'fields': 'id,status,items'}).data
+        archive_orders(cutoff=timezone.now())
+
+        response = self.client.get(f'/api/orders/{self.order.id}/', {'fields': 'id,status,items'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data), {'id', 'status', 'items'})
+        self.assertEqual(response.data['items'][0]['product_name'], live['items'][0]['product_name'])
+        response = self.client.get(f'/api/orders/{self.order.id}/', {'exclude': 'items'})
+        self.assertNotIn('items', response.data)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(f'/api/orders/{self.order.id}/', {'fields': 'id,bogus'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('bogus', response.data['fields'][0])
@@ -2,33 +2,59 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from django.db import transaction
 from django.db.models import Prefetch
-from .models import Order, OrderItem
+from django.http import Http404
+from .models import ArchivedOrder, IdempotencyKey, Order, OrderItem
 from .serializers import (
     OrderSerializer,
     OrderCreateSerializer,
-    OrderCancelSerializer
+    OrderCancelSerializer,
+    OrderBulkCancelSerializer,
+    OrderBulkTransitionSerializer,
+    ArchivedOrderSerializer
 )
 from .permissions import IsOrderOwner
+from .services import cancel_orders
+from . import state_machine
+from .idempotency import IDEMPOTENCY_HEADER, REPLAYED_HEADER, expiry_cutoff, request_fingerprint
+from ecommerce_backend.db_router import ReplicaReadMixin
+from ecommerce_backend.fieldsets import SparseFieldsetViewMixin
+from ecommerce_backend.transactions import retry_on_lock
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ReplicaReadMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
    
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated, IsOrderOwner]
     
+    # ?fields= / ?exclude= support (see ecommerce_backend.fieldsets)
+    sparse_field_columns = {
+        'user_email': ['user__email'],
+        'items': [],
+    }
+    sparse_always_load = ['user']  # IsOrderOwner compares user_id
+    
     def get_queryset(self):
         
         user = self.request.user
+        keep = self.get_sparse_fields()
+        queryset = Order.objects.all()
         
-        # Optimize query by prefetching related items and products
-        queryset = Order.objects.prefetch_related(
-            Prefetch(
-                'items',
-                queryset=OrderItem.objects.select_related('product')
+        # Optimize query by prefetching related items and products,
+        # skipping the prefetch/join when ?fields= leaves them out
+        if keep is None or 'items' in keep:
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    'items',
+                    queryset=OrderItem.objects.select_related('product')
+                )
             )
-        ).select_related('user')
+        if keep is None or 'user_email' in keep:
+            queryset = queryset.select_related('user')
+        if keep is not None:
+            queryset = self.apply_sparse_fields(queryset, keep)
         
         # Filter by user (unless staff/admin)
         if not user.is_staff:
@@ -42,10 +68,70 @@ class OrderViewSet(viewsets.ModelViewSet):
             return OrderCreateSerializer
         elif self.action == 'cancel':
             return OrderCancelSerializer
+        elif self.action == 'bulk_cancel':
+            return OrderBulkCancelSerializer
+        elif self.action == 'bulk_transition':
+            return OrderBulkTransitionSerializer
         return OrderSerializer
     
     def create(self, request, *args, **kwargs):
         
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key:
+            return self.create_idempotent(request, key)
+        return self.place_order(request)
+    
+    @retry_on_lock
+    @transaction.atomic
+    def create_idempotent(self, request, key):
+        """
+        Create an order at most once per Idempotency-Key.
+
+        The key row is inserted in the same transaction as the order, so a
+        concurrent duplicate blocks on the unique constraint until the first
+        request commits, then replays its stored response.
+        """
+        if len(key) > 255:
+            return Response(
+                {'detail': f'{IDEMPOTENCY_HEADER} must be at most 255 characters.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        fingerprint = request_fingerprint(request)
+        record, created = IdempotencyKey.objects.select_for_update().get_or_create(
+            user=request.user,
+            key=key,
+            defaults={'request_hash': fingerprint}
+        )
+        
+        if not created and record.created_at < expiry_cutoff():
+            # Expired but not purged yet: treat the key as brand new
+            record.delete()
+            record = IdempotencyKey.objects.create(
+                user=request.user, key=key, request_hash=fingerprint
+            )
+            created = True
+        
+        if not created:
+            if record.request_hash != fingerprint:
+                return Response(
+                    {'detail': f'{IDEMPOTENCY_HEADER} was already used with a different request.'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            response = Response(record.response_body, status=record.response_status)
+            response[REPLAYED_HEADER] = 'true'
+            return response
+        
+        # Validation errors propagate and roll back the key with the order
+        response = self.place_order(request)
+        record.response_status = response.status_code
+        record.response_body = response.data
+        record.order_id = response.data['order']['id']
+        record.save(update_fields=['response_status', 'response_body', 'order'])
+        return response
+    
+    def place_order(self, request):
+        
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
@@ -63,10 +149,29 @@ class OrderViewSet(viewsets.ModelViewSet):
     
     def retrieve(self, request, *args, **kwargs):
        
-        instance = self.get_object()
+        try:
+            instance = self.get_object()
+        except Http404:
+            # Old finished orders live in the archive table
+            return self.retrieve_archived(request)
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
     
+    def retrieve_archived(self, request):
+        
+        queryset = ArchivedOrder.objects.select_related('user')
+        if not request.user.is_staff:
+            queryset = queryset.filter(user=request.user)
+        
+        try:
+            archived = queryset.get(pk=self.kwargs['pk'])
+        except (ArchivedOrder.DoesNotExist, ValueError):
+            raise Http404('No Order matches the given query.')
+        
+        # Same ?fields= / ?exclude= trimming as a live order
+        serializer = ArchivedOrderSerializer(archived, context=self.get_serializer_context())
+        return Response(serializer.data)
+    
     def list(self, request, *args, **kwargs):
         
         queryset = self.filter_queryset(self.get_queryset())
@@ -100,6 +205,52 @@ class OrderViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
     
+    @action(detail=False, methods=['post'], url_path='bulk-cancel', permission_classes=[IsAdminUser])
+    def bulk_cancel(self, request):
+        
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        results = cancel_orders(serializer.validated_data['order_ids'], actor=request.user)
+        cancelled = sum(1 for result in results.values() if result == 'cancelled')
+        
+        return Response(
+            {
+                'message': f'{cancelled} of {len(results)} orders cancelled',
+                'results': [
+                    {'id': order_id, 'result': result}
+                    for order_id, result in results.items()
+                ]
+            },
+            status=status.HTTP_200_OK
+        )
+    
+    @action(detail=False, methods=['post'], url_path='bulk-transition', permission_classes=[IsAdminUser])
+    def bulk_transition(self, request):
+        
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        name = serializer.validated_data['action']
+        if name == 'cancel':
+            # Cancelling also gives stock back
+            results = cancel_orders(serializer.validated_data['order_ids'], actor=request.user)
+        else:
+            results = state_machine.apply(name, serializer.validated_data['order_ids'], actor=request.user)
+        target = state_machine.TRANSITIONS[name].target
+        moved = sum(1 for result in results.values() if result == target)
+        
+        return Response(
+            {
+                'message': f'{moved} of {len(results)} orders {target}',
+                'results': [
+                    {'id': order_id, 'result': result}
+                    for order_id, result in results.items()
+                ]
+            },
+            status=status.HTTP_200_OK
+        )
+    
     # Disable update and delete for orders (business rule)
     def update(self, request, *args, **kwargs):
        
@@ -1,21 +1,34 @@
 from django.contrib import admin
-from .models import Product
+from ecommerce_backend.estimated_counts import EstimatedCountAdminMixin
+from .models import LowStockAlert, Product, RelatedProduct, ReorderSuggestion, StockShard
+
+
+class StockShardInline(admin.TabularInline):
+    # Managed with `manage.py rebalance_stock_shards --product <id> --shards <n>`
+    model = StockShard
+    extra = 0
+    can_delete = False
+    readonly_fields = ['index', 'stock']
+    
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = ['id', 'name', 'price', 'stock', 'is_in_stock', 'created_at']
+class ProductAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
+    list_display = ['id', 'name', 'price', 'stock', 'reorder_threshold', 'is_in_stock', 'created_at']
     list_filter = ['created_at', 'updated_at']
     search_fields = ['name', 'description']
     ordering = ['-created_at']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['stock_shards', 'created_at', 'updated_at']
+    inlines = [StockShardInline]
     
     fieldsets = (
         ('Basic Information', {
             'fields': ('name', 'description')
         }),
         ('Pricing & Stock', {
-            'fields': ('price', 'stock')
+            'fields': ('price', 'stock', 'reorder_threshold', 'stock_shards')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
@@ -23,8 +36,51 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_readonly_fields(self, request, obj=None):
+        # A sharded product's stock lives in its shards; this is only a cached total
+        if obj is not None and obj.stock_shards:
+            return [*self.readonly_fields, 'stock']
+        return self.readonly_fields
+    
     def is_in_stock(self, obj):
         """Display stock status with color coding"""
         return obj.is_in_stock()
     is_in_stock.boolean = True
-    is_in_stock.short_description = 'In Stock'
\ No newline at end of file
+    is_in_stock.short_description = 'In Stock'
+
+
+@admin.register(LowStockAlert)
+class LowStockAlertAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
+    list_display = ['id', 'product', 'stock', 'reorder_threshold', 'created_at']
+    list_select_related = ['product']
+    raw_id_fields = ['product']
+    readonly_fields = ['product', 'stock', 'reorder_threshold', 'created_at']
+
+
+@admin.register(RelatedProduct)
+class RelatedProductAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
+    # Rebuilt by `manage.py build_related_products`; edits would be overwritten
+    list_display = ['product', 'rank', 'related', 'score']
+    list_select_related = ['product', 'related']
+    raw_id_fields = ['product', 'related']
+    readonly_fields = ['product', 'rank', 'related', 'score']
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ReorderSuggestion)
+class ReorderSuggestionAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
+    # Rebuilt by `manage.py forecast_demand`; edits would be overwritten
+    list_display = [
+        'product', 'stock', 'forecast_daily_sales', 'reorder_point', 'suggested_quantity', 'computed_at'
+    ]
+    list_select_related = ['product']
+    raw_id_fields = ['product']
+    readonly_fields = [
+        'product', 'stock', 'average_daily_sales', 'forecast_daily_sales',
+        'safety_stock', 'reorder_point', 'suggested_quantity', 'computed_at'
+    ]
+    
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,121 @@
+"""
+Native async read path for the catalog.
+
+These views serve the same data as the ``list``/``retrieve`` actions of
+``ProductViewSet`` without going through DRF's sync request cycle, so under
+ASGI they run on the event loop instead of a thread-sensitive sync adapter.
+Writes stay on the sync viewset.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .cache import acatalog_version, list_cache_key, product_cache_key
+from .models import Product
+from .serializers import ProductListSerializer, ProductSerializer
+from .views import ProductViewSet
+
+PAGE_QUERY_PARAM = 'page'
+
+
+def _filtered_queryset(request):
+    """Apply the viewset's filter backends (pure queryset building, no I/O)"""
+    view = ProductViewSet(
+        request=request,
+        action='list',
+        args=(),
+        kwargs={},
+        format_kwarg=None,
+    )
+    return view.filter_queryset(view.get_queryset())
+
+
+async def _paginate(request, queryset):
+    """Same response shape and page validation as PageNumberPagination"""
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    count = await queryset.acount()
+    num_pages = max(1, math.ceil(count / page_size))
+
+    page_number = request.GET.get(PAGE_QUERY_PARAM) or 1
+    if page_number == 'last':
+        page_number = num_pages
+    try:
+        page_number = int(page_number)
+    except (TypeError, ValueError):
+        return None
+    if page_number < 1 or page_number > num_pages:
+        return None
+
+    offset = (page_number - 1) * page_size
+    products = [product async for product in queryset[offset:offset + page_size].aiterator()]
+
+    url = request.build_absolute_uri()
+    next_link = previous_link = None
+    if page_number < num_pages:
+        next_link = replace_query_param(url, PAGE_QUERY_PARAM, page_number + 1)
+    if page_number > 1:
+        previous_link = (
+            remove_query_param(url, PAGE_QUERY_PARAM) if page_number == 2
+            else replace_query_param(url, PAGE_QUERY_PARAM, page_number - 1)
+        )
+
+    return {
+        'count': count,
+        'next': next_link,
+        'previous': previous_link,
+        'results': ProductListSerializer(products, many=True, context={'request': request}).data,
+    }
+
+
+async def _list_response(request):
+    key = list_cache_key(await acatalog_version(), request)
+    data = await cache.aget(key)
+    if data is None:
+        request = Request(request)
+        try:
+            queryset = _filtered_queryset(request)
+        except ValidationError as exc:
+            return JsonResponse(exc.detail, status=400)
+
+        data = await _paginate(request, queryset)
+        if data is None:
+            return JsonResponse({'detail': 'Invalid page.'}, status=404)
+        await cache.aset(key, data, settings.CATALOG_CACHE_TIMEOUT)
+
+    return JsonResponse(data)
+
+
+async def product_list(request):
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    return await _list_response(request)
+
+
+async def product_search(request):
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    if not request.GET.get('search', '').strip():
+        return JsonResponse({'search': ['This query parameter is required.']}, status=400)
+    return await _list_response(request)
+
+
+async def product_detail(request, pk):
+    if request.method != 'GET':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+
+    key = product_cache_key(pk)
+    data = await cache.aget(key)
+    if data is None:
+        try:
+            product = await Product.objects.aget(pk=pk)
+        except Product.DoesNotExist:
+            return JsonResponse({'detail': 'No Product matches the given query.'}, status=404)
+        data = ProductSerializer(product).data
+        await cache.aset(key, data, settings.CATALOG_CACHE_TIMEOUT)
+
+    return JsonResponse(data)
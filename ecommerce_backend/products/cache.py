@@ -0,0 +1,49 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.utils.http import urlencode
+
+CATALOG_VERSION_KEY = 'catalog:version'
+FACETS_IGNORED_PARAMS = {'page', 'ordering', 'facets'}
+
+
+def product_cache_key(pk):
+    return f'catalog:product:{pk}'
+
+
+def list_cache_key(version, request):
+    """Key for one list page: catalog version + URL with normalized query string"""
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    url = f'{request.get_host()}{request.path}?{query}'
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f'catalog:list:{version}:{digest}'
+
+
+def facets_cache_key(version, request):
+    """Facets depend only on the filter/search context, not on page or ordering"""
+    params = sorted(
+        (name, values) for name, values in request.query_params.lists()
+        if name not in FACETS_IGNORED_PARAMS
+    )
+    digest = hashlib.md5(urlencode(params, doseq=True).encode()).hexdigest()
+    return f'catalog:facets:{version}:{digest}'
+
+
+def _new_version():
+    # Time-based so an evicted version key can never resurrect stale pages
+    return time.time_ns()
+
+
+def catalog_version():
+    return cache.get_or_set(CATALOG_VERSION_KEY, _new_version, timeout=None)
+
+
+async def acatalog_version():
+    return await cache.aget_or_set(CATALOG_VERSION_KEY, _new_version, timeout=None)
+
+
+def invalidate_products(product_ids):
+    """Drop cached product details and retire every cached list page"""
+    cache.delete_many([product_cache_key(pk) for pk in product_ids])
+    cache.set(CATALOG_VERSION_KEY, _new_version(), timeout=None)
@@ -0,0 +1,53 @@
+from decimal import Decimal
+
+from django.db.models import Count, Q
+
+# (key, lower bound inclusive, upper bound exclusive); None means open-ended
+PRICE_BUCKETS = [
+    ('0-25', None, Decimal('25')),
+    ('25-50', Decimal('25'), Decimal('50')),
+    ('50-100', Decimal('50'), Decimal('100')),
+    ('100-250', Decimal('100'), Decimal('250')),
+    ('250+', Decimal('250'), None),
+]
+
+STOCK_BUCKETS = [
+    ('in_stock', Q(stock__gt=0)),
+    ('out_of_stock', Q(stock=0)),
+]
+
+
+def _price_condition(low, high):
+    condition = Q()
+    if low is not None:
+        condition &= Q(price__gte=low)
+    if high is not None:
+        condition &= Q(price__lt=high)
+    return condition
+
+
+def compute_facets(queryset):
+    """Count every price and stock bucket of ``queryset`` in one aggregate query"""
+    aggregates = {}
+    for index, (_, low, high) in enumerate(PRICE_BUCKETS):
+        aggregates[f'price_{index}'] = Count('id', filter=_price_condition(low, high))
+    for key, condition in STOCK_BUCKETS:
+        aggregates[key] = Count('id', filter=condition)
+
+    counts = queryset.order_by().aggregate(**aggregates)
+
+    return {
+        'price': [
+            {
+                'key': key,
+                'min': None if low is None else str(low),
+                'max': None if high is None else str(high),
+                'count': counts[f'price_{index}'],
+            }
+            for index, (key, low, high) in enumerate(PRICE_BUCKETS)
+        ],
+        'stock': [
+            {'key': key, 'count': counts[key]}
+            for key, _ in STOCK_BUCKETS
+        ],
+    }
@@ -0,0 +1,155 @@
+"""
+Demand forecasting and reorder suggestions.
+
+Daily unit sales of every product come out of one grouped query into a
+products x days float32 matrix, and every statistic is computed for all
+products at once with NumPy:
+
+- moving average and deviation of the last ``FORECAST_WINDOW_DAYS``
+- exponential smoothing, as a single matrix-vector product
+- safety stock ``z * deviation * sqrt(lead time)`` for ``FORECAST_SERVICE_LEVEL``
+- reorder point ``forecast * lead time + safety stock``
+
+A product at or below its reorder point is suggested enough units to cover
+the lead time and the review period on top of the safety stock.
+
+History covers live and archived orders alike, so it reaches further back
+than ``ORDER_ARCHIVE_AFTER_DAYS``. Archived line items are stored as JSON,
+so they are unpacked in Python, a chunk at a time.
+"""
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from scipy.stats import norm
+
+from .models import Product, ReorderSuggestion
+
+
+def _add_sales(matrix, product_ids, start, product, day, units):
+    product = np.array(product, dtype=np.int64)
+    rows = np.searchsorted(product_ids, product).clip(max=len(product_ids) - 1)
+    # Archived orders may name products deleted since
+    known = product_ids[rows] == product
+    columns = (np.array(day, dtype='datetime64[D]') - np.datetime64(start, 'D')).astype(np.int64)
+    np.add.at(matrix, (rows[known], columns[known]), np.array(units, dtype=np.float32)[known])
+
+
+def sales_matrix(product_ids, end, days, chunk_size=100000):
+    """
+    Units sold per product (rows, in ``product_ids`` order) and day (columns,
+    oldest first) over the ``days`` days before ``end``, a date.
+    """
+    from orders.archive import archived_items
+    from orders.models import ArchivedOrder, OrderItem
+
+    start = end - timedelta(days=days)
+    matrix = np.zeros((len(product_ids), days), dtype=np.float32)
+    if not len(product_ids):
+        return matrix
+    period = {
+        'created_at__gte': timezone.make_aware(datetime.combine(start, time.min)),
+        'created_at__lt': timezone.make_aware(datetime.combine(end, time.min)),
+    }
+
+    rows = (
+        OrderItem.objects.exclude(order__status='cancelled')
+        .filter(**{f'order__{lookup}': value for lookup, value in period.items()})
+        .annotate(day=TruncDate('order__created_at'))
+        .order_by()
+        .values('product_id', 'day')
+        .annotate(units=Sum('quantity'))
+        .values_list('product_id', 'day', 'units')
+        .iterator(chunk_size=chunk_size)
+    )
+    while batch := list(islice(rows, chunk_size)):
+        _add_sales(matrix, product_ids, start, *zip(*batch))
+
+    items = archived_items(ArchivedOrder.objects.exclude(status='cancelled').filter(**period))
+    while batch := list(islice(items, chunk_size)):
+        _, created_at, product, units = zip(*batch)
+        _add_sales(matrix, product_ids, start, product, [timezone.localdate(value) for value in created_at], units)
+    return matrix
+
+
+def smoothing_weights(days, alpha):
+    """
+    Weights that turn a day series into its exponentially smoothed level.
+
+    Unrolls ``level = alpha * sales + (1 - alpha) * level`` started at the
+    first day, so ``sales @ weights`` smooths every product at once.
+    """
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1, dtype=np.float64)
+    weights[0] = (1 - alpha) ** (days - 1)
+    return weights.astype(np.float32)
+
+
+def forecast(sales, stock, window, alpha, lead_time, review, service_level):
+    """Per-product forecast columns, as a dict of arrays"""
+    recent = sales[:, -window:]
+    average = recent.mean(axis=1)
+    deviation = recent.std(axis=1)
+    forecast_daily = sales @ smoothing_weights(sales.shape[1], alpha)
+
+    safety_stock = norm.ppf(service_level) * deviation * np.sqrt(lead_time)
+    reorder_point = forecast_daily * lead_time + safety_stock
+    order_up_to = reorder_point + forecast_daily * review
+    suggested = np.where(stock <= reorder_point, np.ceil(order_up_to - stock), 0).clip(min=0)
+    return {
+        'average_daily_sales': average,
+        'forecast_daily_sales': forecast_daily,
+        'safety_stock': safety_stock,
+        'reorder_point': reorder_point,
+        'suggested_quantity': suggested.astype(np.int64),
+    }
+
+
+@transaction.atomic
+def store(product_ids, stock, columns, computed_at, batch_size=5000):
+    """Replace every suggestion with those for products that need reordering"""
+    ReorderSuggestion.objects.all().delete()
+    positions = np.flatnonzero(columns['suggested_quantity'])
+    for start in range(0, len(positions), batch_size):
+        batch = positions[start:start + batch_size]
+        values = {name: column[batch].tolist() for name, column in columns.items()}
+        ReorderSuggestion.objects.bulk_create([
+            ReorderSuggestion(
+                product_id=product_id,
+                stock=product_stock,
+                computed_at=computed_at,
+                **{name: values[name][index] for name in values}
+            )
+            for index, (product_id, product_stock) in enumerate(
+                zip(product_ids[batch].tolist(), stock[batch].tolist())
+            )
+        ])
+    return len(positions)
+
+
+def forecast_demand(days=None, window=None):
+    """Recompute every reorder suggestion; returns what was processed"""
+    days = days or settings.FORECAST_HISTORY_DAYS
+    window = min(window or settings.FORECAST_WINDOW_DAYS, days)
+    computed_at = timezone.now()
+
+    products = np.array(Product.objects.order_by('id').values_list('id', 'stock'), dtype=np.int64).reshape(-1, 2)
+    product_ids, stock = products[:, 0], products[:, 1]
+    # Whole days only: today's sales are still coming in
+    sales = sales_matrix(product_ids, timezone.localdate(computed_at), days)
+    columns = forecast(
+        sales, stock, window,
+        alpha=settings.FORECAST_SMOOTHING,
+        lead_time=settings.FORECAST_LEAD_TIME_DAYS,
+        review=settings.FORECAST_REVIEW_DAYS,
+        service_level=settings.FORECAST_SERVICE_LEVEL,
+    )
+    return {
+        'products': len(product_ids),
+        'days': days,
+        'suggestions': store(product_ids, stock, columns, computed_at),
+    }
@@ -0,0 +1,128 @@
+import asyncio
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+TARGETS = {
+    'sync': '/api/products/',
+    'async': '/api/async/products/',
+}
+
+# Like for like: the async views cache pages and products, the sync list
+# does not, and the snapshot serves sync list pages only. Neither runs here.
+UNCACHED = {
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+    'CATALOG_SNAPSHOT': False,
+}
+
+
+async def asgi_get(application, path, query):
+    """Run one GET through the ASGI application in-process"""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 50000),
+        'server': ('localhost', 80),
+    }
+    sent = False
+    status = None
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await asyncio.Future()  # Never disconnects; Django cancels this wait
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await application(scope, receive, send)
+    return status
+
+
+async def http_get(host, port, path, query):
+    """Minimal HTTP/1.1 client for benchmarking an external ASGI server"""
+    reader, writer = await asyncio.open_connection(host, port)
+    target = f'{path}?{query}' if query else path
+    writer.write(f'GET {target} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n'.encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    await reader.read()
+    writer.close()
+    return int(status_line.split()[1])
+
+
+class Command(BaseCommand):
+    help = 'Compares concurrent throughput of the sync and async catalog read paths under ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per target')
+        parser.add_argument('--concurrency', type=int, default=50, help='Concurrent connections')
+        parser.add_argument('--query', default='', help='Query string, e.g. "search=lamp&ordering=-price"')
+        parser.add_argument('--pages', type=int, default=5, help='Spread requests over this many pages')
+        parser.add_argument('--host', help='Benchmark a running ASGI server instead of the in-process app')
+        parser.add_argument('--port', type=int, default=8000)
+
+    def handle(self, *args, **options):
+        if options['host']:
+            self.stdout.write(
+                f"Target server: {options['host']}:{options['port']} "
+                "(run it with DummyCache and CATALOG_SNAPSHOT=False to compare like for like)"
+            )
+        else:
+            self.stdout.write('Target: in-process ASGI application, no catalog cache or snapshot')
+
+        for name, path in TARGETS.items():
+            with override_settings(**UNCACHED):
+                result = asyncio.run(self.run_target(path, options))
+            self.stdout.write(
+                f"  {name:>5}: {result['rps']:8.0f} req/s   p50 {result['p50']:6.1f} ms   "
+                f"p95 {result['p95']:6.1f} ms   errors {result['errors']}"
+            )
+
+    async def run_target(self, path, options):
+        from ecommerce_backend.asgi import application
+
+        total = options['requests']
+        pages = max(options['pages'], 1)
+        latencies = []
+        errors = 0
+        counter = iter(range(total))
+
+        async def worker():
+            nonlocal errors
+            for n in counter:
+                query = '&'.join(filter(None, [options['query'], f'page={n % pages + 1}']))
+                started = time.perf_counter()
+                if options['host']:
+                    status = await http_get(options['host'], options['port'], path, query)
+                else:
+                    status = await asgi_get(application, path, query)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if status != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(options['concurrency'])))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'rps': total / elapsed,
+            'p50': statistics.median(latencies),
+            'p95': latencies[int(len(latencies) * 0.95) - 1],
+            'errors': errors,
+        }
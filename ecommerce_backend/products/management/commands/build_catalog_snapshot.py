@@ -0,0 +1,18 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products.snapshot import build_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Renders the precompressed catalog snapshot served to anonymous clients'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        manifest = build_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {manifest['pages']} list pages and {len(manifest['files']) - manifest['pages']} "
+            f"catalog file to {settings.CATALOG_SNAPSHOT_DIR} in {time.perf_counter() - started:.1f}s"
+        ))
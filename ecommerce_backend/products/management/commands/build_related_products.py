@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.recommendations import METRICS, build_related_products
+
+
+class Command(BaseCommand):
+    help = 'Recomputes "frequently bought together" recommendations from order items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--metric', choices=METRICS, default='lift', help='Pair score used for ranking')
+        parser.add_argument('--top', type=int, default=10, help='Recommendations kept per product')
+        parser.add_argument('--min-count', type=int, default=2, help='Baskets a pair must share to be scored')
+        parser.add_argument('--batch-orders', type=int, default=50000, help='Orders read per window')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = build_related_products(
+            metric=options['metric'],
+            top_k=options['top'],
+            min_count=options['min_count'],
+            batch_orders=options['batch_orders'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['recommendations']} recommendations for {result['products']} products "
+            f"from {result['baskets']} baskets and {result['pairs']} product pairs "
+            f"in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products.forecasting import forecast_demand
+
+
+class Command(BaseCommand):
+    help = 'Forecasts daily demand from order history and refreshes the reorder suggestions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Days of history to read (default FORECAST_HISTORY_DAYS)')
+        parser.add_argument('--window', type=int, help='Moving average window in days (default FORECAST_WINDOW_DAYS)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = forecast_demand(days=options['days'], window=options['window'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['suggestions']} reorder suggestions for {result['products']} products "
+            f"over {result['days']} days in {time.perf_counter() - started:.1f}s."
+        ))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.models import Product
+from products.shards import configure, rebalance_all
+
+
+class Command(BaseCommand):
+    help = 'Evens out sharded stock counters and refreshes the cached product stock totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, help='Product to switch to sharded stock (with --shards)')
+        parser.add_argument('--shards', type=int, help='Number of shards for --product; 0 turns sharding off')
+        parser.add_argument('--every', type=float, help='Keep running, rebalancing every this many seconds')
+
+    def handle(self, *args, **options):
+        if options['product'] is not None:
+            if options['shards'] is None or options['shards'] < 0:
+                raise CommandError('--product needs --shards (0 or more).')
+            try:
+                total = configure(options['product'], options['shards'])
+            except Product.DoesNotExist:
+                raise CommandError(f"Product {options['product']} does not exist.")
+            self.stdout.write(self.style.SUCCESS(
+                f"Product {options['product']}: {total} in stock over {options['shards']} shards."
+            ))
+            return
+
+        while True:
+            totals = rebalance_all()
+            self.stdout.write(f'Rebalanced {len(totals)} sharded products.')
+            if not options['every']:
+                return
+            time.sleep(options['every'])
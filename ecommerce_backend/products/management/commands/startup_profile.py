@@ -0,0 +1,98 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so nothing is imported or cached yet. Prints
+# one JSON line of timings (seconds since the script started) on stdout.
+CHILD = '''
+import io, json, sys, time
+started = time.perf_counter()
+
+import django
+django.setup()
+ready = time.perf_counter()
+
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+loaded = time.perf_counter()
+
+warm = {}
+if __WARM__:
+    from ecommerce_backend.warmup import warm_up
+    warm = warm_up()
+warmed = time.perf_counter()
+
+def get(path):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+        'HTTP_ACCEPT': 'application/json', 'wsgi.input': io.BytesIO(),
+        'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+    }
+    status = []
+    begun = time.perf_counter()
+    b''.join(application(environ, lambda s, h, exc_info=None: status.append(s)))
+    return status[0], time.perf_counter() - begun
+
+first_status, first = get(__PATH__)
+second_status, second = get(__PATH__)
+print(json.dumps({
+    'apps_ready': ready - started,
+    'wsgi_loaded': loaded - started,
+    'warm_up': warmed - loaded,
+    'warm_up_parts': warm,
+    'first_response': first,
+    'first_status': first_status,
+    'time_to_first_response': warmed - started + first,
+    'second_response': second,
+}))
+'''
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)')
+
+
+class Command(BaseCommand):
+    help = 'Profiles worker cold start: module import times, app-ready time and time to first response'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/products/', help='Request timed as the first response')
+        parser.add_argument('--top', type=int, default=15, help='Slowest imports to list')
+        parser.add_argument('--runs', type=int, default=3, help='Fresh interpreters per variant (best run is shown)')
+
+    def run_child(self, path, warm, importtime=False):
+        code = CHILD.replace('__WARM__', repr(warm)).replace('__PATH__', repr(path))
+        command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c', code]
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'ecommerce_backend.settings')}
+        result = subprocess.run(command, capture_output=True, text=True, env=env, cwd=os.getcwd())
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+    def handle(self, *args, **options):
+        path = options['path']
+
+        _, importtime = self.run_child(path, warm=False, importtime=True)
+        imports = [
+            (int(cumulative), name.strip())
+            for _, cumulative, name in IMPORTTIME_LINE.findall(importtime)
+        ]
+        self.stdout.write(f"Slowest imports (cumulative, {len(imports)} modules):")
+        for cumulative, name in sorted(imports, reverse=True)[:options['top']]:
+            self.stdout.write(f'  {cumulative / 1000:8.1f} ms  {name}')
+
+        for warm in (False, True):
+            runs = [self.run_child(path, warm)[0] for _ in range(options['runs'])]
+            best = min(runs, key=lambda run: run['time_to_first_response'])
+            self.stdout.write(f"\n{'With' if warm else 'Without'} warm-up (best of {options['runs']}):")
+            self.stdout.write(f"  apps ready             {best['apps_ready'] * 1000:8.1f} ms")
+            self.stdout.write(f"  WSGI app loaded        {best['wsgi_loaded'] * 1000:8.1f} ms")
+            if warm:
+                parts = ', '.join(f'{name} {ms:.1f}' for name, ms in best['warm_up_parts'].items())
+                self.stdout.write(f"  warm-up                {best['warm_up'] * 1000:8.1f} ms ({parts})")
+            self.stdout.write(f"  first response         {best['first_response'] * 1000:8.1f} ms ({best['first_status']})")
+            self.stdout.write(f"  second response        {best['second_response'] * 1000:8.1f} ms")
+            self.stdout.write(f"  time to first response {best['time_to_first_response'] * 1000:8.1f} ms")
@@ -0,0 +1,88 @@
+from django.db import models
+from django.db.models import Case, F, Value, When
+
+
+class ProductManager(models.Manager):
+
+    def lock(self, product_ids):
+        """
+        Lock product rows for the current transaction.
+
+        Rows are always locked in id order so that two transactions touching
+        overlapping products cannot deadlock.
+        """
+        return list(
+            self.select_for_update()
+            .filter(id__in=product_ids)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+
+    def low_stock(self):
+        """Products at or below their reorder threshold (served by product_low_stock_idx)"""
+        return self.filter(stock__lte=F('reorder_threshold')).order_by('stock', 'id')
+
+    def increase_stock_bulk(self, quantities):
+        """Add ``{product_id: quantity}`` to stock with a single UPDATE"""
+        from .shards import give_back
+        from .signals import notify_catalog_changed
+
+        if not quantities:
+            return 0
+
+        # Sharded products take stock back into a shard, not the product row
+        sharded = dict(
+            self.filter(id__in=quantities, stock_shards__gt=0).values_list('id', 'stock_shards')
+        )
+        give_back(sharded, quantities)
+        quantities = {
+            product_id: quantity for product_id, quantity in quantities.items()
+            if product_id not in sharded
+        }
+        if not quantities:
+            return len(sharded)
+
+        self.lock(quantities)
+        updated = self.filter(id__in=quantities).update(
+            stock=F('stock') + Case(
+                *[When(id=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+                output_field=models.PositiveIntegerField(),
+            )
+        )
+        # update() skips post_save, so announce the change explicitly
+        notify_catalog_changed(quantities)
+        return updated + len(sharded)
+
+    def decrease_stock_bulk(self, quantities):
+        """
+        Take ``{product_id: quantity}`` off stock with a single UPDATE.
+
+        The caller must already have checked availability under lock. Low
+        stock alerts are raised for products whose stock crosses their
+        threshold, as ``Product.reduce_stock`` does for single orders.
+        """
+        from .models import LowStockAlert
+        from .signals import notify_catalog_changed
+
+        if not quantities:
+            return 0
+
+        before = list(
+            self.select_for_update()
+            .filter(id__in=quantities)
+            .order_by('id')
+            .values_list('id', 'stock', 'reorder_threshold')
+        )
+        updated = self.filter(id__in=quantities).update(
+            stock=F('stock') - Case(
+                *[When(id=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+                output_field=models.PositiveIntegerField(),
+            )
+        )
+        LowStockAlert.objects.bulk_create([
+            LowStockAlert(product_id=product_id, stock=stock - quantities[product_id], reorder_threshold=threshold)
+            for product_id, stock, threshold in before
+            if stock > threshold >= stock - quantities[product_id]
+        ])
+        notify_catalog_changed(quantities)
+        return updated
@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-19 07:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.PositiveIntegerField(help_text='Stock left right after the threshold was crossed')),
+                ('reorder_threshold', models.PositiveIntegerField(help_text='Threshold in force when the alert was raised')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, help_text='Timestamp when the threshold was crossed')),
+            ],
+            options={
+                'verbose_name': 'Low Stock Alert',
+                'verbose_name_plural': 'Low Stock Alerts',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='reorder_threshold',
+            field=models.PositiveIntegerField(default=10, help_text='Stock level at or below which the product needs reordering'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('stock__lte', models.F('reorder_threshold'))), fields=['stock'], name='product_low_stock_idx'),
+        ),
+        migrations.AddField(
+            model_name='lowstockalert',
+            name='product',
+            field=models.ForeignKey(help_text='Product that ran low', on_delete=django.db.models.deletion.CASCADE, related_name='low_stock_alerts', to='products.product'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-19 07:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_low_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='stock_shards',
+            field=models.PositiveSmallIntegerField(default=0, help_text="Number of StockShard counters holding this product's stock (0 = not sharded)"),
+        ),
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField(help_text='Shard number, from 0 to stock_shards - 1')),
+                ('stock', models.PositiveIntegerField(default=0, help_text='Quantity held by this shard')),
+                ('product', models.ForeignKey(help_text='Product whose stock this shard holds part of', on_delete=django.db.models.deletion.CASCADE, related_name='stock_shard_rows', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Stock Shard',
+                'verbose_name_plural': 'Stock Shards',
+                'constraints': [models.UniqueConstraint(fields=('product', 'index'), name='unique_stock_shard_index')],
+            },
+        ),
+    ]
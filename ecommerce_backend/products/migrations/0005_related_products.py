@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-19 08:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_query_shape_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField(help_text="Position among the product's recommendations, 0 is best")),
+                ('score', models.FloatField(help_text='Lift or cosine similarity of the pair')),
+                ('product', models.ForeignKey(help_text='Product the recommendation is shown on', on_delete=django.db.models.deletion.CASCADE, related_name='related_rows', to='products.product')),
+                ('related', models.ForeignKey(help_text='Recommended product', on_delete=django.db.models.deletion.CASCADE, related_name='+', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Related Product',
+                'verbose_name_plural': 'Related Products',
+                'ordering': ['product_id', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('product', 'rank'), name='unique_related_product_rank')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-19 08:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_related_products'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderSuggestion',
+            fields=[
+                ('product', models.OneToOneField(help_text='Product to reorder', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reorder_suggestion', serialize=False, to='products.product')),
+                ('stock', models.PositiveIntegerField(help_text='Stock when the forecast was made')),
+                ('average_daily_sales', models.FloatField(help_text='Moving average of daily sales over the forecast window')),
+                ('forecast_daily_sales', models.FloatField(help_text='Exponentially smoothed daily sales, used as the forecast')),
+                ('safety_stock', models.FloatField(help_text='Buffer for demand swings during the lead time')),
+                ('reorder_point', models.FloatField(help_text='Stock at which to reorder: lead-time demand plus safety stock')),
+                ('suggested_quantity', models.PositiveIntegerField(help_text='Units to order to cover the lead time and review period')),
+                ('computed_at', models.DateTimeField(help_text='Timestamp of the forecast run')),
+            ],
+            options={
+                'verbose_name': 'Reorder Suggestion',
+                'verbose_name_plural': 'Reorder Suggestions',
+                'ordering': ['-suggested_quantity'],
+                'indexes': [models.Index(fields=['-suggested_quantity'], name='reorder_suggested_qty_idx')],
+            },
+        ),
+    ]
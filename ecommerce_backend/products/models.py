@@ -1,12 +1,13 @@
 from django.db import models
+from django.db.models import F, Q
 from django.core.validators import MinValueValidator
 from decimal import Decimal
+from .managers import ProductManager
 
 
 class Product(models.Model):
     name = models.CharField(
         max_length=255,
-        db_index=True,
         help_text="Product name"
     )
     description = models.TextField(
@@ -23,6 +24,14 @@ class Product(models.Model):
         default=0,
         help_text="Available quantity in stock"
     )
+    reorder_threshold = models.PositiveIntegerField(
+        default=10,
+        help_text="Stock level at or below which the product needs reordering"
+    )
+    stock_shards = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Number of StockShard counters holding this product's stock (0 = not sharded)"
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         help_text="Timestamp when product was created"
@@ -32,13 +41,26 @@ class Product(models.Model):
         help_text="Timestamp when product was last updated"
     )
     
+    objects = ProductManager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Product'
         verbose_name_plural = 'Products'
+        # Each index matches a filter or ordering of ProductViewSet; see
+        # QueryPlanTests in ecommerce_backend/tests.py
         indexes = [
             models.Index(fields=['name']),
             models.Index(fields=['-created_at']),
+            models.Index(fields=['price'], name='product_price_idx'),
+            models.Index(fields=['stock'], name='product_stock_idx'),
+            # Holds only the low-stock rows, so it stays tiny and the
+            # low-stock listing never scans the catalog
+            models.Index(
+                fields=['stock'],
+                name='product_low_stock_idx',
+                condition=Q(stock__lte=F('reorder_threshold')),
+            ),
         ]
     
     def __str__(self):
@@ -48,14 +70,178 @@ class Product(models.Model):
         
         return self.stock > 0
     
+    def is_low_stock(self):
+        
+        return self.stock <= self.reorder_threshold
+    
     def reduce_stock(self, quantity):
         if self.stock >= quantity:
+            was_low = self.is_low_stock()
             self.stock -= quantity
             self.save(update_fields=['stock'])
+            # Alert once, when this reduction crosses the threshold
+            if not was_low and self.is_low_stock():
+                LowStockAlert.objects.create(
+                    product=self,
+                    stock=self.stock,
+                    reorder_threshold=self.reorder_threshold
+                )
             return True
         return False
     
     def increase_stock(self, quantity):
        
         self.stock += quantity
-        self.save(update_fields=['stock'])
\ No newline at end of file
+        self.save(update_fields=['stock'])
+
+
+class StockShard(models.Model):
+    """
+    One of several sub-counters holding a hot product's stock.
+    
+    Buyers decrement a random shard instead of locking the product row;
+    ``Product.stock`` then caches the total (see products.shards).
+    """
+    
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_shard_rows',
+        help_text="Product whose stock this shard holds part of"
+    )
+    index = models.PositiveSmallIntegerField(
+        help_text="Shard number, from 0 to stock_shards - 1"
+    )
+    stock = models.PositiveIntegerField(
+        default=0,
+        help_text="Quantity held by this shard"
+    )
+    
+    class Meta:
+        verbose_name = 'Stock Shard'
+        verbose_name_plural = 'Stock Shards'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'index'], name='unique_stock_shard_index'),
+        ]
+    
+    def __str__(self):
+        return f"Shard {self.index} of product #{self.product_id}"
+
+
+class LowStockAlert(models.Model):
+    """Raised when an order takes a product's stock to its reorder threshold"""
+    
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='low_stock_alerts',
+        help_text="Product that ran low"
+    )
+    stock = models.PositiveIntegerField(
+        help_text="Stock left right after the threshold was crossed"
+    )
+    reorder_threshold = models.PositiveIntegerField(
+        help_text="Threshold in force when the alert was raised"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        help_text="Timestamp when the threshold was crossed"
+    )
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Low Stock Alert'
+        verbose_name_plural = 'Low Stock Alerts'
+    
+    def __str__(self):
+        return f"Product #{self.product_id} low on stock ({self.stock} left)"
+
+
+class RelatedProduct(models.Model):
+    """
+    Precomputed "frequently bought together" entry.
+    
+    Rebuilt as a whole by ``manage.py build_related_products`` (see
+    products.recommendations); ranks run from 0, best first.
+    """
+    
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='related_rows',
+        help_text="Product the recommendation is shown on"
+    )
+    rank = models.PositiveSmallIntegerField(
+        help_text="Position among the product's recommendations, 0 is best"
+    )
+    related = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='+',
+        help_text="Recommended product"
+    )
+    score = models.FloatField(
+        help_text="Lift or cosine similarity of the pair"
+    )
+    
+    class Meta:
+        ordering = ['product_id', 'rank']
+        verbose_name = 'Related Product'
+        verbose_name_plural = 'Related Products'
+        constraints = [
+            # Also the index behind GET /api/products/{id}/related/
+            models.UniqueConstraint(fields=['product', 'rank'], name='unique_related_product_rank'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.related_id} for product #{self.product_id} (rank {self.rank})"
+
+
+class ReorderSuggestion(models.Model):
+    """
+    Suggested purchase for a product whose stock is at its reorder point.
+    
+    Replaced as a whole by ``manage.py forecast_demand`` (see
+    products.forecasting); quantities are in units, rates in units per day.
+    """
+    
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='reorder_suggestion',
+        help_text="Product to reorder"
+    )
+    stock = models.PositiveIntegerField(
+        help_text="Stock when the forecast was made"
+    )
+    average_daily_sales = models.FloatField(
+        help_text="Moving average of daily sales over the forecast window"
+    )
+    forecast_daily_sales = models.FloatField(
+        help_text="Exponentially smoothed daily sales, used as the forecast"
+    )
+    safety_stock = models.FloatField(
+        help_text="Buffer for demand swings during the lead time"
+    )
+    reorder_point = models.FloatField(
+        help_text="Stock at which to reorder: lead-time demand plus safety stock"
+    )
+    suggested_quantity = models.PositiveIntegerField(
+        help_text="Units to order to cover the lead time and review period"
+    )
+    computed_at = models.DateTimeField(
+        help_text="Timestamp of the forecast run"
+    )
+    
+    class Meta:
+        ordering = ['-suggested_quantity']
+        verbose_name = 'Reorder Suggestion'
+        verbose_name_plural = 'Reorder Suggestions'
+        indexes = [
+            models.Index(fields=['-suggested_quantity'], name='reorder_suggested_qty_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Reorder {self.suggested_quantity} of product #{self.product_id}"
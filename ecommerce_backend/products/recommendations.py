@@ -0,0 +1,147 @@
+"""
+"Frequently bought together" recommendations.
+
+``build_related_products`` streams (order, product) pairs out of
+``OrderItem``, then out of archived orders, a window of orders at a time,
+and turns each window into a sparse
+basket x product matrix ``B`` and adds ``B.T @ B`` to a product x product
+co-occurrence matrix. Memory is bounded by the window and by the number of
+product pairs ever bought together, not by the number of order items.
+
+Pairs are then scored for every product at once:
+
+- ``lift``: how much more often the pair is bought together than chance,
+  ``together * baskets / (count_a * count_b)``
+- ``cosine``: ``together / sqrt(count_a * count_b)``
+
+and the best ``top_k`` per product replace the ``RelatedProduct`` table.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import Max, Min
+from scipy import sparse
+
+from .models import Product, RelatedProduct
+
+METRICS = ['lift', 'cosine']
+
+
+def _windows(queryset, batch_orders):
+    """Querysets over consecutive order id windows of ``queryset``"""
+    bounds = queryset.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return
+    for start in range(bounds['low'], bounds['high'] + 1, batch_orders):
+        yield queryset.filter(id__gte=start, id__lt=start + batch_orders)
+
+
+def order_product_pairs(batch_orders):
+    """``(order_id, product_id)`` arrays of live then archived orders, one window at a time"""
+    from orders.archive import archived_items
+    from orders.models import ArchivedOrder, Order, OrderItem
+
+    # Order id windows walk the (order, product) unique index
+    for orders in _windows(Order.objects.exclude(status='cancelled'), batch_orders):
+        yield np.array(
+            OrderItem.objects.filter(order__in=orders).order_by().values_list('order_id', 'product_id'),
+            dtype=np.int64
+        ).reshape(-1, 2)
+    for orders in _windows(ArchivedOrder.objects.exclude(status='cancelled'), batch_orders):
+        yield np.array(
+            [(order_id, product_id) for order_id, _, product_id, _ in archived_items(orders)],
+            dtype=np.int64
+        ).reshape(-1, 2)
+
+
+def co_occurrence(product_ids, batch_orders=50000):
+    """
+    Product x product matrix of how many baskets hold both products.
+
+    ``product_ids`` is the sorted array that maps matrix positions to
+    product ids; the diagonal holds each product's basket count. Returns
+    the matrix and the number of baskets seen. Cancelled orders are skipped.
+    """
+    size = len(product_ids)
+    counts = sparse.csr_matrix((size, size), dtype=np.int64)
+    baskets = 0
+    if not size:
+        return counts, baskets
+
+    for pairs in order_product_pairs(batch_orders):
+        columns = np.searchsorted(product_ids, pairs[:, 1]).clip(max=size - 1)
+        # Archived orders may name products deleted since
+        known = product_ids[columns] == pairs[:, 1]
+        pairs, columns = pairs[known], columns[known]
+        if not len(pairs):
+            continue
+        orders, rows = np.unique(pairs[:, 0], return_inverse=True)
+        basket = sparse.csr_matrix(
+            (np.ones(len(pairs), dtype=np.int64), (rows, columns)),
+            shape=(len(orders), size)
+        )
+        counts = counts + basket.T @ basket
+        baskets += len(orders)
+    return counts, baskets
+
+
+def top_related(counts, baskets, metric='lift', top_k=10, min_count=2):
+    """
+    Best ``top_k`` partners of every product.
+
+    Returns parallel arrays ``(rows, columns, ranks, scores)`` in matrix
+    positions. Pairs bought together fewer than ``min_count`` times are
+    ignored: one shared basket says little and gives rare products huge lift.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric '{metric}', expected one of: {', '.join(METRICS)}.")
+
+    support = counts.diagonal().astype(np.float64)
+    pairs = counts.tocoo()
+    keep = (pairs.row != pairs.col) & (pairs.data >= min_count)
+    rows, columns = pairs.row[keep], pairs.col[keep]
+    together = pairs.data[keep].astype(np.float64)
+
+    if metric == 'lift':
+        scores = together * baskets / (support[rows] * support[columns])
+    else:
+        scores = together / np.sqrt(support[rows] * support[columns])
+
+    # Group by product, best score first (ties by position, for stable output)
+    order = np.lexsort((columns, -scores, rows))
+    rows, columns, scores = rows[order], columns[order], scores[order]
+    ranks = np.arange(len(rows)) - np.searchsorted(rows, rows)
+    keep = ranks < top_k
+    return rows[keep], columns[keep], ranks[keep], scores[keep]
+
+
+@transaction.atomic
+def store(product_ids, rows, columns, ranks, scores, batch_size=5000):
+    """Replace every recommendation with the given ones"""
+    RelatedProduct.objects.all().delete()
+    for start in range(0, len(rows), batch_size):
+        end = start + batch_size
+        RelatedProduct.objects.bulk_create([
+            RelatedProduct(product_id=product_id, related_id=related_id, rank=rank, score=score)
+            for product_id, related_id, rank, score in zip(
+                product_ids[rows[start:end]].tolist(),
+                product_ids[columns[start:end]].tolist(),
+                ranks[start:end].tolist(),
+                scores[start:end].tolist(),
+            )
+        ])
+
+
+def build_related_products(metric='lift', top_k=10, min_count=2, batch_orders=50000):
+    """Recompute the ``RelatedProduct`` table; returns what was processed"""
+    product_ids = np.fromiter(
+        Product.objects.order_by('id').values_list('id', flat=True), dtype=np.int64
+    )
+    counts, baskets = co_occurrence(product_ids, batch_orders)
+    rows, columns, ranks, scores = top_related(counts, baskets, metric, top_k, min_count)
+    store(product_ids, rows, columns, ranks, scores)
+    return {
+        'baskets': baskets,
+        'pairs': (counts.nnz - np.count_nonzero(counts.diagonal())) // 2,
+        'products': len(np.unique(rows)),
+        'recommendations': len(rows),
+    }
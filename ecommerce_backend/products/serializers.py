@@ -1,8 +1,9 @@
 from rest_framework import serializers
-from .models import Product
+from .models import LowStockAlert, Product, RelatedProduct, ReorderSuggestion
+from ecommerce_backend.fieldsets import SparseFieldsetSerializerMixin
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     is_in_stock = serializers.BooleanField(read_only=True)
     
     class Meta:
@@ -13,12 +14,21 @@ class ProductSerializer(serializers.ModelSerializer):
             'description',
             'price',
             'stock',
+            'reorder_threshold',
             'is_in_stock',
             'created_at',
             'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
-    
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Sharded stock lives in StockShard rows (products.shards) and the next
+        # rebalance would overwrite an edit here, as in ProductAdmin
+        if isinstance(self.instance, Product) and self.instance.stock_shards:
+            fields['stock'].read_only = True
+        return fields
+
     def validate_price(self, value):
        
         if value <= 0:
@@ -38,11 +48,44 @@ class ProductSerializer(serializers.ModelSerializer):
         return value.strip()
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
 
     is_in_stock = serializers.BooleanField(read_only=True)
     
     class Meta:
         model = Product
         fields = ['id', 'name', 'price', 'stock', 'is_in_stock', 'created_at']
-        read_only_fields = ['id', 'created_at']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at']
+
+
+class LowStockAlertSerializer(serializers.ModelSerializer):
+    
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    
+    class Meta:
+        model = LowStockAlert
+        fields = ['id', 'product', 'product_name', 'stock', 'reorder_threshold', 'created_at']
+        read_only_fields = fields
+
+
+class RelatedProductSerializer(serializers.ModelSerializer):
+    
+    product = ProductListSerializer(source='related', read_only=True)
+    
+    class Meta:
+        model = RelatedProduct
+        fields = ['rank', 'score', 'product']
+        read_only_fields = fields
+
+
+class ReorderSuggestionSerializer(serializers.ModelSerializer):
+    
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    
+    class Meta:
+        model = ReorderSuggestion
+        fields = [
+            'product', 'product_name', 'stock', 'average_daily_sales', 'forecast_daily_sales',
+            'safety_stock', 'reorder_point', 'suggested_quantity', 'computed_at'
+        ]
+        read_only_fields = fields
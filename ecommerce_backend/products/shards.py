@@ -0,0 +1,134 @@
+"""
+Sharded stock counters for very hot products.
+
+A product with ``stock_shards = N`` keeps its stock in N ``StockShard``
+rows. Checkout decrements one randomly chosen shard with a conditional
+UPDATE, so concurrent buyers of the same product mostly lock different
+rows instead of queueing on the product row. ``Product.stock`` becomes a
+cached total that ``rebalance`` refreshes (``manage.py rebalance_stock_shards``).
+
+Row-level locking is what makes this scale: on SQLite every write takes
+the database-wide lock, so shards bring no extra throughput there.
+"""
+import random
+
+from django.db import models, transaction
+from django.db.models import Case, F, Sum, Value, When
+
+from .models import LowStockAlert, Product, StockShard
+from .signals import notify_catalog_changed
+
+
+def split(total, shards):
+    """Spread ``total`` over ``shards`` counters as evenly as possible"""
+    share, extra = divmod(total, shards)
+    return [share + (1 if index < extra else 0) for index in range(shards)]
+
+
+def _set_shards(product_id, amounts):
+    StockShard.objects.filter(product_id=product_id).update(
+        stock=Case(
+            *[When(index=index, then=Value(amount)) for index, amount in enumerate(amounts)],
+            output_field=models.PositiveIntegerField(),
+        )
+    )
+
+
+def _lock_shards(product_id):
+    """Lock every shard of a product, in index order; returns their stock"""
+    return list(
+        StockShard.objects.select_for_update()
+        .filter(product_id=product_id)
+        .order_by('index')
+        .values_list('stock', flat=True)
+    )
+
+
+@transaction.atomic
+def configure(product_id, shards):
+    """Switch a product to ``shards`` counters, or back to plain stock with 0"""
+    product = Product.objects.select_for_update().get(id=product_id)
+    total = sum(_lock_shards(product_id)) if product.stock_shards else product.stock
+
+    StockShard.objects.filter(product_id=product_id).delete()
+    if shards:
+        StockShard.objects.bulk_create([
+            StockShard(product_id=product_id, index=index, stock=amount)
+            for index, amount in enumerate(split(total, shards))
+        ])
+    Product.objects.filter(id=product_id).update(stock=total, stock_shards=shards)
+    notify_catalog_changed([product_id])
+    return total
+
+
+def take(product, quantity):
+    """
+    Take ``quantity`` from a sharded product; call inside a transaction.
+
+    Tries shards one at a time starting from a random one, and only when no
+    single shard holds enough locks them all to take from several.
+    Returns False if the product's shards hold less than ``quantity``.
+    """
+    start = random.randrange(product.stock_shards)
+    for offset in range(product.stock_shards):
+        index = (start + offset) % product.stock_shards
+        taken = StockShard.objects.filter(
+            product_id=product.id, index=index, stock__gte=quantity
+        ).update(stock=F('stock') - quantity)
+        if taken:
+            return True
+
+    amounts = _lock_shards(product.id)
+    if sum(amounts) < quantity:
+        return False
+    remaining = quantity
+    for index, amount in enumerate(amounts):
+        taken = min(amount, remaining)
+        amounts[index] -= taken
+        remaining -= taken
+    _set_shards(product.id, amounts)
+    return True
+
+
+def give_back(shards_by_product, quantities):
+    """Return stock to one random shard of each sharded product"""
+    for product_id, shards in shards_by_product.items():
+        StockShard.objects.filter(
+            product_id=product_id, index=random.randrange(shards)
+        ).update(stock=F('stock') + quantities[product_id])
+
+
+@transaction.atomic
+def rebalance(product_id):
+    """Even out a product's shards and refresh its cached ``Product.stock``"""
+    product = Product.objects.get(id=product_id)
+    amounts = _lock_shards(product_id)
+    if not amounts:
+        return None
+    total = sum(amounts)
+    _set_shards(product_id, split(total, len(amounts)))
+
+    if total != product.stock:
+        was_low = product.is_low_stock()
+        product.stock = total
+        Product.objects.filter(id=product_id).update(stock=total)
+        notify_catalog_changed([product_id])
+        # Sharded checkouts bypass reduce_stock, so catch the crossing here
+        if not was_low and product.is_low_stock():
+            LowStockAlert.objects.create(
+                product=product,
+                stock=total,
+                reorder_threshold=product.reorder_threshold
+            )
+    return total
+
+
+def rebalance_all():
+    """Rebalance every sharded product; returns ``{product_id: total}``"""
+    product_ids = Product.objects.filter(stock_shards__gt=0).values_list('id', flat=True)
+    return {product_id: rebalance(product_id) for product_id in product_ids}
+
+
+def sharded_total(product_id):
+    """Exact stock of a sharded product, without touching the cached total"""
+    return StockShard.objects.filter(product_id=product_id).aggregate(total=Sum('stock'))['total'] or 0
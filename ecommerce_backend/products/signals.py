@@ -0,0 +1,47 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .models import Product
+
+# Sent after commit whenever product rows change, including bulk
+# ``update()`` calls that bypass post_save. Receivers get ``product_ids``.
+catalog_changed = Signal()
+
+
+def notify_catalog_changed(product_ids):
+    """Send ``catalog_changed`` once the current transaction commits"""
+    transaction.on_commit(
+        partial(catalog_changed.send, sender=Product, product_ids=list(product_ids))
+    )
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    notify_catalog_changed([instance.pk])
+
+
+@receiver(catalog_changed)
+def invalidate_catalog_cache(sender, product_ids, **kwargs):
+    from .cache import invalidate_products
+
+    invalidate_products(product_ids)
+
+
+@receiver(catalog_changed)
+def stream_stock_changes(sender, product_ids, **kwargs):
+    from ecommerce_backend.streams import publish_stock
+
+    publish_stock(product_ids)
+
+
+@receiver(catalog_changed)
+def refresh_catalog_snapshot(sender, **kwargs):
+    if settings.CATALOG_SNAPSHOT:
+        from .snapshot import schedule_rebuild
+
+        schedule_rebuild()
@@ -0,0 +1,328 @@
+"""
+Precompressed static snapshot of the catalog for anonymous traffic.
+
+The first ``CATALOG_SNAPSHOT_PAGES`` pages of the default-ordered product
+list, plus the full catalog, are rendered to JSON files with gzip (and
+brotli, when installed) variants. ``CatalogSnapshotMiddleware`` answers
+matching anonymous requests straight from those files, so they never reach
+DRF, the serializers or the database.
+"""
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+
+from .models import Product
+from .serializers import ProductListSerializer, ProductSerializer
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip variants are always produced
+    brotli = None
+
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = '.build.lock'
+CATALOG_NAME = 'catalog.json'
+LIST_PATH = '/api/products/'
+
+# Preferred first; the identity file is the fallback
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+_manifest_cache = {'key': None, 'data': None}
+_timer = None
+_pending_since = None
+# Wall-clock times of this process's first and latest change not yet built
+_changed = None
+_timer_lock = threading.Lock()
+
+
+def page_name(number):
+    return f'page-{number}.json'
+
+
+def _write_atomic(path, content):
+    # Unique name: other workers may be writing the same file right now
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@contextmanager
+def _build_lock(directory):
+    """One build at a time across processes, so the manifest matches the files"""
+    with open(os.path.join(directory, LOCK_NAME), 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _write_variants(directory, name, content):
+    """Write a file with its compressed variants and return its manifest entry"""
+    path = os.path.join(directory, name)
+    _write_atomic(path, content)
+    _write_atomic(f'{path}.gz', gzip.compress(content, compresslevel=9))
+    encodings = ['gzip']
+    if brotli is not None:
+        _write_atomic(f'{path}.br', brotli.compress(content))
+        encodings.insert(0, 'br')
+    return {
+        'etag': f'"{hashlib.sha1(content).hexdigest()}"',
+        'encodings': encodings,
+    }
+
+
+def _page_link(number):
+    if number == 1:
+        return f'{settings.CATALOG_SNAPSHOT_BASE_URL}{LIST_PATH}'
+    return f'{settings.CATALOG_SNAPSHOT_BASE_URL}{LIST_PATH}?page={number}'
+
+
+def build_snapshot(changed_after=None):
+    """
+    Render the snapshot files; returns the new manifest.
+
+    With ``changed_after`` (a wall-clock time), the build is skipped, and the
+    current manifest returned, if another build started after that time:
+    every worker hears of every change, but one build covers them all.
+    """
+    directory = settings.CATALOG_SNAPSHOT_DIR
+    os.makedirs(directory, exist_ok=True)
+    with _build_lock(directory):
+        if changed_after is not None:
+            manifest = load_manifest()
+            if manifest is not None and manifest.get('started_at', 0) > changed_after:
+                return manifest
+        return _build(directory)
+
+
+def _build(directory):
+    # Changes committed before this are in the files
+    started_at = time.time()
+    renderer = JSONRenderer()
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+
+    # Same queryset and ordering as an unfiltered GET /api/products/
+    queryset = Product.objects.order_by('-created_at')
+    count = queryset.count()
+    num_pages = max(1, -(-count // page_size))
+    files = {}
+
+    for number in range(1, min(settings.CATALOG_SNAPSHOT_PAGES, num_pages) + 1):
+        offset = (number - 1) * page_size
+        payload = {
+            'count': count,
+            'next': _page_link(number + 1) if number < num_pages else None,
+            'previous': _page_link(number - 1) if number > 1 else None,
+            'results': ProductListSerializer(queryset[offset:offset + page_size], many=True).data,
+        }
+        files[page_name(number)] = _write_variants(directory, page_name(number), renderer.render(payload))
+
+    # Full catalog, serialized in chunks to keep memory bounded
+    chunks = []
+    batch = []
+    for product in queryset.iterator(chunk_size=2000):
+        batch.append(product)
+        if len(batch) == 2000:
+            chunks.append(renderer.render(ProductSerializer(batch, many=True).data)[1:-1])
+            batch = []
+    if batch:
+        chunks.append(renderer.render(ProductSerializer(batch, many=True).data)[1:-1])
+    files[CATALOG_NAME] = _write_variants(directory, CATALOG_NAME, b'[' + b','.join(chunks) + b']')
+
+    manifest = {'pages': len(files) - 1, 'files': files, 'started_at': started_at}
+    _write_atomic(os.path.join(directory, MANIFEST_NAME), json.dumps(manifest).encode())
+    return manifest
+
+
+def _start_timer(now):
+    global _timer
+    delay = min(settings.CATALOG_SNAPSHOT_DEBOUNCE, _pending_since + settings.CATALOG_SNAPSHOT_MAX_DELAY - now)
+    _timer = threading.Timer(max(delay, 0), _rebuild_in_background)
+    _timer.daemon = True
+    _timer.start()
+
+
+def _rebuild_in_background():
+    global _timer, _pending_since, _changed
+    with _timer_lock:
+        first, last = _changed
+        # A change may have replaced this timer after it fired
+        if _timer is threading.current_thread():
+            _timer = None
+    try:
+        covered_until = build_snapshot(changed_after=first)['started_at']
+    finally:
+        connection.close()
+
+    # Another worker's build covered only the earlier changes: wait for the
+    # next one, or build once MAX_DELAY has passed since that build started
+    if covered_until < last:
+        with _timer_lock:
+            if _timer is None:
+                now = time.monotonic()
+                _pending_since = now - (time.time() - covered_until)
+                _changed = [covered_until, last]
+                _start_timer(now)
+
+
+def schedule_rebuild():
+    """
+    Debounced rebuild: one build ``CATALOG_SNAPSHOT_DEBOUNCE`` seconds after
+    the last of a burst of product changes, and no later than
+    ``CATALOG_SNAPSHOT_MAX_DELAY`` seconds after the first, so a steady
+    stream of changes cannot postpone it forever.
+    """
+    global _pending_since, _changed
+    with _timer_lock:
+        now = time.monotonic()
+        changed_at = time.time()
+        if _timer is None:
+            _pending_since = now
+            _changed = [changed_at, changed_at]
+        else:
+            _timer.cancel()
+            _changed[1] = changed_at
+        _start_timer(now)
+
+
+def load_manifest():
+    """Read the manifest, re-parsing only when the file changed on disk"""
+    path = os.path.join(settings.CATALOG_SNAPSHOT_DIR, MANIFEST_NAME)
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except FileNotFoundError:
+        return None
+    if _manifest_cache['key'] != key:
+        with open(path, 'rb') as handle:
+            _manifest_cache['data'] = json.loads(handle.read())
+        _manifest_cache['key'] = key
+    return _manifest_cache['data']
+
+
+def accepted_encodings(header):
+    """Content codings an Accept-Encoding header allows, with their q-values"""
+    accepted = {}
+    for part in header.split(','):
+        coding, *params = [item.strip() for item in part.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding:
+            accepted[coding.lower()] = quality
+    return accepted
+
+
+def serve_file(request, name, manifest):
+    """Response for one snapshot file, negotiating encoding and honouring ETags"""
+    entry = manifest['files'].get(name)
+    if entry is None:
+        return None
+
+    etag = entry['etag']
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        path = os.path.join(settings.CATALOG_SNAPSHOT_DIR, name)
+        encoding = None
+        for candidate, suffix in ENCODINGS:
+            # q=0 refuses a coding; "*" stands for any coding not listed
+            if candidate in entry['encodings'] and accepted.get(candidate, accepted.get('*', 0)) > 0:
+                encoding, path = candidate, path + suffix
+                break
+        response = FileResponse(open(path, 'rb'), content_type='application/json')
+        if encoding:
+            response['Content-Encoding'] = encoding
+
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.CATALOG_SNAPSHOT_DEBOUNCE}'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+class CatalogSnapshotMiddleware:
+    """Serve anonymous, unfiltered product list pages from the snapshot"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if settings.CATALOG_SNAPSHOT and self.is_snapshot_request(request):
+            response = self.snapshot_response(request)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if settings.CATALOG_SNAPSHOT and self.is_snapshot_request(request):
+            # File access off the event loop, for snapshot hits only
+            response = await sync_to_async(self.snapshot_response, thread_sensitive=False)(request)
+            if response is not None:
+                return response
+        return await self.get_response(request)
+
+    def snapshot_response(self, request):
+        manifest = load_manifest()
+        if manifest is None:
+            return None
+        number = int(request.GET.get('page', 1))
+        if number > manifest['pages']:
+            return None
+        return serve_file(request, page_name(number), manifest)
+
+    def is_snapshot_request(self, request):
+        if request.method not in ('GET', 'HEAD') or request.path != LIST_PATH:
+            return False
+        # Anyone authenticated may see a different response (sessions, staff)
+        if 'Authorization' in request.headers or settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return False
+        # Browsers get DRF's browsable API instead
+        if 'text/html' in request.headers.get('Accept', ''):
+            return False
+        # Only the default ordering with no filters, optionally a page number
+        if set(request.GET) - {'page'}:
+            return False
+        page = request.GET.get('page', '1')
+        return page.isdigit() and int(page) >= 1
+
+
+def snapshot_file(request, name):
+    """Serve ``catalog.json`` or a page file from the snapshot directory"""
+    manifest = load_manifest()
+    response = serve_file(request, name, manifest) if manifest else None
+    if response is None:
+        raise Http404('Snapshot file not found.')
+    return response
@@ -1,3 +1,629 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from orders.archive import archive_orders
+from orders.models import Order, OrderItem
+from . import shards, snapshot
+from .cache import invalidate_products
+from .forecasting import forecast_demand, smoothing_weights
+from .models import LowStockAlert, Product, RelatedProduct, ReorderSuggestion, StockShard
+from .recommendations import build_related_products
+
+User = get_user_model()
+
+
+class StockShardTests(TestCase):
+
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Lamp', price=Decimal('10.00'), stock=10, reorder_threshold=3
+        )
+        shards.configure(self.product.id, 3)
+        self.product.refresh_from_db()
+
+    def shard_stock(self):
+        return list(StockShard.objects.filter(product=self.product).order_by('index').values_list('stock', flat=True))
+
+    def test_configure_splits_and_merges_stock(self):
+        self.assertEqual(self.shard_stock(), [4, 3, 3])
+
+        self.assertEqual(shards.configure(self.product.id, 0), 10)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.stock_shards), (10, 0))
+        self.assertFalse(StockShard.objects.exists())
+
+    def test_take_from_one_shard(self):
+        with mock.patch('products.shards.random.randrange', return_value=1):
+            self.assertTrue(shards.take(self.product, 2))
+        self.assertEqual(self.shard_stock(), [4, 1, 3])
+
+    def test_take_across_shards_and_refuse_oversell(self):
+        self.assertTrue(shards.take(self.product, 6))
+        self.assertEqual(sum(self.shard_stock()), 4)
+        self.assertFalse(shards.take(self.product, 5))
+        self.assertEqual(sum(self.shard_stock()), 4)
+
+    def test_give_back(self):
+        with mock.patch('products.shards.random.randrange', return_value=2):
+            shards.give_back({self.product.id: 3}, {self.product.id: 5})
+        self.assertEqual(self.shard_stock(), [4, 3, 8])
+
+    def test_rebalance_refreshes_total_and_alerts_once(self):
+        shards.take(self.product, 8)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 10)  # Cached total is stale until rebalanced
+
+        self.assertEqual(shards.rebalance(self.product.id), 2)
+        self.assertEqual(self.shard_stock(), [1, 1, 0])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 2)
+        self.assertEqual(LowStockAlert.objects.filter(product=self.product).count(), 1)
+
+        shards.rebalance(self.product.id)
+        self.assertEqual(LowStockAlert.objects.filter(product=self.product).count(), 1)
+
+    def test_stock_is_read_only_through_the_api(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(email='staff@example.com', password='testpass123', is_staff=True))
+
+        response = client.patch(f'/api/products/{self.product.id}/', {'stock': 500, 'price': '12.00'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.price), (10, Decimal('12.00')))
+        self.assertEqual(sum(self.shard_stock()), 10)
+
+        shards.configure(self.product.id, 0)
+        client.patch(f'/api/products/{self.product.id}/', {'stock': 500}, format='json')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock, 500)
+
+
+class CatalogSnapshotTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        override = override_settings(CATALOG_SNAPSHOT=True, CATALOG_SNAPSHOT_DIR=self.directory, CATALOG_SNAPSHOT_PAGES=2)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        Product.objects.bulk_create([
+            Product(name=f'Lamp {index}', price=Decimal('10.00'), stock=5)
+            for index in range(settings.REST_FRAMEWORK['PAGE_SIZE'] * 3)
+        ])
+        self.manifest = snapshot.build_snapshot()
+
+    def get(self, path='/api/products/', **headers):
+        return self.client.get(path, headers={'Accept': 'application/json', **headers})
+
+    def assertFromSnapshot(self, response, expected=True):
+        self.assertEqual(response.streaming, expected)
+
+    def test_serves_anonymous_unfiltered_pages(self):
+        with self.assertNumQueries(0):
+            response = self.get()
+        self.assertFromSnapshot(response)
+        self.assertEqual(response['ETag'], self.manifest['files']['page-1.json']['etag'])
+        body = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(body['count'], 30)
+        self.assertEqual(len(body['results']), 10)
+
+        self.assertFromSnapshot(self.get('/api/products/?page=2'))
+
+    async def test_serves_pages_under_asgi(self):
+        response = await self.async_client.get('/api/products/?page=2', headers={'Accept': 'application/json'})
+        self.assertFromSnapshot(response)
+        self.assertEqual(response['ETag'], self.manifest['files']['page-2.json']['etag'])
+
+        response = await self.async_client.get('/api/products/?page=3', headers={'Accept': 'application/json'})
+        self.assertFromSnapshot(response, expected=False)
+        self.assertEqual(response.json()['previous'], 'http://testserver/api/products/?page=2')
+
+    def test_everything_else_reaches_the_api(self):
+        self.assertFromSnapshot(self.get('/api/products/?page=3'), expected=False)  # Beyond the snapshot
+        self.assertFromSnapshot(self.get('/api/products/?page=x'), expected=False)
+        self.assertFromSnapshot(self.get('/api/products/?ordering=price'), expected=False)
+        self.assertFromSnapshot(self.get(Authorization='Bearer token'), expected=False)
+        self.assertFromSnapshot(self.get(Accept='text/html'), expected=False)
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = 'session'
+        self.assertFromSnapshot(self.get(), expected=False)
+
+    def test_if_none_match(self):
+        etag = self.manifest['files']['page-1.json']['etag']
+        response = self.get(**{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        self.assertEqual(self.get(**{'If-None-Match': '"stale"'}).status_code, 200)
+
+    def test_gzip_negotiation(self):
+        response = self.get(**{'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        compressed = b''.join(response.streaming_content)
+
+        plain = self.get()
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(gzip.decompress(compressed), b''.join(plain.streaming_content))
+
+    def test_refused_encodings_are_not_served(self):
+        self.assertFalse(self.get(**{'Accept-Encoding': 'gzip;q=0, deflate'}).has_header('Content-Encoding'))
+        self.assertEqual(self.get(**{'Accept-Encoding': 'br;q=0, *'})['Content-Encoding'], 'gzip')
+        self.assertEqual(self.get(**{'Accept-Encoding': 'GZIP; q=0.5'})['Content-Encoding'], 'gzip')
+        self.assertFalse(self.get(**{'Accept-Encoding': '*;q=0'}).has_header('Content-Encoding'))
+
+    def test_rebuild_leaves_no_temporary_files(self):
+        snapshot.build_snapshot()
+        self.assertFalse([name for name in os.listdir(self.directory) if name.endswith('.tmp')])
+
+    @override_settings(CATALOG_SNAPSHOT_DEBOUNCE=60, CATALOG_SNAPSHOT_MAX_DELAY=90)
+    def test_rebuild_is_debounced(self):
+        timers = []
+
+        def timer(delay, function):
+            timers.append(mock.Mock(delay=delay))
+            return timers[-1]
+
+        with mock.patch('products.snapshot.threading.Timer', timer), \
+                mock.patch('products.snapshot.time.monotonic', side_effect=[0, 10, 40]):
+            for _ in range(3):
+                snapshot.schedule_rebuild()
+            snapshot._timer = None
+
+        self.assertEqual([t.delay for t in timers], [60, 60, 50])
+        self.assertEqual([t.cancel.called for t in timers], [True, True, False])
+
+    def test_skips_builds_another_worker_already_covered(self):
+        started_at = self.manifest['started_at']
+        with mock.patch('products.snapshot._build') as build:
+            self.assertEqual(snapshot.build_snapshot(changed_after=started_at - 1), self.manifest)
+            build.assert_not_called()
+            snapshot.build_snapshot(changed_after=started_at + 1)
+            build.assert_called_once()
+
+    def test_background_rebuild_waits_for_changes_another_build_missed(self):
+        started_at = self.manifest['started_at']
+        timers = []
+
+        def timer(delay, function):
+            timers.append(mock.Mock(delay=delay))
+            return timers[-1]
+
+        with mock.patch('products.snapshot._build') as build, \
+                mock.patch('products.snapshot.threading.Timer', timer), \
+                mock.patch('products.snapshot.connection'):
+            # Both changes were in the other worker's build
+            snapshot._changed = [started_at - 5, started_at - 1]
+            snapshot._rebuild_in_background()
+            self.assertEqual(timers, [])
+
+            # The second was not: build by MAX_DELAY after that build started
+            snapshot._changed = [started_at - 5, started_at + 5]
+            snapshot._rebuild_in_background()
+            snapshot._timer = None
+
+        build.assert_not_called()
+        self.assertEqual(len(timers), 1)
+        self.assertEqual(snapshot._changed, [started_at, started_at + 5])
+
+
+class RelatedProductsTests(TestCase):
+
+    def setUp(self):
+        self.buyer = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        self.lamp, self.bulb, self.shade, self.rug = [
+            Product.objects.create(name=name, price=Decimal('10.00'), stock=100)
+            for name in ['Lamp', 'Bulb', 'Shade', 'Rug']
+        ]
+        baskets = [
+            [self.lamp, self.bulb], [self.lamp, self.bulb], [self.lamp, self.bulb, self.shade],
+            [self.lamp, self.shade], [self.lamp, self.rug], [self.rug], [self.rug],
+        ]
+        for basket in baskets:
+            self.place(basket)
+
+    def place(self, products, status='pending'):
+        order = Order.objects.create(user=self.buyer, total_amount=Decimal('10.00'), status=status)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=product.price)
+            for product in products
+        ])
+
+    def related(self, product):
+        return [
+            (row['product']['id'], row['rank'])
+            for row in self.client.get(f'/api/products/{product.id}/related/').data['results']
+        ]
+
+    def test_ranks_by_lift_and_ignores_rare_pairs(self):
+        # Small windows so the matrix is built from several
+        result = build_related_products(metric='lift', top_k=5, min_count=2, batch_orders=2)
+
+        self.assertEqual(result['baskets'], 7)
+        # Bulb: 3 shared baskets of 3; shade: 2 of 2, so both lift 7/5
+        self.assertEqual(self.related(self.lamp), [(self.bulb.id, 0), (self.shade.id, 1)])
+        self.assertEqual(self.related(self.bulb), [(self.lamp.id, 0)])
+        # Lamp and rug share one basket only
+        self.assertEqual(self.related(self.rug), [])
+
+    def test_cosine_and_top_k(self):
+        build_related_products(metric='cosine', top_k=1, min_count=1)
+
+        self.assertEqual(self.related(self.lamp), [(self.bulb.id, 0)])
+        self.assertEqual(self.related(self.shade), [(self.lamp.id, 0)])
+
+    def test_rebuild_replaces_rows_and_skips_cancelled_orders(self):
+        build_related_products(min_count=1)
+        Order.objects.update(status='cancelled')
+        self.place([self.shade, self.rug])
+        self.place([self.shade, self.rug])
+
+        build_related_products(min_count=1)
+
+        self.assertEqual(
+            list(RelatedProduct.objects.values_list('product_id', 'related_id')),
+            [(self.shade.id, self.rug.id), (self.rug.id, self.shade.id)]
+        )
+
+    def test_archived_orders_still_count(self):
+        build_related_products(metric='lift', top_k=5, min_count=2)
+        live = list(RelatedProduct.objects.values_list('product_id', 'related_id', 'rank', 'score'))
+        gone = Product.objects.create(name='Gone', price=Decimal('10.00'))
+        self.place([self.lamp, gone], status='completed')
+        Order.objects.update(status='completed')
+        self.assertEqual(archive_orders(cutoff=timezone.now()), 8)
+        gone.delete()
+
+        result = build_related_products(metric='lift', top_k=5, min_count=2, batch_orders=3)
+
+        self.assertEqual(result['baskets'], 8)
+        self.assertFalse(Order.objects.exists())
+        # Same pairs and ranks as before archiving
+        related = list(RelatedProduct.objects.values_list('product_id', 'related_id', 'rank'))
+        self.assertEqual(related, [row[:3] for row in live])
+
+    def test_single_query_and_unknown_product(self):
+        build_related_products()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/products/{self.lamp.id}/related/')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(self.client.get('/api/products/999999/related/').status_code, 404)
+
+
+@override_settings(FORECAST_LEAD_TIME_DAYS=7, FORECAST_REVIEW_DAYS=7, FORECAST_WINDOW_DAYS=28)
+class ForecastTests(TestCase):
+
+    def setUp(self):
+        self.buyer = User.objects.create_user(email='buyer@example.com', password='testpass123')
+        self.hot = Product.objects.create(name='Lamp', price=Decimal('10.00'), stock=10)
+        self.stocked = Product.objects.create(name='Rug', price=Decimal('10.00'), stock=1000)
+        # Four units a day of each for four weeks
+        for days_ago in range(1, 29):
+            self.sell([self.hot, self.stocked], 4, days_ago)
+
+    def sell(self, products, quantity, days_ago, status='pending'):
+        order = Order.objects.create(user=self.buyer, total_amount=Decimal('10.00'), status=status)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=quantity, price=product.price)
+            for product in products
+        ])
+
+    def test_smoothing_weights_match_recursion(self):
+        sales = np.random.default_rng(0).integers(0, 20, size=(3, 50)).astype(np.float32)
+        level = sales[:, 0].copy()
+        for day in range(1, 50):
+            level = 0.3 * sales[:, day] + 0.7 * level
+
+        np.testing.assert_allclose(sales @ smoothing_weights(50, 0.3), level, rtol=1e-5)
+
+    def test_suggests_products_below_reorder_point(self):
+        # Ignored: cancelled, and today's incomplete day
+        self.sell([self.hot], 500, 2, status='cancelled')
+        self.sell([self.hot], 500, 0)
+
+        result = forecast_demand(days=60)
+
+        self.assertEqual(result, {'products': 2, 'days': 60, 'suggestions': 1})
+        suggestion = ReorderSuggestion.objects.get()
+        self.assertEqual(suggestion.product, self.hot)
+        self.assertAlmostEqual(suggestion.average_daily_sales, 4)
+        self.assertAlmostEqual(suggestion.safety_stock, 0)
+        # The smoothed level still carries the quiet days before the four weeks
+        self.assertLess(suggestion.forecast_daily_sales, 4)
+        self.assertGreater(suggestion.forecast_daily_sales, 3.9)
+        self.assertEqual(
+            suggestion.suggested_quantity,
+            int(np.ceil(suggestion.forecast_daily_sales * 14 - 10))
+        )
+
+    def test_archived_orders_still_count(self):
+        forecast_demand(days=60)
+        live = ReorderSuggestion.objects.values_list('average_daily_sales', 'forecast_daily_sales').get()
+        Order.objects.update(status='completed')
+        self.assertEqual(archive_orders(cutoff=timezone.now()), 28)
+        # An archived sale of a product deleted since is skipped
+        gone = Product.objects.create(name='Gone', price=Decimal('10.00'))
+        self.sell([gone], 9, 3, status='completed')
+        archive_orders(cutoff=timezone.now())
+        gone.delete()
+
+        forecast_demand(days=60)
+
+        suggestion = ReorderSuggestion.objects.get()
+        self.assertEqual(suggestion.product, self.hot)
+        self.assertEqual((suggestion.average_daily_sales, suggestion.forecast_daily_sales), live)
+
+    def test_staff_endpoint(self):
+        forecast_demand(days=60)
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        self.assertEqual(client.get('/api/products/reorder-suggestions/').status_code, 403)
+
+        self.buyer.is_staff = True
+        self.buyer.save()
+        response = client.get('/api/products/reorder-suggestions/')
+        self.assertEqual([row['product'] for row in response.data['results']], [self.hot.id])
+
+
+class ProductBulkTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.lamp, self.rug, self.bulb = [
+            Product.objects.create(name=name, price=Decimal('10.00'), stock=5)
+            for name in ['Lamp', 'Rug', 'Bulb']
+        ]
+
+    def bulk(self, ids, **params):
+        return self.client.get('/api/products/bulk/', {'ids': ','.join(map(str, ids)), **params})
+
+    def test_request_order_and_missing_ids(self):
+        response = self.bulk([self.bulb.id, 999999, self.lamp.id, self.bulb.id])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([data['name'] for data in response.data['results']], ['Bulb', 'Lamp'])
+        self.assertEqual(response.data['missing'], [999999])
+
+    def test_only_cache_misses_reach_the_database(self):
+        with self.assertNumQueries(1):
+            self.bulk([self.lamp.id])
+        with self.assertNumQueries(1):
+            response = self.bulk([self.lamp.id, self.rug.id, self.bulb.id])
+        self.assertEqual(len(response.data['results']), 3)
+        with self.assertNumQueries(0):
+            self.bulk([self.bulb.id, self.lamp.id])
+
+    def test_product_changes_invalidate_entries(self):
+        self.bulk([self.lamp.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lamp.reduce_stock(2)
+
+        self.assertEqual(self.bulk([self.lamp.id]).data['results'][0]['stock'], 3)
+
+    def test_sparse_fields_and_validation(self):
+        response = self.bulk([self.rug.id], fields='id,name')
+        self.assertEqual(response.data['results'], [{'id': self.rug.id, 'name': 'Rug'}])
+
+        self.assertEqual(self.bulk(['abc']).status_code, 400)
+        self.assertEqual(self.client.get('/api/products/bulk/').status_code, 400)
+        self.assertEqual(self.bulk(range(1, 202)).status_code, 400)
+
+
+class SparseFieldsetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.lamp = Product.objects.create(name='Lamp', description='A' * 1000, price=Decimal('10.00'), stock=5)
+
+    def test_only_requested_fields_are_returned_and_loaded(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/products/', {'fields': 'id,name,is_in_stock'})
+
+        self.assertEqual(response.data['results'], [{'id': self.lamp.id, 'name': 'Lamp', 'is_in_stock': True}])
+        select = queries.captured_queries[-1]['sql']
+        self.assertIn('"stock"', select)  # is_in_stock needs it
+        self.assertNotIn('"description"', select)
+
+    def test_exclude(self):
+        response = self.client.get(f'/api/products/{self.lamp.id}/', {'exclude': 'description,updated_at'})
+        self.assertNotIn('description', response.data)
+        self.assertIn('price', response.data)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get('/api/products/', {'fields': 'id,bogus,nope', 'exclude': 'price'})
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.data['fields'][0].startswith('Unknown fields: bogus, nope.'))
+        self.assertNotIn('exclude', response.data)
+
+        response = self.client.get(f'/api/products/{self.lamp.id}/', {'exclude': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('bogus', response.data['exclude'][0])
+        self.assertEqual(self.client.get('/api/products/bulk/', {'ids': self.lamp.id, 'fields': 'bogus'}).status_code, 400)
+
+    def test_writes_see_the_full_serializer(self):
+        self.client.force_login(User.objects.create_user(email='staff@example.com', password='testpass123', is_staff=True))
+        response = self.client.patch(
+            f'/api/products/{self.lamp.id}/?fields=bogus', {'stock': 7}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['product']['stock'], 7)
+
+
+class AsyncCatalogTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.lamp, self.rug, self.bulb = [
+            Product.objects.create(name=name, description=f'{name} for the home', price=Decimal(price), stock=stock)
+            for name, price, stock in [('Lamp', '25.00', 5), ('Rug', '120.00', 0), ('Bulb', '3.50', 40)]
+        ]
+
+    async def test_list_matches_the_sync_endpoint(self):
+        for query in ['', '?ordering=price', '?price__gte=10&ordering=-name', '?search=home&stock__gte=1']:
+            with self.subTest(query=query):
+                response = await self.async_client.get(f'/api/async/products/{query}')
+                expected = await sync_to_async(self.client.get)(f'/api/products/{query}', headers={'Accept': 'application/json'})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    {key: response.json()[key] for key in ['count', 'results']},
+                    {key: expected.json()[key] for key in ['count', 'results']},
+                )
+
+    async def test_search_and_detail_match_the_sync_endpoints(self):
+        response = await self.async_client.get('/api/async/products/search/?search=rug')
+        self.assertEqual([row['name'] for row in response.json()['results']], ['Rug'])
+
+        response = await self.async_client.get(f'/api/async/products/{self.lamp.id}/')
+        expected = await sync_to_async(self.client.get)(f'/api/products/{self.lamp.id}/')
+        self.assertEqual(response.json(), expected.json())
+
+    async def test_status_codes(self):
+        for path, status in [
+            ('/api/async/products/999999/', 404),
+            ('/api/async/products/?page=9', 404),
+            ('/api/async/products/?page=x', 404),
+            ('/api/async/products/?price__gte=abc', 400),
+            ('/api/async/products/search/', 400),
+        ]:
+            with self.subTest(path=path):
+                self.assertEqual((await self.async_client.get(path)).status_code, status)
+        self.assertEqual((await self.async_client.post('/api/async/products/')).status_code, 405)
+
+    async def test_runs_on_the_event_loop(self):
+        # In DEBUG Django logs every sync/async adaptation of a middleware or view
+        with self.settings(DEBUG=True), self.assertNoLogs('django.request', 'DEBUG'):
+            response = await AsyncClient().get('/api/async/products/')
+        self.assertEqual(response.status_code, 200)
+
+    async def test_cached_until_products_change(self):
+        list_path, detail_path = '/api/async/products/?ordering=price', f'/api/async/products/{self.bulb.id}/'
+        await self.async_client.get(list_path)
+        await self.async_client.get(detail_path)
+        # update() sends no signal, so the cached copies are still served
+        await Product.objects.filter(id=self.bulb.id).aupdate(stock=1)
+
+        self.assertEqual((await self.async_client.get(list_path)).json()['results'][0]['stock'], 40)
+        self.assertEqual((await self.async_client.get(detail_path)).json()['stock'], 40)
+
+        await sync_to_async(invalidate_products)([self.bulb.id])
+        self.assertEqual((await self.async_client.get(list_path)).json()['results'][0]['stock'], 1)
+        self.assertEqual((await self.async_client.get(detail_path)).json()['stock'], 1)
+
+
+class FacetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for name, price, stock in [
+            ('Desk lamp', '20.00', 5), ('Floor lamp', '80.00', 0), ('Lamp shade', '30.00', 2),
+            ('Rug', '300.00', 1), ('Bulb', '3.00', 0),
+        ]:
+            Product.objects.create(name=name, price=Decimal(price), stock=stock)
+
+    def facets(self, **params):
+        response = self.client.get('/api/products/', {'facets': 'true', **params}, headers={'Accept': 'application/json'})
+        self.assertEqual(response.status_code, 200)
+        facets = response.data['facets']
+        return (
+            {bucket['key']: bucket['count'] for bucket in facets['price']},
+            {bucket['key']: bucket['count'] for bucket in facets['stock']},
+        )
+
+    def test_counts_follow_filters_and_search(self):
+        self.assertEqual(self.facets(), (
+            {'0-25': 2, '25-50': 1, '50-100': 1, '100-250': 0, '250+': 1},
+            {'in_stock': 3, 'out_of_stock': 2},
+        ))
+        self.assertEqual(self.facets(search='lamp', price__gte='25'), (
+            {'0-25': 0, '25-50': 1, '50-100': 1, '100-250': 0, '250+': 0},
+            {'in_stock': 1, 'out_of_stock': 1},
+        ))
+        self.assertNotIn('facets', self.client.get('/api/products/').data)
+
+    def test_cached_across_pages_and_orderings(self):
+        self.facets(search='lamp')
+        with self.assertNumQueries(2):  # Count and page; facets come from the cache
+            self.facets(search='lamp', ordering='-price')
+
+    def test_catalog_version_change_recomputes(self):
+        self.facets()
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name='Vase', price=Decimal('120.00'), stock=3)
+
+        price, stock = self.facets()
+        self.assertEqual((price['100-250'], stock['in_stock']), (1, 4))
+
+
+class LowStockTests(TestCase):
+
+    def setUp(self):
+        self.lamp = Product.objects.create(name='Lamp', price=Decimal('10.00'), stock=12, reorder_threshold=10)
+        self.rug = Product.objects.create(name='Rug', price=Decimal('10.00'), stock=50, reorder_threshold=10)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(email='staff@example.com', password='testpass123', is_staff=True))
+
+    def alerts(self, product):
+        return list(LowStockAlert.objects.filter(product=product).order_by('id').values_list('stock', 'reorder_threshold'))
+
+    def test_alert_once_when_stock_crosses_the_threshold(self):
+        self.lamp.reduce_stock(1)
+        self.assertEqual(self.alerts(self.lamp), [])
+
+        self.lamp.reduce_stock(2)
+        self.lamp.reduce_stock(4)
+        self.assertEqual(self.alerts(self.lamp), [(9, 10)])
+
+        # Restocked, then crossing again is a new alert
+        self.lamp.increase_stock(20)
+        self.lamp.reduce_stock(20)
+        self.assertEqual(self.alerts(self.lamp), [(9, 10), (5, 10)])
+
+    def test_bulk_decrease_alerts_crossings_only(self):
+        Product.objects.decrease_stock_bulk({self.lamp.id: 3, self.rug.id: 3})
+        Product.objects.decrease_stock_bulk({self.lamp.id: 1})
+
+        self.assertEqual(self.alerts(self.lamp), [(9, 10)])
+        self.assertEqual(self.alerts(self.rug), [])
+
+    def test_low_stock_endpoint(self):
+        Product.objects.filter(id=self.rug.id).update(stock=3)
+        Product.objects.filter(id=self.lamp.id).update(stock=10)
+
+        response = self.client.get('/api/products/low-stock/')
+
+        self.assertEqual([row['name'] for row in response.data['results']], ['Rug', 'Lamp'])
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/products/low-stock/').status_code, 401)
+
+    def test_alerts_endpoint(self):
+        self.lamp.reduce_stock(5)
+        self.rug.reduce_stock(45)
+        first, second = LowStockAlert.objects.order_by('id')
+
+        response = self.client.get('/api/products/low-stock/alerts/')
+        self.assertEqual([row['id'] for row in response.data['results']], [second.id, first.id])
+        self.assertEqual(response.data['results'][0]['product_name'], 'Rug')
+
+        response = self.client.get('/api/products/low-stock/alerts/', {'after': first.id})
+        self.assertEqual([row['id'] for row in response.data['results']], [second.id])
+        self.assertEqual(self.client.get('/api/products/low-stock/alerts/', {'after': 'x'}).status_code, 400)
@@ -1,6 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import ProductViewSet
+from . import async_views
+from .snapshot import snapshot_file
 
 # Create a router and register our viewset
 router = DefaultRouter()
@@ -9,4 +11,12 @@ router.register(r'products', ProductViewSet, basename='product')
 # The API URLs are now determined automatically by the router
 urlpatterns = [
     path('', include(router.urls)),
-]
\ No newline at end of file
+
+    # Async read-only catalog (same semantics as the viewset, served natively under ASGI)
+    path('async/products/', async_views.product_list, name='product-async-list'),
+    path('async/products/search/', async_views.product_search, name='product-async-search'),
+    path('async/products/<int:pk>/', async_views.product_detail, name='product-async-detail'),
+
+    # Precompressed catalog snapshot files (catalog.json, page-N.json)
+    path('catalog/snapshot/<str:name>', snapshot_file, name='catalog-snapshot'),
+]
@@ -1,16 +1,37 @@
 from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Product
-from .serializers import ProductSerializer, ProductListSerializer
+from .models import LowStockAlert, Product, RelatedProduct, ReorderSuggestion
+from .serializers import (
+    LowStockAlertSerializer,
+    ProductSerializer,
+    ProductListSerializer,
+    RelatedProductSerializer,
+    ReorderSuggestionSerializer
+)
 from .permissions import IsAdminOrReadOnly
+from .cache import catalog_version, facets_cache_key, product_cache_key
+from .facets import compute_facets
+from ecommerce_backend.db_router import ReplicaReadMixin
+from ecommerce_backend.fieldsets import SparseFieldsetViewMixin, requested_fields, serializer_field_names
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ReplicaReadMixin, SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsAdminOrReadOnly]
     
+    # ?fields= / ?exclude= support (see ecommerce_backend.fieldsets)
+    sparse_field_columns = {
+        'is_in_stock': ['stock'],
+    }
+    
     # Enable filtering, searching, and ordering
     filter_backends = [
         DjangoFilterBackend,
@@ -31,11 +52,133 @@ class ProductViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'price', 'stock', 'created_at']  # ?ordering=-price
     ordering = ['-created_at']  # Default ordering
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        keep = self.get_sparse_fields()
+        if keep is not None:
+            queryset = self.apply_sparse_fields(queryset, keep)
+        return queryset
+    
     def get_serializer_class(self):
         if self.action == 'list':
             return ProductListSerializer
+        if self.action == 'low_stock_alerts':
+            return LowStockAlertSerializer
+        if self.action == 'related':
+            return RelatedProductSerializer
+        if self.action == 'reorder_suggestions':
+            return ReorderSuggestionSerializer
         return ProductSerializer
     
+    def list(self, request, *args, **kwargs):
+        
+        response = super().list(request, *args, **kwargs)
+        
+        # ?facets=true adds bucket counts for the current filter/search context
+        if request.query_params.get('facets', '').lower() in ('1', 'true'):
+            response.data['facets'] = self.get_facets()
+        
+        return response
+    
+    def get_facets(self):
+        
+        key = facets_cache_key(catalog_version(), self.request)
+        facets = cache.get(key)
+        if facets is None:
+            facets = compute_facets(self.filter_queryset(self.get_queryset()))
+            cache.set(key, facets, settings.CATALOG_CACHE_TIMEOUT)
+        return facets
+    
+    @action(detail=False, methods=['get'])
+    def bulk(self, request):
+        
+        ids = []
+        for value in request.query_params.get('ids', '').split(','):
+            value = value.strip()
+            if not value.isdigit():
+                raise ValidationError({'ids': 'Must be a comma-separated list of product ids.'})
+            if int(value) not in ids:
+                ids.append(int(value))
+        if len(ids) > settings.PRODUCT_BULK_MAX_IDS:
+            raise ValidationError({'ids': f'At most {settings.PRODUCT_BULK_MAX_IDS} ids per request.'})
+        
+        # Same cache entries as the async detail view (/api/async/products/<id>/;
+        # retrieve here does not cache); only misses hit the database, in one query
+        keys = {pk: product_cache_key(pk) for pk in ids}
+        cached = cache.get_many(keys.values())
+        found = {pk: cached[key] for pk, key in keys.items() if key in cached}
+        misses = [pk for pk in ids if pk not in found]
+        if misses:
+            loaded = {
+                pk: ProductSerializer(product).data
+                for pk, product in Product.objects.in_bulk(misses).items()
+            }
+            cache.set_many(
+                {keys[pk]: data for pk, data in loaded.items()},
+                settings.CATALOG_CACHE_TIMEOUT
+            )
+            found.update(loaded)
+        
+        results = [found[pk] for pk in ids if pk in found]
+        keep = requested_fields(request, serializer_field_names(ProductSerializer))
+        if keep is not None:
+            results = [{name: data[name] for name in keep} for data in results]
+        
+        return Response({
+            'results': results,
+            'missing': [pk for pk in ids if pk not in found],
+        })
+    
+    @action(detail=False, methods=['get'], url_path='low-stock', permission_classes=[IsAdminUser])
+    def low_stock(self, request):
+        
+        # Reads only the partial index; list filters and search do not apply
+        page = self.paginate_queryset(Product.objects.low_stock())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['get'], url_path='low-stock/alerts', permission_classes=[IsAdminUser])
+    def low_stock_alerts(self, request):
+        
+        alerts = LowStockAlert.objects.select_related('product')
+        
+        # ?after=<alert id> returns newer alerts oldest first, for consumers
+        # that remember the last alert they handled
+        after = request.query_params.get('after')
+        if after is not None:
+            if not after.isdigit():
+                raise ValidationError({'after': 'Must be an alert id.'})
+            alerts = alerts.filter(id__gt=int(after)).order_by('id')
+        
+        page = self.paginate_queryset(alerts)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['get'], url_path='reorder-suggestions', permission_classes=[IsAdminUser])
+    def reorder_suggestions(self, request):
+        
+        # Largest purchases first; refreshed by `manage.py forecast_demand`
+        page = self.paginate_queryset(ReorderSuggestion.objects.select_related('product'))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        
+        # One lookup on the (product, rank) index; no get_object() first
+        if not str(pk).isdigit():
+            raise Http404('No Product matches the given query.')
+        rows = list(
+            RelatedProduct.objects.filter(product_id=pk)
+            .select_related('related')
+            .order_by('rank')
+        )
+        if not rows and not Product.objects.filter(pk=pk).exists():
+            raise Http404('No Product matches the given query.')
+        
+        serializer = self.get_serializer(rows, many=True)
+        return Response({'count': len(rows), 'results': serializer.data})
+    
     def create(self, request, *args, **kwargs):
        
         serializer = self.get_serializer(data=request.data)
@@ -3,12 +3,25 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth import get_user_model
+from ecommerce_backend.estimated_counts import EstimatedCountAdminMixin
+from .models import CustomerStats
 
 User = get_user_model()
 
 
+class CustomerStatsInline(admin.StackedInline):
+    
+    model = CustomerStats
+    can_delete = False
+    readonly_fields = ['order_count', 'lifetime_spend', 'last_order_at', 'updated_at']
+    
+    def has_add_permission(self, request, obj=None):
+        # Rows are maintained by order placement and rebuild_customer_stats
+        return False
+
+
 @admin.register(User)
-class CustomUserAdmin(BaseUserAdmin):
+class CustomUserAdmin(EstimatedCountAdminMixin, BaseUserAdmin):
     
     list_display = ['email', 'first_name', 'last_name', 'is_staff', 'is_active', 'date_joined']
     list_filter = ['is_staff', 'is_active', 'date_joined']
@@ -29,4 +42,5 @@ class CustomUserAdmin(BaseUserAdmin):
         }),
     )
     
-    readonly_fields = ['date_joined', 'last_login']
\ No newline at end of file
+    readonly_fields = ['date_joined', 'last_login']
+    inlines = [CustomerStatsInline]
\ No newline at end of file
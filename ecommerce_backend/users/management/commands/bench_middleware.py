@@ -0,0 +1,89 @@
+import io
+import statistics
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+User = get_user_model()
+
+
+def wsgi_get(application, path, headers):
+    """Run one GET through the WSGI application in-process"""
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+        'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+        **headers,
+    }
+    status = []
+    b''.join(application(environ, lambda s, h, exc_info=None: status.append(s)))
+    return status[0]
+
+
+class Command(BaseCommand):
+    help = 'Measures per-request middleware overhead of JWT API calls with and without the lean path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/auth/profile/', help='Endpoint requested with the JWT')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per variant')
+        parser.add_argument('--email', help='User to authenticate as (default: first active user)')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True)
+        user = users.filter(email=options['email']).first() if options['email'] else users.order_by('pk').first()
+        if user is None:
+            raise CommandError('No such active user; run `manage.py seed` or pass --email.')
+
+        # A session cookie left over from the admin, as browsers send it
+        session = SessionStore()
+        session['_auth_user_id'] = str(user.pk)
+        session.create()
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+        cookie = {'HTTP_COOKIE': f'{settings.SESSION_COOKIE_NAME}={session.session_key}'}
+
+        self.stdout.write(f"{options['requests']} GET {options['path']} per variant (in-process WSGI, µs per request):")
+        try:
+            for label, extra in [('bearer', {}), ('bearer + session cookie', cookie)]:
+                full, lean = self.measure(options, {**headers, **extra})
+                self.stdout.write(
+                    f"  {label:<24} full {full['us']:7.0f} ({full['queries']} queries)   "
+                    f"lean {lean['us']:7.0f} ({lean['queries']} queries)   "
+                    f"saved {full['us'] - lean['us']:6.0f} ({(full['us'] - lean['us']) / full['us']:.0%})"
+                )
+        finally:
+            session.delete()
+
+    def measure(self, options, headers):
+        """Full and lean results; requests alternate so drift hits both alike"""
+        variants = [{'lean': False, 'timings': [], 'queries': 0}, {'lean': True, 'timings': [], 'queries': 0}]
+        application = WSGIHandler()
+
+        def count(execute, sql, params, many, context):
+            variant['queries'] += 1
+            return execute(sql, params, many, context)
+
+        for variant in variants:
+            with override_settings(LEAN_API=variant['lean']), connection.execute_wrapper(count):
+                status = wsgi_get(application, options['path'], headers)  # Warm up, count queries
+            if not status.startswith('200'):
+                raise CommandError(f"{options['path']} answered {status}.")
+
+        for _ in range(options['requests']):
+            for variant in variants:
+                with override_settings(LEAN_API=variant['lean']):
+                    started = time.perf_counter()
+                    wsgi_get(application, options['path'], headers)
+                    variant['timings'].append(time.perf_counter() - started)
+
+        return [
+            {'us': statistics.median(variant['timings']) * 1e6, 'queries': variant['queries']}
+            for variant in variants
+        ]
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.stats import rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Recomputes CustomerStats for every user from live and archived orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users per grouped query')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = rebuild_all(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt stats for {total} users in {time.perf_counter() - started:.1f}s.'
+        ))
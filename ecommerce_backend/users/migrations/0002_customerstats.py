@@ -0,0 +1,29 @@
+# Generated by Django 6.0 on 2026-10-19 07:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerStats',
+            fields=[
+                ('user', models.OneToOneField(help_text='Customer these statistics belong to', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('order_count', models.PositiveIntegerField(default=0, help_text='Orders placed, not counting cancelled ones')),
+                ('lifetime_spend', models.DecimalField(decimal_places=2, default=0, help_text='Total amount of orders placed, not counting cancelled ones', max_digits=12)),
+                ('last_order_at', models.DateTimeField(blank=True, help_text='When the customer last placed an order', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp when these statistics were last changed')),
+            ],
+            options={
+                'verbose_name': 'Customer Stats',
+                'verbose_name_plural': 'Customer Stats',
+            },
+        ),
+    ]
@@ -25,6 +25,10 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         verbose_name = 'User'
         verbose_name_plural = 'Users'
         ordering = ['-date_joined']
+        indexes = [
+            # Default ordering of the admin changelist
+            models.Index(fields=['-date_joined'], name='user_date_joined_idx'),
+        ]
     
     def __str__(self):
         return self.email
@@ -36,4 +40,41 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     
     def get_short_name(self):
        
-        return self.first_name
\ No newline at end of file
+        return self.first_name
+
+class CustomerStats(models.Model):
+    """Per-customer order totals, kept up to date as orders are placed and cancelled"""
+
+    user = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        help_text="Customer these statistics belong to"
+    )
+    order_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Orders placed, not counting cancelled ones"
+    )
+    lifetime_spend = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text="Total amount of orders placed, not counting cancelled ones"
+    )
+    last_order_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the customer last placed an order"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Timestamp when these statistics were last changed"
+    )
+    
+    class Meta:
+        verbose_name = 'Customer Stats'
+        verbose_name_plural = 'Customer Stats'
+    
+    def __str__(self):
+        return f"Stats for user #{self.user_id}"
@@ -1,9 +1,20 @@
 
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from .models import CustomerStats
 
 User = get_user_model()
 
+EXPAND_PARAM = 'expand'
+
+
+def requested_expansions(request):
+    """Names listed in ?expand=, e.g. ``?expand=stats``"""
+    if request is None:
+        return set()
+    value = request.query_params.get(EXPAND_PARAM, '')
+    return {name.strip() for name in value.split(',') if name.strip()}
+
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     
@@ -45,6 +56,14 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
+class CustomerStatsSerializer(serializers.ModelSerializer):
+    
+    class Meta:
+        model = CustomerStats
+        fields = ['order_count', 'lifetime_spend', 'last_order_at']
+        read_only_fields = fields
+
+
 class UserSerializer(serializers.ModelSerializer):
    
     full_name = serializers.CharField(source='get_full_name', read_only=True)
@@ -52,4 +71,15 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'email', 'first_name', 'last_name', 'full_name', 'date_joined']
-        read_only_fields = ['id', 'date_joined']
\ No newline at end of file
+        read_only_fields = ['id', 'date_joined']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Order statistics are opt-in: ?expand=stats
+        if 'stats' in requested_expansions(self.context.get('request')):
+            self.fields['stats'] = serializers.SerializerMethodField()
+    
+    def get_stats(self, obj):
+        # Customers who never ordered have no row yet
+        stats = getattr(obj, 'stats', None) or CustomerStats(user=obj)
+        return CustomerStatsSerializer(stats).data
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+Incremental upkeep of ``CustomerStats``.
+
+Placing an order bumps the customer's row and cancelling one takes it back
+off, inside the same transaction as the order change. A customer without a
+row gets one holding their earlier orders the first time they order, and
+the new orders are then added like any other, so rows are correct from the
+moment they exist; ``rebuild_customer_stats`` refreshes everyone in batches.
+"""
+from decimal import Decimal
+
+from django.db import models
+from django.db.models import Case, Count, F, Max, Q, Sum, Value, When
+
+from .models import CustomerStats, CustomUser
+
+EMPTY_STATS = {'order_count': 0, 'lifetime_spend': Decimal('0.00'), 'last_order_at': None}
+
+
+def _grouped(queryset):
+    return queryset.order_by().values('user_id').annotate(
+        order_count=Count('id', filter=~Q(status='cancelled')),
+        lifetime_spend=Sum('total_amount', filter=~Q(status='cancelled')),
+        last_order_at=Max('created_at'),
+    )
+
+
+def compute_stats(user_ids, exclude_order_ids=()):
+    """``{user_id: stats}`` for these users, live and archived orders together"""
+    from orders.models import ArchivedOrder, Order
+
+    # One grouped query: a user can appear once per table
+    live = Order.objects.filter(user_id__in=user_ids).exclude(id__in=exclude_order_ids)
+    rows = _grouped(live).union(
+        _grouped(ArchivedOrder.objects.filter(user_id__in=user_ids)),
+        all=True,
+    )
+    stats = {user_id: dict(EMPTY_STATS) for user_id in user_ids}
+    for row in rows:
+        totals = stats[row['user_id']]
+        totals['order_count'] += row['order_count']
+        totals['lifetime_spend'] += row['lifetime_spend'] or 0
+        if totals['last_order_at'] is None or row['last_order_at'] > totals['last_order_at']:
+            totals['last_order_at'] = row['last_order_at']
+    return stats
+
+
+def rebuild_stats(user_ids):
+    """Recompute and upsert the rows of these users; returns how many were written"""
+    rows = [
+        CustomerStats(user_id=user_id, **totals)
+        for user_id, totals in compute_stats(user_ids).items()
+    ]
+    CustomerStats.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['order_count', 'lifetime_spend', 'last_order_at', 'updated_at'],
+    )
+    return len(rows)
+
+
+def rebuild_all(batch_size=1000):
+    """Recompute every customer's row, one grouped query per chunk of users"""
+    total = 0
+    last_id = 0
+    while True:
+        user_ids = list(
+            CustomUser.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not user_ids:
+            return total
+        total += rebuild_stats(user_ids)
+        last_id = user_ids[-1]
+
+
+def record_order(order):
+    """Count a newly placed order; call inside the order's transaction"""
+    record_orders([order])
+
+
+def _increment(user_id, count, spend, last):
+    return CustomerStats.objects.filter(user_id=user_id).update(
+        order_count=F('order_count') + count,
+        lifetime_spend=F('lifetime_spend') + spend,
+        last_order_at=last,
+    )
+
+
+def record_orders(orders):
+    """Count newly placed orders with one UPDATE per customer"""
+    totals = {}
+    for order in orders:
+        count, spend, last = totals.get(order.user_id, (0, 0, order.created_at))
+        totals[order.user_id] = (count + 1, spend + order.total_amount, max(last, order.created_at))
+
+    missing = [user_id for user_id, values in totals.items() if not _increment(user_id, *values)]
+    if not missing:
+        return
+
+    # First orders since stats existed: start the row from the earlier orders
+    # only. A concurrent first order of the same customer inserts the same
+    # row, so one insert is skipped and both increments below still apply.
+    CustomerStats.objects.bulk_create(
+        [
+            CustomerStats(user_id=user_id, **history)
+            for user_id, history in compute_stats(missing, [order.id for order in orders]).items()
+        ],
+        ignore_conflicts=True,
+    )
+    for user_id in missing:
+        _increment(user_id, *totals[user_id])
+
+
+def record_cancellations(order_ids):
+    """Take cancelled orders back off their customers' totals with one UPDATE"""
+    from orders.models import Order
+
+    totals = {
+        row['user_id']: row
+        for row in Order.objects.filter(id__in=order_ids)
+        .order_by()
+        .values('user_id')
+        .annotate(count=Count('id'), spend=Sum('total_amount'))
+    }
+    if not totals:
+        return 0
+
+    # Customers without a row get a correct one when they next order
+    return CustomerStats.objects.filter(user_id__in=totals).update(
+        order_count=F('order_count') - Case(
+            *[When(user_id=user_id, then=Value(row['count'])) for user_id, row in totals.items()],
+            output_field=models.PositiveIntegerField(),
+        ),
+        lifetime_spend=F('lifetime_spend') - Case(
+            *[When(user_id=user_id, then=Value(row['spend'])) for user_id, row in totals.items()],
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )